@@ -1 +1,23 @@
-from .main import run_app
+def run_app(plugin=None, sub_page=None, single_instance=True):
+    """
+    Starts the app. If the app is already running the request is sent to the running app instead.
+    If a zygote is running it starts the app.
+    The GUI is imported on demand so that the hand-off and headless tools (e.g. sharktools.batch) are fast.
+    """
+    instance_server = None
+    if single_instance:
+        from . import instance
+        instance_server = instance.claim_instance(plugin=plugin, sub_page=sub_page)
+        if instance_server is None:
+            return None
+        # A pre-warmed process (see sharktools.zygote) starts the app with everything already imported.
+        # The instance is kept until the app started by the zygote has taken it over. Requests from other
+        # launches until then are passed on to it.
+        from . import zygote
+        if zygote.ZYGOTE_FILE_PATH.exists() and zygote.request_launch(plugin=plugin, sub_page=sub_page):
+            if instance_server.wait_for_take_over():
+                return None
+            # The app of the zygote did not start in time. This process starts the app and keeps the instance.
+    from .main import run_app
+    return run_app(plugin=plugin, sub_page=sub_page, single_instance=single_instance,
+                   instance_server=instance_server)
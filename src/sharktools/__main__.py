@@ -0,0 +1,21 @@
+import argparse
+import sys
+
+from sharktools import run_app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='sharktools',
+                                     description='Starts SHARKtools. If it is already running the running app '
+                                                 'is brought to the front instead.')
+    parser.add_argument('plugin', nargs='?', default=None, help='Plugin (page) to show')
+    parser.add_argument('sub_page', nargs='?', default=None, help='Sub page of the plugin to show')
+    parser.add_argument('--new-instance', action='store_true',
+                        help='Start a new app even if SHARKtools is already running')
+    args = parser.parse_args(argv)
+    run_app(plugin=args.plugin, sub_page=args.sub_page, single_instance=not args.new_instance)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
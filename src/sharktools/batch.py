@@ -0,0 +1,197 @@
+"""
+Headless batch runner for plugin workflows.
+
+A plugin exposes its workflows in the plugin module as
+    WORKFLOWS = dict(workflow_name=function)
+where function is called as function(file_path, user=user, **options) for every file.
+
+Example:
+    python -m sharktools.batch sharktools_ctd_processing process_files *.cnv --user C22561 --processes 4
+"""
+import argparse
+import concurrent.futures
+import logging
+import os
+import sys
+import time
+from importlib.metadata import entry_points
+from pathlib import Path
+
+from sharktools import core
+
+logger = logging.getLogger(__name__)
+
+PLUGIN_GROUP = 'sharktools.plugins'
+
+HOME_DIRECTORY = Path.home() / 'sharktools'
+ROOT_DIRECTORY = Path(__file__).parent
+
+# Set per worker process by _init_worker
+_worker = {}
+
+
+class BatchError(Exception):
+    pass
+
+
+def load_plugin(plugin_name):
+    """
+    Loads the plugin module registered under the entry point group "sharktools.plugins".
+    plugin_name can be either the name or the value of the entry point.
+    """
+    for discovered_plugin in entry_points(group=PLUGIN_GROUP):
+        if plugin_name in [discovered_plugin.name, discovered_plugin.value]:
+            return discovered_plugin.value, discovered_plugin.load()
+    raise BatchError('Could not find plugin: {}'.format(plugin_name))
+
+
+def get_workflow(plugin_module, workflow_name):
+    workflows = getattr(plugin_module, 'WORKFLOWS', {})
+    if workflow_name not in workflows:
+        raise BatchError('Plugin has no workflow named "{}". Available workflows are: {}'.format(
+            workflow_name, ', '.join(sorted(workflows)) or '-'))
+    return workflows[workflow_name]
+
+
+def load_user(plugin_name, plugin_module, user_name=None, home_directory=HOME_DIRECTORY, read_only=False):
+    """
+    Resolves the user settings for the plugin the same way as MainApp does.
+    If user_name is not given the startup user in app_settings is used.
+    The active user of the GUI is not changed.
+    :param read_only: if True no files are written. Used in the worker processes
+    :return: core.User
+    """
+    users_root_directory = Path(home_directory, 'users')
+    users_root_directory.mkdir(exist_ok=True, parents=True)
+    user_manager = core.UserManager(users_root_directory=users_root_directory,
+                                    app_root_directory=ROOT_DIRECTORY,
+                                    path_resolver=core.PathTokenResolver(root=ROOT_DIRECTORY, home=home_directory),
+                                    read_only=read_only)
+    users_directory = users_root_directory
+    plugin_users_directory = plugin_module.INFO.get('users_directory', 'users')
+    if plugin_users_directory:
+        users_directory = Path(home_directory, 'plugins', plugin_name, plugin_users_directory)
+        users_directory.mkdir(exist_ok=True, parents=True)
+    for settings_type, settings_name in getattr(plugin_module, 'USER_SETTINGS', []):
+        user_manager.add_user_settings(users_directory=users_directory,
+                                       settings_type=settings_type,
+                                       settings_name=settings_name)
+    user_manager.set_users_directory(users_directory, activate=False)
+    if not read_only and 'default' not in user_manager.get_user_list():
+        user_manager.add_user('default')
+    if not user_name:
+        user_name = user_manager.app_settings.get('user', 'startup') or 'default'
+    if user_name not in user_manager.get_user_list():
+        raise core.GUIExceptionUserError('Invalid user name: {}'.format(user_name))
+    # Do not use set_user here. It would change the active user of the GUI
+    user_manager.user = user_manager.users[user_name]
+    return user_manager.user
+
+
+def _init_worker(plugin_name, workflow_name, user_name, options, read_only=True):
+    name, plugin_module = load_plugin(plugin_name)
+    _worker['workflow'] = get_workflow(plugin_module, workflow_name)
+    # Workers only read the settings. Missing files are written once by the main process (see run_batch).
+    _worker['user'] = load_user(name, plugin_module, user_name, read_only=read_only)
+    _worker['options'] = options
+
+
+def _run_file(file_path):
+    time_start = time.perf_counter()
+    try:
+        _worker['workflow'](file_path, user=_worker['user'], **_worker['options'])
+    except Exception as e:
+        logger.exception('Workflow failed for file {}'.format(file_path))
+        return file_path, time.perf_counter() - time_start, '{}: {}'.format(type(e).__name__, e)
+    return file_path, time.perf_counter() - time_start, None
+
+
+def run_batch(plugin_name, workflow_name, file_paths, user_name=None, processes=None, options=None,
+              stream=sys.stdout):
+    """
+    Runs the workflow for all files. Files are distributed over "processes" worker processes.
+    Per file timing and a summary is written to stream.
+    :return: list of (file_path, seconds, error). error is None for successful files.
+    """
+    options = options or {}
+    processes = processes or os.cpu_count() or 1
+    initargs = (plugin_name, workflow_name, user_name, options)
+
+    # Fail early (and in this process) on invalid plugin, workflow or user. Also makes missing settings files
+    # so that the workers do not write them at the same time.
+    _init_worker(*initargs, read_only=False)
+
+    results = []
+    time_start = time.perf_counter()
+    if processes == 1:
+        result_iter = map(_run_file, file_paths)
+        executor = None
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=processes,
+                                                          initializer=_init_worker,
+                                                          initargs=initargs)
+        futures = [executor.submit(_run_file, file_path) for file_path in file_paths]
+        result_iter = (future.result() for future in concurrent.futures.as_completed(futures))
+    try:
+        for file_path, seconds, error in result_iter:
+            results.append((file_path, seconds, error))
+            status = 'OK' if error is None else 'FAILED ({})'.format(error)
+            print('{:>9.3f} s  {}  {}'.format(seconds, file_path, status), file=stream)
+    finally:
+        if executor:
+            executor.shutdown()
+    total_time = time.perf_counter() - time_start
+
+    nr_failed = len([r for r in results if r[2] is not None])
+    cpu_time = sum(r[1] for r in results)
+    print('-' * 50, file=stream)
+    print('Files:      {} ({} failed)'.format(len(results), nr_failed), file=stream)
+    print('Processes:  {}'.format(processes), file=stream)
+    print('Wall time:  {:.3f} s'.format(total_time), file=stream)
+    print('Work time:  {:.3f} s'.format(cpu_time), file=stream)
+    if results:
+        print('Mean/file:  {:.3f} s'.format(cpu_time / len(results)), file=stream)
+    if total_time:
+        print('Speedup:    {:.2f}'.format(cpu_time / total_time), file=stream)
+    return results
+
+
+def _parse_options(option_list):
+    options = {}
+    for item in option_list or []:
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise BatchError('Options must be given as key=value: {}'.format(item))
+        options[key] = value
+    return options
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='sharktools-batch',
+                                     description='Runs a plugin workflow over a list of files without GUI.')
+    parser.add_argument('plugin', help='Name of the plugin (entry point in group "sharktools.plugins")')
+    parser.add_argument('workflow', help='Name of the workflow in the plugins WORKFLOWS')
+    parser.add_argument('files', nargs='+', help='Files to process')
+    parser.add_argument('-u', '--user', default=None, help='User settings to use. Default is the startup user')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='Number of worker processes. Default is the number of cores')
+    parser.add_argument('-o', '--option', action='append', default=[],
+                        help='Extra keyword argument to the workflow given as key=value. Can be repeated')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        results = run_batch(args.plugin, args.workflow, args.files,
+                            user_name=args.user,
+                            processes=args.processes,
+                            options=_parse_options(args.option))
+    except (BatchError, core.GUIException) as e:
+        print(getattr(e, 'message', None) or e, file=sys.stderr)
+        return 2
+    if any(error is not None for _, _, error in results):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,10 +5,30 @@
 
 from .paths import Paths
 
+from .path_tokens import PathTokenResolver
+
 from .exceptions import *
 
-from .user import UserManager
+from .user import UserManager, UserIndex
+
+from .mappings import Colormaps, ColormapRegistry, colormap_registry
+
+from . import texts
+
+from . import logs
+
+from . import tracing
+
+from . import metrics
+
+from . import mirror
+
+from .tasks import Task, run_task_in_thread
+
+from .jobs import Job, JobQueue
+
+from .profiler import SamplingProfiler
 
-from .mappings import Colormaps
+from .memory import MemorySnapshots
 
-from . import texts
\ No newline at end of file
+from .lazy_import import lazy_import
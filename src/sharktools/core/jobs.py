@@ -0,0 +1,294 @@
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+
+import datetime
+import heapq
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+
+from sharktools.core import metrics
+from sharktools.core import tracing
+from sharktools.core.tasks import Task
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+INTERRUPTED = 'interrupted'
+
+
+class Job(object):
+    """
+    A named unit of work in the JobQueue. func is called as func(task) where task is a core.Task that
+    can be used to report progress.
+    """
+    def __init__(self, func, name='', priority=0, owner=''):
+        self.id = None
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.owner = owner
+        self.state = QUEUED
+        self.task = Task(name=name)
+        self.submitted_time = time.time()
+        self.start_time = None
+        self.end_time = None
+        self.result = None
+        self.error = None
+
+    def __repr__(self):
+        return 'Job({}, {!r}, state={})'.format(self.id, self.name, self.state)
+
+    @property
+    def duration(self):
+        if self.start_time is None:
+            return None
+        end_time = self.end_time if self.end_time is not None else time.time()
+        return end_time - self.start_time
+
+    @property
+    def is_done(self):
+        return self.state in [FINISHED, FAILED, CANCELLED, INTERRUPTED]
+
+
+class JobHistory(object):
+    """
+    Persists job states in a small SQLite database so that finished work is known after a restart.
+    Jobs that were queued or running when the program ended are marked as interrupted on startup.
+    """
+    max_text_length = 1000
+
+    def __init__(self, file_path):
+        self.file_path = str(file_path)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.file_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                        name TEXT,
+                                        owner TEXT,
+                                        priority INTEGER,
+                                        state TEXT,
+                                        submitted REAL,
+                                        started REAL,
+                                        ended REAL,
+                                        duration REAL,
+                                        result TEXT,
+                                        error TEXT)""")
+            self._connection.execute('UPDATE jobs SET state = ? WHERE state IN (?, ?)',
+                                     (INTERRUPTED, QUEUED, RUNNING))
+
+    def add(self, job):
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                'INSERT INTO jobs (name, owner, priority, state, submitted) VALUES (?, ?, ?, ?, ?)',
+                (job.name, job.owner, job.priority, job.state, job.submitted_time))
+            return cursor.lastrowid
+
+    def update(self, job):
+        result = None if job.result is None else repr(job.result)[:self.max_text_length]
+        error = None if job.error is None else str(job.error)[:self.max_text_length]
+        with self._lock, self._connection:
+            self._connection.execute(
+                'UPDATE jobs SET state = ?, started = ?, ended = ?, duration = ?, result = ?, error = ? WHERE id = ?',
+                (job.state, job.start_time, job.end_time, job.duration, result, error, job.id))
+
+    def get_latest(self, nr=100):
+        """
+        Returns the latest jobs as a list of dicts, newest first.
+        """
+        with self._lock:
+            cursor = self._connection.execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (nr,))
+            columns = [item[0] for item in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class JobQueue(object):
+    """
+    Central job queue. Jobs are started in priority order (highest priority first, then in order of
+    submission) and at most max_concurrent jobs run at the same time.
+    Listeners added with add_listener are called with the job on every state change. Note that they are
+    called from the worker threads.
+    """
+    def __init__(self, max_concurrent=2, history_path=None):
+        self.max_concurrent = max(int(max_concurrent), 1)
+        self.history = JobHistory(history_path) if history_path else None
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._running = []
+        self._finished = []
+        self._listeners = []
+        self._workers = []
+        self._shutdown = False
+        self._local_ids = itertools.count(1)
+
+    def submit(self, func, name='', priority=0, owner=''):
+        """
+        Adds a job to the queue.
+        :param func: callable that takes a core.Task as the only argument
+        :param name:
+        :param priority: jobs with higher priority are started first
+        :param owner: typically the name of the plugin submitting the job
+        :return: Job
+        """
+        job = Job(func, name=name, priority=priority, owner=owner)
+        with self._condition:
+            # Checked before the job is added to the history
+            if self._shutdown:
+                raise RuntimeError('Job queue is shut down')
+            if self.history:
+                job.id = self.history.add(job)
+            else:
+                job.id = next(self._local_ids)
+            heapq.heappush(self._heap, (-priority, next(self._counter), job))
+            self._start_workers()
+            self._condition.notify()
+        self._notify(job)
+        return job
+
+    def cancel(self, job):
+        """ Cancels a queued job. Returns True if the job was removed from the queue. """
+        with self._condition:
+            for i, item in enumerate(self._heap):
+                if item[2] is job:
+                    self._heap.pop(i)
+                    heapq.heapify(self._heap)
+                    break
+            else:
+                return False
+        self._set_done(job, CANCELLED)
+        return True
+
+    def get_queued(self):
+        with self._condition:
+            return [item[2] for item in sorted(self._heap)]
+
+    def get_running(self):
+        with self._condition:
+            return list(self._running)
+
+    def get_finished(self):
+        with self._condition:
+            return list(self._finished)
+
+    @property
+    def nr_queued(self):
+        return len(self._heap)
+
+    @property
+    def nr_running(self):
+        return len(self._running)
+
+    def add_listener(self, func):
+        self._listeners.append(func)
+
+    def remove_listener(self, func):
+        if func in self._listeners:
+            self._listeners.remove(func)
+
+    def shutdown(self):
+        """
+        Stops starting new jobs. Queued jobs are cancelled and running jobs are marked as interrupted in the
+        history (the worker threads are daemons and are not waited for).
+        """
+        with self._condition:
+            self._shutdown = True
+            queued = [item[2] for item in self._heap]
+            self._heap = []
+            running = list(self._running)
+            self._condition.notify_all()
+        for job in queued:
+            self._set_done(job, CANCELLED)
+        for job in running:
+            job.state = INTERRUPTED
+            self._save(job)
+        if self.history:
+            self.history.close()
+            self.history = None
+
+    def _start_workers(self):
+        self._workers = [w for w in self._workers if w.is_alive()]
+        while len(self._workers) < self.max_concurrent:
+            worker = threading.Thread(target=self._work, name='job-worker-{}'.format(len(self._workers)),
+                                      daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._heap and not self._shutdown:
+                    self._condition.wait()
+                if self._shutdown:
+                    return
+                job = heapq.heappop(self._heap)[2]
+                self._running.append(job)
+            self._run_job(job)
+
+    def _run_job(self, job):
+        job.state = RUNNING
+        job.start_time = time.time()
+        metrics.histogram('jobs.wait_ms').observe((job.start_time - job.submitted_time) * 1000)
+        job.task.start()
+        self._save(job)
+        self._notify(job)
+        try:
+            with tracing.span('job.run', category='jobs', job=job.name, owner=job.owner):
+                result = job.func(job.task)
+        except Exception as e:
+            logger.exception('Job {} failed'.format(job.name))
+            job.error = e
+            job.task.finish(exception=e)
+            self._set_done(job, FAILED)
+        else:
+            job.result = result
+            job.task.finish(result=result)
+            self._set_done(job, FINISHED)
+
+    def _set_done(self, job, state):
+        job.state = state
+        job.end_time = time.time()
+        metrics.counter('jobs.' + state).inc()
+        with self._condition:
+            if job in self._running:
+                self._running.remove(job)
+            self._finished.append(job)
+        if not job.task.is_done:
+            job.task.finish()
+        self._save(job)
+        self._notify(job)
+
+    def _save(self, job):
+        history = self.history
+        if not history:
+            return
+        try:
+            history.update(job)
+        except sqlite3.Error:
+            logger.exception('Could not save job history')
+
+    def _notify(self, job):
+        metrics.gauge('jobs.queued').set(self.nr_queued)
+        metrics.gauge('jobs.running').set(len(self._running))
+        for func in list(self._listeners):
+            try:
+                func(job)
+            except Exception:
+                logger.exception('Error in job listener')
+
+
+def format_timestamp(timestamp):
+    if not timestamp:
+        return ''
+    return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
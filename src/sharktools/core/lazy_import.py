@@ -0,0 +1,70 @@
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""
+Lazy import of heavy modules. The module is imported the first time an attribute is used:
+
+    from sharktools.core.lazy_import import lazy_import
+    cmocean = lazy_import('cmocean')
+
+    def get_cmap():
+        return cmocean.cm.haline  # cmocean is imported here
+"""
+import importlib
+import logging
+import sys
+import time
+import types
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stands in for a module until an attribute is used. The real module is then imported and its namespace
+    is copied to the proxy so that later attribute lookups are as fast as on the module itself.
+    """
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_loaded'] = False
+
+    def _lazy_load(self):
+        t0 = time.perf_counter()
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        self.__dict__['_lazy_loaded'] = True
+        logger.debug('Lazy import of %s took %.1f ms', self.__name__, (time.perf_counter() - t0) * 1000)
+        return module
+
+    def __getattr__(self, item):
+        # Only called for attributes that are not (yet) in the namespace
+        if self.__dict__['_lazy_loaded']:
+            raise AttributeError('module {!r} has no attribute {!r}'.format(self.__name__, item))
+        return getattr(self._lazy_load(), item)
+
+    def __dir__(self):
+        if not self.__dict__['_lazy_loaded']:
+            self._lazy_load()
+        return list(self.__dict__)
+
+    def __repr__(self):
+        if self.__dict__['_lazy_loaded']:
+            return '<lazy module {!r} (loaded)>'.format(self.__name__)
+        return '<lazy module {!r} (not loaded)>'.format(self.__name__)
+
+
+def lazy_import(name):
+    """
+    Returns the module if it is already imported, otherwise a LazyModule that imports it on first use.
+    Note that a missing module is only reported (ModuleNotFoundError) when the module is used.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+
+def is_loaded(module):
+    """ True if module is a real module or a LazyModule that has been imported. """
+    if isinstance(module, LazyModule):
+        return module.__dict__['_lazy_loaded']
+    return True
@@ -0,0 +1,197 @@
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_compress_threads = []
+
+
+def gzip_namer(name):
+    """ namer for rotating file handlers. Rotated files get the suffix .gz """
+    return name + '.gz'
+
+
+def _compress(source, dest):
+    try:
+        with open(source, 'rb') as fid_in, gzip.open(dest, 'wb') as fid_out:
+            shutil.copyfileobj(fid_in, fid_out)
+        os.remove(source)
+    except OSError:
+        logger.exception('Could not compress rotated log file {}'.format(source))
+
+
+def gzip_rotator(source, dest):
+    """
+    rotator for rotating file handlers. The log file is renamed (fast) and then compressed to dest in a
+    background thread so that logging is not held up by the compression.
+    """
+    if not os.path.exists(source):
+        return
+    tmp_path = dest + '.rotating'
+    os.replace(source, tmp_path)
+    thread = threading.Thread(target=_compress, args=(tmp_path, dest), name='log-compress', daemon=True)
+    _compress_threads.append(thread)
+    thread.start()
+
+
+def wait_for_compression(timeout=5):
+    while _compress_threads:
+        _compress_threads.pop().join(timeout)
+
+
+class QueueLogging(object):
+    """
+    Routes log records through a queue. The handlers (file I/O, rotation) are run by a listener in a
+    background thread so that logging does not block the calling (GUI) thread.
+    """
+    def __init__(self, logger_to_attach, handlers):
+        self.logger = logger_to_attach
+        self.handlers = list(handlers)
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = logging.handlers.QueueHandler(self.queue)
+        self.listener = logging.handlers.QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.is_running = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.is_running:
+                return
+            self.is_running = True
+            self.logger.addHandler(self.queue_handler)
+            self.listener.start()
+
+    def stop(self):
+        """ Drains the queue, stops the listener and closes the handlers. Does nothing if not running. """
+        with self._lock:
+            if not self.is_running:
+                return
+            self.is_running = False
+            self.logger.removeHandler(self.queue_handler)
+            self.listener.stop()
+            for handler in self.handlers:
+                handler.close()
+        wait_for_compression()
+
+
+def get_rotating_file_handler(file_path, level=logging.DEBUG, fmt=None, compress=True, **kwargs):
+    """
+    Returns a TimedRotatingFileHandler. If compress is True rotated files are gzipped in the background.
+    kwargs are passed to TimedRotatingFileHandler (when, interval, backupCount...).
+    """
+    handler = logging.handlers.TimedRotatingFileHandler(str(file_path), delay=True, **kwargs)
+    handler.setLevel(level)
+    if fmt:
+        handler.setFormatter(logging.Formatter(fmt))
+    if compress:
+        handler.namer = gzip_namer
+        handler.rotator = gzip_rotator
+    return handler
+
+
+class RateLimiter(object):
+    """
+    Allows at most max_per_second events per key. Events over the limit are counted as suppressed.
+    """
+    def __init__(self, max_per_second):
+        self.max_per_second = max_per_second
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        """
+        :return: tuple (allowed, nr suppressed since last allowed event)
+        """
+        now = time.monotonic()
+        with self._lock:
+            window_start, count, suppressed = self._windows.get(key, (now, 0, 0))
+            if now - window_start >= 1:
+                window_start, count = now, 0
+            if count >= self.max_per_second:
+                self._windows[key] = (window_start, count, suppressed + 1)
+                return False, suppressed + 1
+            self._windows[key] = (window_start, count + 1, 0)
+            return True, suppressed
+
+
+class FastLogger(object):
+    """
+    Wrapper around a logging.Logger for hot paths.
+
+    - Messages are formatted lazily (%-style args) and only if the level is enabled.
+    - The level check is done before anything else. Use the *_enabled properties to guard expensive
+      arguments: "if log.debug_enabled: log.debug('%s', expensive())".
+    - If max_per_second is given (for the logger or per call with rate=) each call site logs at most that
+      many messages per second. The number of suppressed messages is added to the next logged message.
+    """
+    def __init__(self, logger_to_wrap, max_per_second=None):
+        self.logger = logger_to_wrap
+        self.max_per_second = max_per_second
+        self._limiters = {}
+
+    @property
+    def debug_enabled(self):
+        return self.logger.isEnabledFor(logging.DEBUG)
+
+    @property
+    def info_enabled(self):
+        return self.logger.isEnabledFor(logging.INFO)
+
+    def _get_limiter(self, rate):
+        limiter = self._limiters.get(rate)
+        if limiter is None:
+            limiter = self._limiters.setdefault(rate, RateLimiter(rate))
+        return limiter
+
+    def log(self, level, msg, *args, rate=None, **kwargs):
+        self._log(level, msg, args, rate, kwargs)
+
+    def _log(self, level, msg, args, rate, kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        rate = rate or self.max_per_second
+        # Frame of the caller of debug/info/...
+        stacklevel = 3
+        if rate:
+            caller = sys._getframe(2)
+            allowed, suppressed = self._get_limiter(rate).allow((caller.f_code.co_filename, caller.f_lineno))
+            if not allowed:
+                return
+            if suppressed:
+                msg = '{} [{} similar messages suppressed]'.format(msg, suppressed)
+        self.logger.log(level, msg, *args, stacklevel=stacklevel, **kwargs)
+
+    def debug(self, msg, *args, rate=None, **kwargs):
+        self._log(logging.DEBUG, msg, args, rate, kwargs)
+
+    def info(self, msg, *args, rate=None, **kwargs):
+        self._log(logging.INFO, msg, args, rate, kwargs)
+
+    def warning(self, msg, *args, rate=None, **kwargs):
+        self._log(logging.WARNING, msg, args, rate, kwargs)
+
+    def error(self, msg, *args, rate=None, **kwargs):
+        self._log(logging.ERROR, msg, args, rate, kwargs)
+
+    def exception(self, msg, *args, rate=None, **kwargs):
+        kwargs.setdefault('exc_info', True)
+        self._log(logging.ERROR, msg, args, rate, kwargs)
+
+
+def get_logger(name=None, max_per_second=None):
+    """
+    Returns a FastLogger for core and plugins. See FastLogger.
+    :param name: name of the logger, typically __name__
+    :param max_per_second: default rate limit per call site. None means no limit
+    """
+    return FastLogger(logging.getLogger(name), max_per_second=max_per_second)
@@ -1,22 +1,138 @@
 
-import cmocean
+import importlib
+import threading
+
+from sharktools.core.lazy_import import lazy_import
+
+# Imported on first use
+cmocean = lazy_import('cmocean')
+matplotlib = lazy_import('matplotlib')
+np = lazy_import('numpy')
+
+CMOCEAN_PREFIX = 'cmocean.cm.'
+DEFAULT_LUT_RESOLUTION = 256
+
+
+class ColormapRegistry(object):
+    """
+    Process wide cache of colormaps and their lookup tables (LUT).
+
+    Names are resolved on first use: "cmocean.cm.<name>" is a cmocean colormap, other names are looked up in
+    matplotlib (e.g. "jet", "viridis"). A LUT is the colormap sampled at a given resolution as an
+    (resolution, 4) RGBA float array. Use the module level colormap_registry.
+    """
+    def __init__(self):
+        self._cmaps = {}
+        self._luts = {}
+        self._cmocean_names = None
+        self._lock = threading.Lock()
+
+    def get_cmocean_names(self):
+        """ Names of the cmocean colormaps ("cmocean.cm.<name>"). Importing cmocean is done once. """
+        if self._cmocean_names is None:
+            self._cmocean_names = sorted(CMOCEAN_PREFIX + name for name in cmocean.cm.cmapnames)
+        return self._cmocean_names
+
+    def _resolve(self, name):
+        if name.startswith(CMOCEAN_PREFIX):
+            try:
+                return getattr(cmocean.cm, name[len(CMOCEAN_PREFIX):])
+            except AttributeError:
+                raise KeyError(name)
+        try:
+            return matplotlib.colormaps[name]
+        except (AttributeError, TypeError):
+            # matplotlib < 3.5
+            mpl_cm = importlib.import_module('matplotlib.cm')
+            try:
+                return mpl_cm.get_cmap(name)
+            except ValueError:
+                raise KeyError(name)
+
+    def get(self, name):
+        """
+        Returns the colormap object. Colormap objects are passed through.
+        :raises KeyError: if the name is unknown
+        """
+        if not isinstance(name, str):
+            return name
+        cmap = self._cmaps.get(name)
+        if cmap is None:
+            cmap = self._resolve(name)
+            with self._lock:
+                self._cmaps[name] = cmap
+        return cmap
+
+    def get_lut(self, cmap, resolution=DEFAULT_LUT_RESOLUTION):
+        """ Returns the cached (resolution, 4) RGBA float array for the colormap. Do not modify it. """
+        # Keyed on the colormap object since different colormaps may have the same name. The colormap is kept
+        # in the entry so that its id is not reused.
+        cmap = self.get(cmap)
+        key = (id(cmap), resolution)
+        entry = self._luts.get(key)
+        if entry is None:
+            lut = cmap(np.linspace(0, 1, resolution))
+            lut.setflags(write=False)
+            entry = (cmap, lut)
+            with self._lock:
+                self._luts[key] = entry
+        return entry[1]
+
+    def map(self, values, cmap, vmin=None, vmax=None, resolution=DEFAULT_LUT_RESOLUTION, bad_color=(0, 0, 0, 0)):
+        """
+        Maps values to colours with a cached LUT in one vectorised operation.
+        :param values: array like
+        :param cmap: colormap name or colormap object
+        :param vmin: value mapped to the first colour. Default is the min of values (NaN ignored)
+        :param vmax: value mapped to the last colour. Default is the max of values (NaN ignored)
+        :param bad_color: RGBA for NaN values
+        :return: array with shape values.shape + (4,)
+        """
+        values = np.asarray(values, dtype=float)
+        lut = self.get_lut(cmap, resolution)
+        finite = np.isfinite(values)
+        if vmin is None:
+            vmin = np.min(values[finite]) if finite.any() else 0.
+        if vmax is None:
+            vmax = np.max(values[finite]) if finite.any() else 1.
+        scale = resolution / (vmax - vmin) if vmax != vmin else 0.
+        index = np.zeros(values.shape, dtype=np.intp)
+        index[finite] = np.clip(((values[finite] - vmin) * scale).astype(np.intp), 0, resolution - 1)
+        colors = lut[index]
+        if not finite.all():
+            colors[~finite] = bad_color
+        return colors
+
+    def clear(self):
+        with self._lock:
+            self._cmaps = {}
+            self._luts = {}
+
+
+colormap_registry = ColormapRegistry()
 
 
 class Colormaps(object):
+    """
+    Lists and returns colormaps by name. Backed by the process wide colormap_registry so creating a
+    Colormaps is cheap and colormaps are only loaded when used.
+    """
     def __init__(self, default_cmap='jet'):
         self.default_cmap = default_cmap
-        cmapname_list = cmocean.cm.cmapnames[:]
-        self.cmap_mapping = {}
-        for cmap in sorted(cmapname_list):
-            cmap_string = 'cmocean.cm.{}'.format(cmap)
-            self.cmap_mapping[cmap_string] = eval(cmap_string)
+        self.registry = colormap_registry
 
-        # self.cmap_mapping = {'cmocean.cm.haline': cmocean.cm.haline,
-        #                      'cmocean.cm.thermal': cmocean.cm.thermal,
-        #                      'cmocean.cm.oxy': cmocean.cm.oxy}
+    @property
+    def cmap_mapping(self):
+        return {name: self.registry.get(name) for name in self.get_list()}
 
     def get_list(self):
-        return sorted(self.cmap_mapping)
+        return self.registry.get_cmocean_names()
 
     def get(self, cmap):
-        return self.cmap_mapping.get(cmap, self.default_cmap)
\ No newline at end of file
+        if cmap not in self.get_list():
+            return self.default_cmap
+        return self.registry.get(cmap)
+
+    def map(self, values, cmap=None, vmin=None, vmax=None, **kwargs):
+        """ Maps values to RGBA colours. See ColormapRegistry.map """
+        return self.registry.map(values, self.get(cmap or self.default_cmap), vmin=vmin, vmax=vmax, **kwargs)
@@ -0,0 +1,193 @@
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+
+import collections
+import datetime
+import logging
+import os
+import sys
+import sysconfig
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+
+def _get_windows_memory():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD),
+                    ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+        return None, None
+    return counters.WorkingSetSize, counters.PeakWorkingSetSize
+
+
+def get_process_memory():
+    """
+    Returns memory used by this process in bytes as a dict with keys:
+    rss (resident set size), peak_rss, traced and traced_peak (python allocations, only when tracemalloc is
+    active). Values that are not available on the platform are None.
+    """
+    result = {'rss': None, 'peak_rss': None, 'traced': None, 'traced_peak': None}
+    try:
+        if sys.platform == 'win32':
+            result['rss'], result['peak_rss'] = _get_windows_memory()
+        else:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # kB on linux, bytes on macOS
+            result['peak_rss'] = peak if sys.platform == 'darwin' else peak * 1024
+            if os.path.exists('/proc/self/statm'):
+                with open('/proc/self/statm') as fid:
+                    result['rss'] = int(fid.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        logger.debug('Could not get process memory', exc_info=True)
+    if tracemalloc.is_tracing():
+        result['traced'], result['traced_peak'] = tracemalloc.get_traced_memory()
+    return result
+
+
+class MemorySnapshots(object):
+    """
+    Takes tracemalloc snapshots and compares them. Memory growth is reported per source line and per top
+    level package (e.g. sharktools or a plugin package) so that leaks can be attributed to a plugin.
+    Tracing slows down allocations and should only be active while diagnosing.
+    """
+    def __init__(self, nframes=10, max_snapshots=50):
+        self.nframes = nframes
+        self.max_snapshots = max_snapshots
+        self.snapshots = []
+        self._package_directories = None
+
+    @property
+    def is_tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not self.is_tracing:
+            tracemalloc.start(self.nframes)
+            logger.info('tracemalloc started')
+
+    def stop(self):
+        if self.is_tracing:
+            tracemalloc.stop()
+            logger.info('tracemalloc stopped')
+
+    def clear(self):
+        self.snapshots = []
+
+    def take(self, label=''):
+        """
+        Takes a snapshot. Tracing is started if needed (the first snapshot is then empty).
+        :return: label of the snapshot
+        """
+        self.start()
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ])
+        label = '{} {}'.format(datetime.datetime.now().strftime('%H:%M:%S'), label).strip()
+        self.snapshots.append((label, snapshot))
+        if len(self.snapshots) > self.max_snapshots:
+            # Keep the first snapshot as baseline
+            self.snapshots.pop(1)
+        logger.debug('Memory snapshot taken: {}'.format(label))
+        return label
+
+    def get_labels(self):
+        return [label for label, snapshot in self.snapshots]
+
+    def _get_snapshot(self, index):
+        return self.snapshots[index]
+
+    def _get_package_directories(self):
+        """ Maps directories of imported top level packages to the package name. Longest path first. """
+        directories = {}
+        for name, module in list(sys.modules.items()):
+            if '.' in name or not getattr(module, '__path__', None):
+                continue
+            for path in module.__path__:
+                directories[os.path.normcase(os.path.abspath(path))] = name
+        return sorted(directories.items(), key=lambda item: -len(item[0]))
+
+    def get_package(self, file_path):
+        if file_path.startswith('<'):
+            return file_path
+        if self._package_directories is None:
+            self._package_directories = self._get_package_directories()
+        file_path = os.path.normcase(os.path.abspath(file_path))
+        for directory, name in self._package_directories:
+            if file_path.startswith(directory + os.sep):
+                return name
+        return '<{}>'.format(os.path.splitext(os.path.basename(file_path))[0])
+
+    def _get_owner(self, traceback, stdlib_directory):
+        """
+        Returns the package responsible for an allocation: the package of the most recent frame that is not
+        in the standard library. An allocation in json called from a plugin is attributed to the plugin.
+        """
+        frames = list(traceback)
+        for frame in reversed(frames):
+            if frame.filename.startswith('<'):
+                continue
+            file_path = os.path.normcase(os.path.abspath(frame.filename))
+            in_site_packages = 'site-packages' in file_path or 'dist-packages' in file_path
+            if file_path.startswith(stdlib_directory) and not in_site_packages:
+                continue
+            return self.get_package(frame.filename)
+        return self.get_package(frames[-1].filename)
+
+    def diff(self, index_from=-2, index_to=-1, nr=20):
+        """
+        Compares two snapshots (default the two latest).
+        :return: dict with "from", "to", "total" (bytes), "by_line" and "by_package".
+                 by_line is a list of (file, line, size diff, count diff), by_package (package, size diff).
+        """
+        if len(self.snapshots) < 2:
+            raise ValueError('At least two snapshots are needed')
+        label_from, snapshot_from = self._get_snapshot(index_from)
+        label_to, snapshot_to = self._get_snapshot(index_to)
+        self._package_directories = self._get_package_directories()
+
+        by_line = []
+        for stat in snapshot_to.compare_to(snapshot_from, 'lineno')[:nr]:
+            frame = stat.traceback[-1]
+            by_line.append((frame.filename, frame.lineno, stat.size_diff, stat.count_diff))
+
+        by_package = collections.Counter()
+        total = 0
+        stdlib_directory = os.path.normcase(os.path.abspath(sysconfig.get_paths()['stdlib']))
+        for stat in snapshot_to.compare_to(snapshot_from, 'traceback'):
+            by_package[self._get_owner(stat.traceback, stdlib_directory)] += stat.size_diff
+            total += stat.size_diff
+        by_package = sorted(by_package.items(), key=lambda item: -abs(item[1]))[:nr]
+        return {'from': label_from, 'to': label_to, 'total': total, 'by_line': by_line, 'by_package': by_package}
+
+    def get_diff_text(self, index_from=-2, index_to=-1, nr=20):
+        result = self.diff(index_from, index_to, nr=nr)
+        lines = ['Memory growth from "{}" to "{}": {:+.1f} kB'.format(result['from'], result['to'],
+                                                                    result['total'] / 1024),
+                 '',
+                 'By package:']
+        for package, size in result['by_package']:
+            lines.append('{:>12.1f} kB   {}'.format(size / 1024, package))
+        lines.append('')
+        lines.append('By line:')
+        for file_path, line, size, count in result['by_line']:
+            lines.append('{:>12.1f} kB {:>+9} blocks   {}:{}'.format(size / 1024, count, file_path, line))
+        return '\n'.join(lines)
@@ -0,0 +1,326 @@
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""
+Process wide metrics: counters, gauges and latency histograms.
+
+Usage:
+    from sharktools.core import metrics
+
+    metrics.counter('settings.writes').inc()
+    metrics.gauge('jobs.queued').set(3)
+    with metrics.histogram('page.switch_ms').time():
+        ...
+
+A MetricsExporter writes the snapshot of the registry to a json file at a regular interval and can also
+serve it on a localhost port.
+"""
+import bisect
+import collections
+import datetime
+import http.server
+import json
+import logging
+import os
+import platform
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in milliseconds
+DEFAULT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class Counter(object):
+    """ Value that only increases. """
+    kind = 'counter'
+
+    def __init__(self, name, description=''):
+        self.name = name
+        self.description = description
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def get_snapshot(self):
+        return {'type': self.kind, 'value': self.value}
+
+
+class Gauge(object):
+    """ Value that can go up and down. If func is given the value is read from func when requested. """
+    kind = 'gauge'
+
+    def __init__(self, name, description='', func=None):
+        self.name = name
+        self.description = description
+        self.func = func
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        if self.func is not None:
+            try:
+                return self.func()
+            except Exception:
+                return None
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    def get_snapshot(self):
+        return {'type': self.kind, 'value': self.value}
+
+
+class _Timer(object):
+    __slots__ = ('histogram', '_start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.histogram.observe((time.perf_counter() - self._start) * 1000)
+        return False
+
+
+class Histogram(object):
+    """
+    Distribution of observed values, typically latencies in milliseconds. Values are counted in buckets.
+    The latest nr_recent values are also kept to calculate percentiles.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, description='', buckets=DEFAULT_BUCKETS, nr_recent=1000):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.
+        self.min = None
+        self.max = None
+        self.recent = collections.deque(maxlen=nr_recent)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+            self.recent.append(value)
+
+    def time(self):
+        """ Returns a context manager that observes the elapsed time in milliseconds. """
+        return _Timer(self)
+
+    @property
+    def mean(self):
+        if not self.count:
+            return None
+        return self.sum / self.count
+
+    def get_percentile(self, percent):
+        """ Percentile (0-100) of the recent values. """
+        with self._lock:
+            values = sorted(self.recent)
+        if not values:
+            return None
+        index = min(int(round(percent / 100 * (len(values) - 1))), len(values) - 1)
+        return values[index]
+
+    def get_snapshot(self):
+        with self._lock:
+            buckets = {str(bound): count for bound, count in zip(self.buckets, self.bucket_counts)}
+            buckets['inf'] = self.bucket_counts[-1]
+            snapshot = {'type': self.kind,
+                        'count': self.count,
+                        'sum': self.sum,
+                        'min': self.min,
+                        'max': self.max,
+                        'buckets': buckets}
+        snapshot['mean'] = self.mean
+        snapshot['p50'] = self.get_percentile(50)
+        snapshot['p95'] = self.get_percentile(95)
+        return snapshot
+
+
+class MetricsRegistry(object):
+    """ Holds metrics by name. counter/gauge/histogram return the existing metric or create a new one. """
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.get(name)
+                if metric is None:
+                    metric = cls(name, **kwargs)
+                    self.metrics[name] = metric
+        if not isinstance(metric, cls):
+            raise TypeError('Metric {} is a {}, not a {}'.format(name, metric.kind, cls.kind))
+        return metric
+
+    def counter(self, name, description=''):
+        return self._get_or_create(Counter, name, description=description)
+
+    def gauge(self, name, description='', func=None):
+        gauge = self._get_or_create(Gauge, name, description=description)
+        if func is not None:
+            gauge.func = func
+        return gauge
+
+    def histogram(self, name, description='', buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, description=description, buckets=buckets)
+
+    def get(self, name):
+        return self.metrics.get(name)
+
+    def get_names(self, prefix=''):
+        return sorted(name for name in list(self.metrics) if name.startswith(prefix))
+
+    def get_snapshot(self):
+        return {name: metric.get_snapshot() for name, metric in sorted(list(self.metrics.items()))}
+
+    def clear(self):
+        with self._lock:
+            self.metrics = {}
+
+
+registry = MetricsRegistry()
+
+
+def counter(name, description=''):
+    return registry.counter(name, description)
+
+
+def gauge(name, description='', func=None):
+    return registry.gauge(name, description, func=func)
+
+
+def histogram(name, description='', buckets=DEFAULT_BUCKETS):
+    return registry.histogram(name, description, buckets=buckets)
+
+
+def get_snapshot(metrics_registry=None, **info):
+    """
+    Returns the snapshot of the registry together with information about the process and machine.
+    info is added to the header, e.g. the app version.
+    """
+    metrics_registry = metrics_registry or registry
+    header = {'time': datetime.datetime.now().isoformat(timespec='seconds'),
+              'host': platform.node(),
+              'platform': platform.platform(),
+              'python': platform.python_version(),
+              'pid': os.getpid()}
+    header.update(info)
+    return {'info': header, 'metrics': metrics_registry.get_snapshot()}
+
+
+class _MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.rstrip('/') not in ('', '/metrics'):
+            self.send_error(404)
+            return
+        body = json.dumps(self.server.exporter.get_snapshot(), indent=1).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug('metrics http: ' + format % args)
+
+
+class MetricsExporter(object):
+    """
+    Writes a snapshot of the registry to file_path every interval seconds (and at stop) from a background
+    thread. If port is given the snapshot is also served as json on http://127.0.0.1:<port>/metrics
+    """
+    def __init__(self, file_path, interval=60, port=None, metrics_registry=None, **info):
+        self.file_path = Path(file_path)
+        self.interval = interval
+        self.port = port
+        self.registry = metrics_registry or registry
+        self.info = info
+        self._thread = None
+        self._server = None
+        self._stop = threading.Event()
+
+    def get_snapshot(self):
+        return get_snapshot(self.registry, **self.info)
+
+    def write(self):
+        """ Writes the snapshot. The file is replaced atomically so that readers never see half a file. """
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.file_path.with_name(self.file_path.name + '.tmp')
+        with open(tmp_path, 'w') as fid:
+            json.dump(self.get_snapshot(), fid, indent=1)
+        os.replace(tmp_path, self.file_path)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='metrics-exporter', daemon=True)
+        self._thread.start()
+        if self.port:
+            self._start_server()
+
+    def _start_server(self):
+        try:
+            self._server = http.server.ThreadingHTTPServer(('127.0.0.1', self.port), _MetricsRequestHandler)
+        except OSError:
+            logger.exception('Could not serve metrics on port {}'.format(self.port))
+            self._server = None
+            return
+        self._server.daemon_threads = True
+        self._server.exporter = self
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        logger.info('Serving metrics on http://127.0.0.1:{}/metrics'.format(self.port))
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(5)
+        self._thread = None
+        self._write_safe()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._write_safe()
+
+    def _write_safe(self):
+        try:
+            self.write()
+        except Exception:
+            logger.exception('Could not write metrics to {}'.format(self.file_path))
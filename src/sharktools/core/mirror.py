@@ -0,0 +1,531 @@
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""
+Local mirror of a (network mounted) directory, e.g. ~/sharktools on a SMB/NFS home share.
+
+Files accessed through read_text/write_text/exists in this module are read from a local copy. Writes go to
+the local copy first and are copied to the remote directory by a background thread. Files outside any
+registered mirror are read and written directly, so code using these functions works the same with or
+without a mirror:
+
+    from sharktools.core import mirror
+
+    directory_mirror = mirror.DirectoryMirror(remote_directory, local_directory)
+    mirror.register_mirror(directory_mirror)
+    directory_mirror.start()
+
+    content = mirror.read_text(file_path)
+    mirror.write_text(file_path, content)
+
+Subdirectories are listed with list_directories. The listing is made from the local copy and is updated from
+the remote directory by the background thread, which also copies the files of new subdirectories.
+
+Conflicts are detected with the modification time and the content hash of the remote file. If the remote
+file has been changed (e.g. by another computer) since it was last synced and there are local changes, the
+local version is written and the remote version is kept next to it as <name>.conflict-<time><suffix>.
+"""
+import datetime
+import hashlib
+import json
+import locale
+import logging
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+from sharktools.core import metrics
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE_NAME = 'mirror_state.json'
+SETTINGS_FILE_NAME = 'mirror_settings.json'
+
+
+def get_default_local_directory():
+    """ Local (not roaming) cache directory for the mirror. In sharktools.instance.get_local_directory(). """
+    if sys.platform == 'win32' and os.environ.get('LOCALAPPDATA'):
+        return Path(os.environ['LOCALAPPDATA'], 'sharktools', 'mirror')
+    cache_directory = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(cache_directory, 'sharktools', 'mirror')
+
+
+def get_local_settings(file_path=None):
+    """
+    Returns the mirror settings saved on this computer with save_local_settings. They are read before any file in
+    the remote directory so that the mirror can be used from the start.
+    :return: dict, empty if no settings are saved
+    """
+    file_path = file_path or Path(get_default_local_directory(), SETTINGS_FILE_NAME)
+    try:
+        with open(file_path) as fid:
+            return json.load(fid)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_local_settings(settings, file_path=None):
+    file_path = file_path or Path(get_default_local_directory(), SETTINGS_FILE_NAME)
+    _write_atomic(Path(file_path), json.dumps(settings).encode())
+
+
+def _get_hash(content):
+    return hashlib.sha1(content).hexdigest()
+
+
+def _write_atomic(file_path, content):
+    """ Writes bytes to file_path via a temporary file so that readers never see half a file. """
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    # Unique temporary file so that concurrent writers do not replace each other's temporary file
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=file_path.name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fid:
+            fid.write(content)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class DirectoryMirror(object):
+    """
+    Keeps a local copy of the files in remote_directory that are accessed through the mirror.
+
+    For each file the mtime and hash of the remote file at the last sync are kept in a state file in
+    local_directory, together with a pending flag for local changes that are not yet copied. Pending changes
+    survive a restart and are copied when the mirror is started again.
+    """
+    def __init__(self, remote_directory, local_directory=None, sync_interval=2, pull_interval=60):
+        """
+        :param sync_interval: seconds between copying local changes to the remote directory
+        :param pull_interval: seconds between checking the remote directory for changes made elsewhere
+        """
+        self.remote_directory = Path(os.path.abspath(remote_directory))
+        self.local_directory = Path(local_directory or get_default_local_directory())
+        self.sync_interval = sync_interval
+        self.pull_interval = pull_interval
+        self.state_file_path = Path(self.local_directory, STATE_FILE_NAME)
+
+        self._state = {}
+        self._listed_keys = set()
+        self._listings_requested = False
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.online = True
+        self.last_sync_time = None
+        self.last_error = None
+        self.conflicts = []
+
+        self._load_state()
+
+    def _load_state(self):
+        if not self.state_file_path.exists():
+            return
+        try:
+            with open(self.state_file_path) as fid:
+                self._state = json.load(fid)
+        except (OSError, ValueError):
+            logger.exception('Could not load mirror state {}. Local copies are synced again.'.format(
+                self.state_file_path))
+            self._state = {}
+
+    def _save_state(self):
+        # The lock is held while writing so that an older snapshot can not replace a newer one
+        with self._lock:
+            _write_atomic(self.state_file_path, json.dumps(self._state).encode())
+
+    def covers(self, file_path):
+        try:
+            Path(os.path.abspath(file_path)).relative_to(self.remote_directory)
+        except ValueError:
+            return False
+        return True
+
+    def _get_key(self, file_path):
+        return Path(os.path.abspath(file_path)).relative_to(self.remote_directory).as_posix()
+
+    def _get_local_path(self, key):
+        return Path(self.local_directory, 'files', key)
+
+    def _get_remote_path(self, key):
+        return Path(self.remote_directory, key)
+
+    @property
+    def nr_pending(self):
+        with self._lock:
+            return sum(1 for item in self._state.values() if item.get('pending'))
+
+    def exists(self, file_path):
+        key = self._get_key(file_path)
+        if key in self._state or self._get_local_path(key).exists():
+            return True
+        return self._get_remote_path(key).exists()
+
+    def makedirs(self, directory):
+        """ Only the local directory is made. Remote directories are made when files are copied. """
+        self._get_local_path(self._get_key(directory)).mkdir(parents=True, exist_ok=True)
+
+    def list_directories(self, directory):
+        """
+        Returns the subdirectories of directory (as paths in the remote directory) found in the local copy. The
+        remote directory is only listed here the first time. Later the listing is updated by the background thread.
+        """
+        key = self._get_key(directory)
+        local_directory = self._get_local_path(key)
+        with self._lock:
+            is_listed = key in self._listed_keys
+            self._listed_keys.add(key)
+            self._listings_requested = True
+        if not is_listed and not local_directory.is_dir():
+            try:
+                self._update_listing(key, prefetch=False)
+            except OSError:
+                logger.debug('Could not list {}'.format(self._get_remote_path(key)), exc_info=True)
+        self._wake.set()
+        if not local_directory.is_dir():
+            return []
+        return sorted(Path(directory, path.name) for path in local_directory.iterdir() if path.is_dir())
+
+    def _update_listing(self, key, prefetch=True):
+        """
+        Makes a local directory for each subdirectory of the remote directory "key". If prefetch is True, files
+        directly in subdirectories that have not been copied before are copied (e.g. the settings of a new user).
+        """
+        remote_directory = self._get_remote_path(key)
+        for remote_path in remote_directory.iterdir():
+            if not remote_path.is_dir():
+                continue
+            sub_key = self._get_key(remote_path)
+            self._get_local_path(sub_key).mkdir(parents=True, exist_ok=True)
+            if not prefetch:
+                continue
+            for remote_file_path in remote_path.iterdir():
+                file_key = self._get_key(remote_file_path)
+                if file_key in self._state or not remote_file_path.is_file():
+                    continue
+                self._copy_from_remote(file_key)
+
+    def _update_listings(self):
+        with self._lock:
+            keys = sorted(self._listed_keys)
+            self._listings_requested = False
+        for key in keys:
+            try:
+                self._update_listing(key)
+            except FileNotFoundError:
+                # Only made locally so far
+                continue
+
+    def _copy_from_remote(self, key):
+        """ Makes a local copy of a file that has not been copied before. Returns the content of the local copy. """
+        remote_path = self._get_remote_path(key)
+        with open(remote_path, 'rb') as fid:
+            content = fid.read()
+        mtime = remote_path.stat().st_mtime
+        with self._lock:
+            local_path = self._get_local_path(key)
+            if key in self._state and local_path.exists():
+                # Copied or written by another thread meanwhile
+                with open(local_path, 'rb') as fid:
+                    return fid.read()
+            _write_atomic(local_path, content)
+            self._state[key] = dict(mtime=mtime, hash=_get_hash(content), pending=False)
+            self._save_state()
+        metrics.counter('mirror.pulled').inc()
+        return content
+
+    def read_bytes(self, file_path):
+        """
+        Returns the local copy. The first time a file is read it is copied from the remote directory (unless it
+        has been copied by the background thread).
+        :raises FileNotFoundError: if the file exists neither locally nor in the remote directory
+        """
+        key = self._get_key(file_path)
+        local_path = self._get_local_path(key)
+        with self._lock:
+            if key in self._state and local_path.exists():
+                with open(local_path, 'rb') as fid:
+                    return fid.read()
+        return self._copy_from_remote(key)
+
+    def write_bytes(self, file_path, content):
+        """ Writes the local copy and marks it for copying to the remote directory. """
+        key = self._get_key(file_path)
+        base = None
+        while True:
+            with self._lock:
+                item = self._state.get(key)
+                if item is not None or base is not None:
+                    _write_atomic(self._get_local_path(key), content)
+                    if item is None:
+                        item = self._state[key] = base
+                    item['pending'] = True
+                    break
+            # First write of a file that was not read through the mirror (or was removed by pull meanwhile).
+            # The remote version is the base. Read without the lock since the remote directory may be slow.
+            base = self._get_remote_base(key)
+        self._save_state()
+        metrics.gauge('mirror.pending').set(self.nr_pending)
+        self._wake.set()
+
+    def _get_remote_base(self, key):
+        remote_path = self._get_remote_path(key)
+        try:
+            with open(remote_path, 'rb') as fid:
+                return dict(mtime=remote_path.stat().st_mtime, hash=_get_hash(fid.read()))
+        except OSError:
+            # Missing, or offline. In the latter case an existing remote file is treated as a conflict.
+            return dict(mtime=None, hash=None)
+
+    def get_status(self):
+        """ :return: dict with state ("synced", "pending", "offline" or "conflict") and details """
+        nr_pending = self.nr_pending
+        if not self.online:
+            state = 'offline'
+        elif self.conflicts:
+            state = 'conflict'
+        elif nr_pending:
+            state = 'pending'
+        else:
+            state = 'synced'
+        return dict(state=state,
+                    pending=nr_pending,
+                    last_sync_time=self.last_sync_time,
+                    last_error=self.last_error,
+                    conflicts=list(self.conflicts),
+                    remote_directory=str(self.remote_directory),
+                    local_directory=str(self.local_directory))
+
+    def get_status_text(self):
+        status = self.get_status()
+        if status['state'] == 'offline':
+            return 'Sync: offline ({} pending)'.format(status['pending'])
+        if status['state'] == 'conflict':
+            return 'Sync: {} conflict(s)'.format(len(status['conflicts']))
+        if status['state'] == 'pending':
+            return 'Sync: {} pending'.format(status['pending'])
+        return 'Sync: up to date'
+
+    def clear_conflicts(self):
+        self.conflicts = []
+
+    def push(self):
+        """ Copies all pending local changes to the remote directory. Returns the number of copied files. """
+        with self._lock:
+            keys = [key for key, item in self._state.items() if item.get('pending')]
+        nr_pushed = 0
+        for key in keys:
+            self._push_file(key)
+            nr_pushed += 1
+        if keys:
+            self._save_state()
+        metrics.gauge('mirror.pending').set(self.nr_pending)
+        return nr_pushed
+
+    def _push_file(self, key):
+        local_path = self._get_local_path(key)
+        remote_path = self._get_remote_path(key)
+        with self._lock:
+            with open(local_path, 'rb') as fid:
+                content = fid.read()
+            base = dict(self._state[key])
+        if self._remote_changed(remote_path, base, content):
+            self._keep_conflict(key, remote_path)
+        _write_atomic(remote_path, content)
+        with self._lock:
+            item = self._state[key]
+            item['mtime'] = remote_path.stat().st_mtime
+            item['hash'] = _get_hash(content)
+            # The local copy may have been written again while copying
+            with open(local_path, 'rb') as fid:
+                item['pending'] = _get_hash(fid.read()) != item['hash']
+        metrics.counter('mirror.pushed').inc()
+
+    @staticmethod
+    def _remote_changed(remote_path, base, content):
+        """
+        True if the remote file has been changed since the last sync and differs from content (the local
+        version). Hash is only checked if mtime differs.
+        """
+        try:
+            mtime = remote_path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        if base['hash'] is not None and mtime == base['mtime']:
+            return False
+        with open(remote_path, 'rb') as fid:
+            remote_hash = _get_hash(fid.read())
+        # No base if the file was first written while offline
+        return remote_hash not in (base['hash'], _get_hash(content))
+
+    def _keep_conflict(self, key, remote_path):
+        time_string = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        conflict_path = remote_path.with_name('{}.conflict-{}{}'.format(remote_path.stem, time_string,
+                                                                        remote_path.suffix))
+        os.replace(remote_path, conflict_path)
+        self.conflicts.append(str(conflict_path))
+        metrics.counter('mirror.conflicts').inc()
+        logger.warning('{} was changed both locally and in {}. The remote version is kept as {}'.format(
+            key, self.remote_directory, conflict_path))
+
+    def pull(self):
+        """
+        Updates local copies without pending changes from the remote directory. Objects that have already read
+        a file (e.g. UserSettings) are not reloaded.
+        """
+        with self._lock:
+            keys = [key for key, item in self._state.items() if not item.get('pending')]
+        changed = False
+        for key in keys:
+            remote_path = self._get_remote_path(key)
+            with self._lock:
+                base = dict(self._state[key])
+            try:
+                mtime = remote_path.stat().st_mtime
+            except FileNotFoundError:
+                with self._lock:
+                    if not self._state[key].get('pending'):
+                        self._state.pop(key)
+                        self._get_local_path(key).unlink(missing_ok=True)
+                        changed = True
+                continue
+            if mtime == base['mtime']:
+                continue
+            with open(remote_path, 'rb') as fid:
+                content = fid.read()
+            content_hash = _get_hash(content)
+            with self._lock:
+                if self._state[key].get('pending'):
+                    continue
+                if content_hash != base['hash']:
+                    _write_atomic(self._get_local_path(key), content)
+                    metrics.counter('mirror.pulled').inc()
+                self._state[key].update(mtime=mtime, hash=content_hash)
+                changed = True
+        if changed:
+            self._save_state()
+
+    def sync(self, pull=False):
+        """ Pushes pending changes (and pulls remote changes if pull is True). Errors are kept in the status. """
+        try:
+            if not self.remote_directory.is_dir():
+                # Not mounted. Do not take missing files as deleted.
+                raise FileNotFoundError('Directory {} not found'.format(self.remote_directory))
+            with metrics.histogram('mirror.sync_ms').time():
+                self.push()
+                if pull:
+                    self.pull()
+                if pull or self._listings_requested:
+                    self._update_listings()
+        except OSError as e:
+            if self.online:
+                logger.warning('Could not sync with {}: {}'.format(self.remote_directory, e))
+            self.online = False
+            self.last_error = str(e)
+            return False
+        self.online = True
+        self.last_error = None
+        self.last_sync_time = datetime.datetime.now()
+        return True
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='directory-mirror', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """ Stops the sync thread and makes a last attempt to copy pending changes. """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self.sync()
+
+    def _run(self):
+        # Pending changes from an earlier session are copied first
+        self.sync(pull=True)
+        seconds_since_pull = 0
+        while not self._stop.is_set():
+            self._wake.wait(self.sync_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            seconds_since_pull += self.sync_interval
+            pull = seconds_since_pull >= self.pull_interval
+            if pull:
+                seconds_since_pull = 0
+            if pull or self.nr_pending or self._listings_requested or not self.online:
+                self.sync(pull=pull)
+
+
+_mirrors = []
+
+
+def register_mirror(directory_mirror):
+    if directory_mirror not in _mirrors:
+        _mirrors.append(directory_mirror)
+
+
+def unregister_mirror(directory_mirror):
+    if directory_mirror in _mirrors:
+        _mirrors.remove(directory_mirror)
+
+
+def get_mirror(file_path):
+    """ :return: the registered DirectoryMirror covering file_path, or None """
+    for directory_mirror in _mirrors:
+        if directory_mirror.covers(file_path):
+            return directory_mirror
+    return None
+
+
+def exists(file_path):
+    directory_mirror = get_mirror(file_path)
+    if directory_mirror:
+        return directory_mirror.exists(file_path)
+    return os.path.exists(file_path)
+
+
+def makedirs(directory):
+    directory_mirror = get_mirror(directory)
+    if directory_mirror:
+        directory_mirror.makedirs(directory)
+    else:
+        os.makedirs(directory, exist_ok=True)
+
+
+def list_directories(directory):
+    """ :return: sorted subdirectories of directory """
+    directory_mirror = get_mirror(directory)
+    if directory_mirror:
+        return directory_mirror.list_directories(directory)
+    return sorted(path for path in Path(directory).iterdir() if path.is_dir())
+
+
+def read_text(file_path, encoding=None):
+    """ :param encoding: default is the locale encoding, as for open() """
+    directory_mirror = get_mirror(file_path)
+    if directory_mirror:
+        return directory_mirror.read_bytes(file_path).decode(encoding or locale.getpreferredencoding(False))
+    with open(file_path, encoding=encoding) as fid:
+        return fid.read()
+
+
+def write_text(file_path, content, encoding=None):
+    directory_mirror = get_mirror(file_path)
+    if directory_mirror:
+        directory_mirror.write_bytes(file_path, content.encode(encoding or locale.getpreferredencoding(False)))
+        return
+    with open(file_path, 'w', encoding=encoding) as fid:
+        fid.write(content)
@@ -0,0 +1,126 @@
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""
+Paths with placeholders, e.g. as stored in settings files:
+
+    {root}/settings_files       the sharktools package directory
+    {home}/plugins              the sharktools home directory (~/sharktools)
+    {plugin}/mapping_files      the directory of a plugin
+
+A path is resolved by replacing a leading {token}. Paths under a token directory are stored with the token
+so that settings still work if sharktools is installed somewhere else. Paths stored by older versions
+start with "root" ("root/settings_files") and are still understood.
+"""
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'^\{(\w+)\}(?:[\\/](.*))?$')
+LEGACY_ROOT_PATTERN = re.compile(r'^root(?:[\\/](.*))?$')
+
+
+class PathTokenResolver(object):
+    """
+    Converts between paths with tokens and Path objects. Results are cached so that repeated lookups (e.g. of
+    directory settings in UI code) are dictionary hits.
+    """
+    def __init__(self, **tokens):
+        """
+        :param tokens: token name and directory, e.g. root=<package directory>, home=<home directory>
+        """
+        self._tokens = {}
+        self._resolved = {}
+        self._tokenized = {}
+        self._lock = threading.Lock()
+        for name, directory in tokens.items():
+            self.set_token(name, directory)
+
+    @property
+    def tokens(self):
+        return dict(self._tokens)
+
+    def set_token(self, name, directory):
+        with self._lock:
+            if directory is None:
+                self._tokens.pop(name, None)
+            else:
+                self._tokens[name] = Path(os.path.abspath(directory))
+            self._resolved = {}
+            self._tokenized = {}
+
+    def with_tokens(self, **tokens):
+        """ Returns a new resolver with the tokens of this one and the given tokens, e.g. plugin=<directory>. """
+        all_tokens = self.tokens
+        all_tokens.update(tokens)
+        return PathTokenResolver(**all_tokens)
+
+    def resolve(self, path):
+        """
+        :param path: str with or without a leading {token}, or a Path
+        :return: Path. None if path is None or empty
+        """
+        if not path:
+            return None
+        if isinstance(path, Path):
+            return path
+        resolved = self._resolved.get(path)
+        if resolved is None:
+            resolved = self._resolve(path)
+            with self._lock:
+                self._resolved[path] = resolved
+        return resolved
+
+    def _resolve(self, path):
+        match = TOKEN_PATTERN.match(path)
+        if match:
+            name, rest = match.groups()
+            directory = self._tokens.get(name)
+            if directory is None:
+                logger.warning('Unknown token {{{}}} in path {}'.format(name, path))
+                return Path(path)
+            return Path(directory, rest) if rest else directory
+        match = LEGACY_ROOT_PATTERN.match(path)
+        if match and 'root' in self._tokens:
+            rest = match.group(1)
+            return Path(self._tokens['root'], rest) if rest else self._tokens['root']
+        return Path(path)
+
+    def tokenize(self, path):
+        """
+        Returns path as str with the token of the innermost token directory that path is in, e.g.
+        "{root}/settings_files". Paths outside all token directories are returned unchanged (as str).
+        """
+        if not path:
+            return path
+        key = str(path)
+        tokenized = self._tokenized.get(key)
+        if tokenized is None:
+            tokenized = self._tokenize(key)
+            with self._lock:
+                self._tokenized[key] = tokenized
+        return tokenized
+
+    def _tokenize(self, path):
+        if TOKEN_PATTERN.match(path):
+            return path
+        absolute_path = Path(os.path.abspath(path)) if os.path.isabs(path) else None
+        if absolute_path is None:
+            return path
+        best = None
+        for name, directory in self._tokens.items():
+            try:
+                relative_path = absolute_path.relative_to(directory)
+            except ValueError:
+                continue
+            if best is None or len(relative_path.parts) < len(best[1].parts):
+                best = (name, relative_path)
+        if best is None:
+            return path
+        name, relative_path = best
+        if not relative_path.parts:
+            return '{{{}}}'.format(name)
+        return '{{{}}}/{}'.format(name, relative_path.as_posix())
@@ -3,13 +3,28 @@
 
 import os
 
+from sharktools.core.path_tokens import PathTokenResolver
+
 
 class Paths(object):
     """
     Class holds paths to all directories and files.
     """
-    def __init__(self, app_directory):
+    def __init__(self, app_directory, path_resolver=None):
+        """
+        :param path_resolver: core.PathTokenResolver. Paths given to resolve() may start with a token, e.g.
+                              "{root}/..." or "{plugin}/..." in a plugin
+        """
         self.app_directory = app_directory
+        self.path_resolver = path_resolver or PathTokenResolver(root=app_directory)
 
         self.directory_settings_files = os.path.join(self.app_directory, 'settings_files')
-        self.directory_mapping_files = os.path.join(self.app_directory, 'mapping_files')
\ No newline at end of file
+        self.directory_mapping_files = os.path.join(self.app_directory, 'mapping_files')
+
+    def resolve(self, path):
+        """ :return: Path with tokens replaced. Cached """
+        return self.path_resolver.resolve(path)
+
+    def tokenize(self, path):
+        """ :return: str with the token of the directory that path is in, e.g. "{plugin}/mapping_files" """
+        return self.path_resolver.tokenize(path)
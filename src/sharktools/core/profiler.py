@@ -0,0 +1,169 @@
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+
+import collections
+import datetime
+import logging
+import marshal
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler(object):
+    """
+    Low overhead statistical profiler. A helper thread samples the stacks of all other threads every
+    "interval" seconds. The result can be saved as collapsed stacks (input to flame graph tools) and as a
+    pstats file (python -m pstats / snakeviz).
+    """
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start_time = None
+        self.stop_time = None
+        self.nr_samples = 0
+        # (thread name, (code key, ...)) root first -> sampled seconds
+        self._stacks = collections.Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def duration(self):
+        if self.start_time is None:
+            return 0.
+        stop_time = self.stop_time if self.stop_time is not None else time.monotonic()
+        return stop_time - self.start_time
+
+    def start(self):
+        if self.is_running:
+            return
+        with self._lock:
+            self._stacks = collections.Counter()
+            self.nr_samples = 0
+        self.start_time = time.monotonic()
+        self.stop_time = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        logger.info('Sampling profiler started')
+
+    def stop(self):
+        if not self.is_running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.stop_time = time.monotonic()
+        logger.info('Sampling profiler stopped after {:.1f} s and {} samples'.format(self.duration,
+                                                                                    self.nr_samples))
+
+    def _run(self):
+        own_id = threading.get_ident()
+        last_time = time.monotonic()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            weight = now - last_time
+            last_time = now
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                self.nr_samples += 1
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                        frame = frame.f_back
+                    stack.reverse()
+                    self._stacks[(thread_names.get(thread_id, str(thread_id)), tuple(stack))] += weight
+
+    def get_collapsed_lines(self):
+        """
+        Returns lines in the "collapsed stack" format: "thread;module:func:line;module:func:line <ms>".
+        The weight of each stack is the sampled time in milliseconds.
+        """
+        lines = []
+        with self._lock:
+            items = list(self._stacks.items())
+        for (thread_name, stack), seconds in items:
+            names = [thread_name.replace(';', '_').replace(' ', '_')]
+            for file_path, line, func in stack:
+                names.append('{}:{}:{}'.format(Path(file_path).stem, func, line).replace(';', '_').replace(' ', '_'))
+            lines.append('{} {}'.format(';'.join(names), max(int(round(seconds * 1000)), 1)))
+        return sorted(lines)
+
+    def get_stats(self):
+        """
+        Returns the samples as a stats dict in the format used by pstats:
+        {(file, line, func): (primitive calls, calls, self time, cumulative time, callers)}
+        Calls are the number of distinct sampled stacks where the function is present.
+        """
+        own = collections.Counter()
+        cumulative = collections.Counter()
+        calls = collections.Counter()
+        callers = collections.defaultdict(collections.Counter)
+        with self._lock:
+            items = list(self._stacks.items())
+        for (thread_name, stack), seconds in items:
+            if not stack:
+                continue
+            own[stack[-1]] += seconds
+            for key in set(stack):
+                cumulative[key] += seconds
+                calls[key] += 1
+            for caller, callee in set(zip(stack[:-1], stack[1:])):
+                callers[callee][caller] += seconds
+        stats = {}
+        for key in cumulative:
+            key_callers = {}
+            for caller, seconds in callers[key].items():
+                key_callers[caller] = (1, 1, seconds, seconds)
+            stats[key] = (calls[key], calls[key], own[key], cumulative[key], key_callers)
+        return stats
+
+    def get_hotspots(self, nr=20):
+        """
+        Returns the nr functions with most self time as a list of (self seconds, cumulative seconds, key).
+        Idle waits in the threading module (helper threads waiting for work) are not included.
+        """
+        stats = self.get_stats()
+        items = [item for item in stats.items() if os.path.basename(item[0][0]) != 'threading.py']
+        items = sorted(items, key=lambda item: -item[1][2])[:nr]
+        return [(value[2], value[3], key) for key, value in items]
+
+    def get_hotspots_text(self, nr=20):
+        lines = ['Profiled {:.1f} s, {} samples'.format(self.duration, self.nr_samples),
+                 '',
+                 '{:>10} {:>10}   {}'.format('self [s]', 'cum [s]', 'function')]
+        for own, cumulative, (file_path, line, func) in self.get_hotspots(nr):
+            lines.append('{:>10.3f} {:>10.3f}   {} ({}:{})'.format(own, cumulative, func,
+                                                                 os.path.basename(file_path), line))
+        return '\n'.join(lines)
+
+    def save(self, directory, name='profile'):
+        """
+        Saves the collapsed stacks and the pstats file in directory.
+        :return: tuple (collapsed_file_path, pstats_file_path)
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        time_string = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        collapsed_file_path = Path(directory, '{}_{}.collapsed'.format(name, time_string))
+        pstats_file_path = Path(directory, '{}_{}.pstats'.format(name, time_string))
+        with open(collapsed_file_path, 'w') as fid:
+            fid.write('\n'.join(self.get_collapsed_lines()))
+            fid.write('\n')
+        with open(pstats_file_path, 'wb') as fid:
+            marshal.dump(self.get_stats(), fid)
+        logger.info('Profile saved to {} and {}'.format(collapsed_file_path, pstats_file_path))
+        return collapsed_file_path, pstats_file_path
@@ -0,0 +1,153 @@
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Task(object):
+    """
+    Handle for a long running operation. The worker updates the progress and the GUI reads it.
+    All attributes are safe to read from another thread.
+    """
+    def __init__(self, name='', maximum=None):
+        self.name = name
+        self.maximum = maximum
+        self.value = 0
+        self.message = ''
+        self.result = None
+        self.exception = None
+        self.start_time = None
+        self.end_time = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def __repr__(self):
+        return 'Task({!r}, value={}, maximum={}, done={})'.format(self.name, self.value, self.maximum,
+                                                                 self.is_done)
+
+    def start(self):
+        with self._lock:
+            self.start_time = time.monotonic()
+        return self
+
+    def set_progress(self, value, maximum=None, message=None):
+        """
+        Sets the current progress. maximum and message are only changed if given.
+        :param value:
+        :param maximum:
+        :param message:
+        :return:
+        """
+        with self._lock:
+            if self.start_time is None:
+                self.start_time = time.monotonic()
+            self.value = value
+            if maximum is not None:
+                self.maximum = maximum
+            if message is not None:
+                self.message = message
+
+    def step(self, nr=1, message=None):
+        with self._lock:
+            if self.start_time is None:
+                self.start_time = time.monotonic()
+            self.value += nr
+            if message is not None:
+                self.message = message
+
+    def finish(self, result=None, exception=None):
+        with self._lock:
+            if self.start_time is None:
+                self.start_time = time.monotonic()
+            self.end_time = time.monotonic()
+            self.result = result
+            self.exception = exception
+            if self.maximum and not exception:
+                self.value = self.maximum
+        self._done.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    @property
+    def is_running(self):
+        return self.start_time is not None and not self._done.is_set()
+
+    @property
+    def is_done(self):
+        return self._done.is_set()
+
+    @property
+    def determinate(self):
+        return bool(self.maximum)
+
+    @property
+    def fraction(self):
+        """ Returns progress as a number between 0 and 1 or None if maximum is unknown. """
+        with self._lock:
+            if not self.maximum:
+                return None
+            return min(max(self.value / self.maximum, 0.), 1.)
+
+    @property
+    def elapsed(self):
+        """ Seconds since the task started. """
+        with self._lock:
+            if self.start_time is None:
+                return 0.
+            end_time = self.end_time if self.end_time is not None else time.monotonic()
+            return end_time - self.start_time
+
+    @property
+    def remaining(self):
+        """ Estimated seconds left based on the mean rate so far. None if it can not be estimated. """
+        fraction = self.fraction
+        if self.is_done:
+            return 0.
+        if not fraction:
+            return None
+        elapsed = self.elapsed
+        return elapsed / fraction - elapsed
+
+
+def run_task_in_thread(func, task=None, name='', maximum=None):
+    """
+    Runs func(task) in a daemon thread. The task is finished with the return value of func or with the
+    exception raised. The task is returned so that the caller can follow the progress.
+    :param func: callable that takes the task as the only argument
+    :param task: Task. A new task is created if not given
+    :param name:
+    :param maximum:
+    :return: Task
+    """
+    if task is None:
+        task = Task(name=name, maximum=maximum)
+
+    def _run():
+        task.start()
+        try:
+            result = func(task)
+        except Exception as e:
+            logger.exception('Task {} failed'.format(task.name))
+            task.finish(exception=e)
+        else:
+            task.finish(result=result)
+
+    threading.Thread(target=_run, name='task-{}'.format(task.name), daemon=True).start()
+    return task
+
+
+def format_seconds(seconds):
+    """ Returns seconds as a short human readable string, e.g. 1:05:03 or 2:07. """
+    if seconds is None:
+        return '-'
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return '{}:{:02d}:{:02d}'.format(hours, minutes, seconds)
+    return '{}:{:02d}'.format(minutes, seconds)
@@ -0,0 +1,195 @@
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""
+Timing spans kept in an in-memory ring buffer. Spans can be exported to the Chrome trace event format
+and opened in chrome://tracing or https://ui.perfetto.dev
+
+Usage:
+    from sharktools.core import tracing
+
+    with tracing.span('load files', nr_files=len(files)):
+        ...
+
+    @tracing.traced('MyPlugin.process')
+    def process(self):
+        ...
+"""
+import collections
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_BUFFER_SIZE = 100000
+
+_buffer = collections.deque(maxlen=DEFAULT_BUFFER_SIZE)
+_thread_names = {}
+_enabled = True
+_time_zero = time.perf_counter_ns()
+
+
+class SpanRecord(object):
+    __slots__ = ('name', 'category', 'start', 'duration', 'thread_id', 'attributes')
+
+    def __init__(self, name, category, start, duration, thread_id, attributes):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.duration = duration
+        self.thread_id = thread_id
+        self.attributes = attributes
+
+    @property
+    def duration_ms(self):
+        return self.duration / 1e6
+
+    def __repr__(self):
+        return 'SpanRecord({!r}, {:.3f} ms)'.format(self.name, self.duration_ms)
+
+
+class Span(object):
+    """
+    Context manager (and decorator) that records a span. Attributes can be added while the span is open
+    with set_attribute. Use the function span() to create one.
+    """
+    __slots__ = ('name', 'category', 'attributes', '_start')
+
+    def __init__(self, name, category='sharktools', **attributes):
+        self.name = name
+        self.category = category
+        self.attributes = attributes
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if not _enabled:
+            return False
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.attributes['exception'] = exc_type.__name__
+        _record(self.name, self.category, self._start, end - self._start, self.attributes)
+        return False
+
+    def __call__(self, func):
+        name, category, attributes = self.name, self.category, self.attributes
+
+        @functools.wraps(func)
+        def _wrapper(*args, **kwargs):
+            with Span(name, category, **attributes):
+                return func(*args, **kwargs)
+        return _wrapper
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+def span(name, category='sharktools', **attributes):
+    """ Returns a Span. Use as "with span('name', key=value):" or as a decorator "@span('name')". """
+    return Span(name, category, **attributes)
+
+
+def traced(name=None, category='sharktools'):
+    """ Decorator recording a span for every call. name defaults to the qualified name of the function. """
+    def _decorator(func):
+        return Span(name or func.__qualname__, category)(func)
+    return _decorator
+
+
+def _record(name, category, start, duration, attributes):
+    thread = threading.current_thread()
+    if thread.ident not in _thread_names:
+        _thread_names[thread.ident] = thread.name
+    _buffer.append(SpanRecord(name, category, start, duration, thread.ident, attributes))
+
+
+def add_span(name, start, end=None, category='sharktools', **attributes):
+    """
+    Records a span from start to end (time.perf_counter_ns() values). end defaults to now.
+    Useful when the span does not fit in a with block.
+    """
+    if _enabled:
+        if end is None:
+            end = time.perf_counter_ns()
+        _record(name, category, start, end - start, attributes)
+
+
+def instant(name, category='sharktools', **attributes):
+    """ Records an event without duration. """
+    if _enabled:
+        _record(name, category, time.perf_counter_ns(), 0, attributes)
+
+
+def enable(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+
+def set_buffer_size(size):
+    """ Sets the maximum number of spans kept. The oldest spans are dropped first. """
+    global _buffer
+    _buffer = collections.deque(_buffer, maxlen=size)
+
+
+def clear():
+    _buffer.clear()
+
+
+def get_spans(name=None, category=None):
+    """ Returns a list of the recorded spans (oldest first), optionally filtered on name/category. """
+    spans = list(_buffer)
+    if name is not None:
+        spans = [s for s in spans if s.name == name]
+    if category is not None:
+        spans = [s for s in spans if s.category == category]
+    return spans
+
+
+def get_chrome_trace():
+    """ Returns the recorded spans as a dict in the Chrome trace event format. """
+    pid = os.getpid()
+    events = []
+    for thread_id, thread_name in list(_thread_names.items()):
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id,
+                       'args': {'name': thread_name}})
+    for record in list(_buffer):
+        event = {'name': record.name,
+                 'cat': record.category,
+                 'ph': 'X' if record.duration else 'i',
+                 'ts': (record.start - _time_zero) / 1000,
+                 'pid': pid,
+                 'tid': record.thread_id,
+                 'args': {key: _to_json_value(value) for key, value in record.attributes.items()}}
+        if record.duration:
+            event['dur'] = record.duration / 1000
+        else:
+            event['s'] = 't'
+        events.append(event)
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def _to_json_value(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def export_chrome_trace(file_path=None, directory=None):
+    """
+    Writes the recorded spans to a Chrome trace JSON file.
+    If file_path is not given a time stamped file is created in directory.
+    :return: path to the file
+    """
+    if file_path is None:
+        time_string = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        file_path = Path(directory or '.', 'trace_{}.json'.format(time_string))
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(file_path, 'w') as fid:
+        json.dump(get_chrome_trace(), fid)
+    return file_path
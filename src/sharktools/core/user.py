@@ -1,45 +1,200 @@
+import contextlib
 import datetime
 import json
-import logging
 import os
 import shutil
 import socket
+import tempfile
 from pathlib import Path
 
 # import pandas as pd
 
+from sharktools.core import metrics
+from sharktools.core import mirror
+from sharktools.core.path_tokens import PathTokenResolver
+from sharktools.core import tracing
 from sharktools.core.exceptions import *
+from sharktools.core.logs import get_logger
 
-gui_logger = logging.getLogger('gui_logger')
+# get and setdefault are called very often. Limit the debug output per call site.
+gui_logger = get_logger('gui_logger', max_per_second=20)
+
+
+class UserIndex(object):
+    """
+    Index of all users: last used time and the users directories (one per plugin or shared) the user
+    exists in. Kept in a json file so that user lists and menus can be built without scanning directories.
+    version is increased on every change so that views know when to rebuild.
+    """
+    def __init__(self, file_path=None, read_only=False):
+        self.file_path = file_path
+        self.read_only = read_only
+        self.version = 0
+        self.data = {}
+        self._save_delayed = 0
+        self._save_pending = False
+        self._load()
+
+    def _load(self):
+        if not self.file_path or not mirror.exists(self.file_path):
+            return
+        try:
+            self.data = json.loads(mirror.read_text(self.file_path))
+        except (OSError, ValueError):
+            gui_logger.warning('Could not read user index {}. It is rebuilt.'.format(self.file_path))
+            self.data = {}
+
+    def reload(self):
+        self.data = {}
+        self._load()
+        self.version += 1
+
+    @contextlib.contextmanager
+    def delayed_save(self):
+        """ Changes made in the with block are saved once when the block ends. """
+        self._save_delayed += 1
+        try:
+            yield
+        finally:
+            self._save_delayed -= 1
+            if not self._save_delayed and self._save_pending:
+                self.save()
+
+    def save(self):
+        if not self.file_path or self.read_only:
+            return
+        if self._save_delayed:
+            self._save_pending = True
+            return
+        self._save_pending = False
+        if mirror.get_mirror(self.file_path):
+            # Written atomically by the mirror
+            mirror.write_text(self.file_path, json.dumps(self.data))
+            return
+        # Unique temporary file. Several processes may save the index at the same time.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.file_path),
+                                        prefix=os.path.basename(self.file_path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as fid:
+                json.dump(self.data, fid)
+            os.replace(tmp_path, self.file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _changed(self):
+        self.version += 1
+        self.save()
+
+    def update_directory(self, users_directory, user_names):
+        """ Sets the users present in users_directory. """
+        directory = str(users_directory)
+        user_names = set(user_names)
+        changed = False
+        for name in user_names:
+            item = self.data.setdefault(name, {'last_used': 0, 'directories': []})
+            if directory not in item['directories']:
+                item['directories'].append(directory)
+                changed = True
+        for name, item in list(self.data.items()):
+            if name not in user_names and directory in item['directories']:
+                item['directories'].remove(directory)
+                changed = True
+                if not item['directories']:
+                    self.data.pop(name)
+        if changed:
+            self._changed()
+
+    def add(self, user_name, users_directory):
+        item = self.data.setdefault(user_name, {'last_used': 0, 'directories': []})
+        if str(users_directory) not in item['directories']:
+            item['directories'].append(str(users_directory))
+            self._changed()
+
+    def touch(self, user_name):
+        """ Sets the last used time of the user to now. The index is only saved if the order of the users changes. """
+        already_latest = self.get_users()[:1] == [user_name]
+        item = self.data.setdefault(user_name, {'last_used': 0, 'directories': []})
+        item['last_used'] = datetime.datetime.now().timestamp()
+        if not already_latest:
+            self._changed()
+
+    def get_last_used(self, user_name):
+        """ :return: datetime or None """
+        timestamp = self.data.get(user_name, {}).get('last_used')
+        if not timestamp:
+            return None
+        return datetime.datetime.fromtimestamp(timestamp)
+
+    def get_directories(self, user_name):
+        return list(self.data.get(user_name, {}).get('directories', []))
+
+    def get_users(self, users_directory=None):
+        """ :return: user names (in users_directory if given) sorted with the most recently used first """
+        names = self.data
+        if users_directory is not None:
+            directory = str(users_directory)
+            names = [name for name, item in self.data.items() if directory in item['directories']]
+        return sorted(names, key=lambda name: (-self.data[name]['last_used'], name.lower()))
+
+    def get_recent_users(self, nr=10, users_directory=None):
+        return self.get_users(users_directory=users_directory)[:nr]
+
+    def search(self, text, users_directory=None):
+        """ :return: users with text in the name (case insensitive), most recently used first """
+        text = text.strip().lower()
+        return [name for name in self.get_users(users_directory=users_directory) if text in name.lower()]
 
 
 class UserManager(object):
-    def __init__(self, users_root_directory=None, app_root_directory=None):
+    def __init__(self, users_root_directory=None, app_root_directory=None, path_resolver=None, read_only=False):
+        """
+        :param path_resolver: core.PathTokenResolver used for directory settings. Default knows {root}
+        :param read_only: if True no files are written (settings, user index, active user). Used by processes
+                          running beside the GUI, e.g. batch workers
+        """
         self.users_root_directory = users_root_directory
+        self.read_only = read_only
         self.app_root_directory = app_root_directory
+        self.path_resolver = path_resolver or PathTokenResolver(root=app_root_directory)
         self.current_user_directory = None
         self.directory_user_settings = {}
         self.users = {}
         self.user = None
         self.app_settings = None
+        self.user_index = UserIndex(Path(users_root_directory, 'user_index.json') if users_root_directory else None,
+                                    read_only=read_only)
 
         self._load_app_settings()
 
+    def reload(self):
+        """ Reads app settings and the user index again, e.g. after a core.mirror.DirectoryMirror is registered. """
+        self.app_settings._load()
+        self.user_index.reload()
+
     def _load_app_settings(self):
         self.app_settings = AppSettings(directory=self.users_root_directory,
                                         name='app_settings',
-                                        app_root_directory=self.app_root_directory)
+                                        app_root_directory=self.app_root_directory,
+                                        path_resolver=self.path_resolver,
+                                        read_only=self.read_only)
 
-    def set_users_directory(self, users_directory):
+    @tracing.traced('UserManager.set_users_directory')
+    def set_users_directory(self, users_directory, activate=True):
+        """
+        Loads the users in users_directory.
+        :param activate: if True the active user (saved in the directory) is set. Use False to load the users
+                         without changing the active user of the GUI
+        """
         self.current_user_directory = users_directory
-        if not self.current_user_directory.exists():
-            os.mkdir(self.current_user_directory)
+        if not self.read_only:
+            mirror.makedirs(self.current_user_directory)
         self.users = {}
         users_directory = Path(users_directory).absolute()
         # for user in os.listdir(users_directory):
-        for user in users_directory.iterdir():
-            if not user.is_dir():
-                continue
+        # Listed from the local copy if the directory is in a core.mirror.DirectoryMirror
+        for user in mirror.list_directories(users_directory):
             # if user == '.active':
             #     continue
             # print('user', user, users_directory)
@@ -47,18 +202,22 @@ class UserManager(object):
             #     print('NOT', Path(user))
             #     continue
             # print('YES')
-            self.users[user.name] = User(user.name, self.current_user_directory)
+            self.users[user.name] = User(user.name, self.current_user_directory, read_only=self.read_only)
             directory_dict = self.directory_user_settings.get(self.current_user_directory, {})
             for settings_type in directory_dict:
                 # print('--', settings_type)
                 for item in directory_dict[settings_type]:
                     # print('---', item)
                     self.users[user.name].add_user_settings(settings_type, **item)
+        self.user_index.update_directory(users_directory, self.users)
+        if not activate:
+            return
         try:
             self.set_active_user()
         except GUIExceptionUserError:
             pass
 
+    @tracing.traced('UserManager.set_user')
     def set_user(self, user_name, create_if_missing=False):
         if user_name not in self.users:
             if create_if_missing:
@@ -67,11 +226,18 @@ class UserManager(object):
                 raise GUIExceptionUserError('Invalid user name: {}'.format(user_name))
         self.user = self.users.get(user_name)
         self._save_active_user(user_name)
+        self.user_index.touch(user_name)
 
     def get_user_list(self):
         return sorted(self.users)
 
+    def get_recent_users(self, nr=10):
+        """ :return: the nr most recently used users in the current users directory """
+        return self.user_index.get_recent_users(nr, users_directory=Path(self.current_user_directory).absolute())
+
     def add_user(self, user_name, from_user=None):
+        if self.read_only:
+            raise GUIExceptionUserError('Can not add user {} in read only mode'.format(user_name))
         if user_name in self.users:
             raise GUIExceptionUserError('User already exists')
         if from_user:
@@ -83,7 +249,8 @@ class UserManager(object):
         else:
             # New user
             pass
-        self.users[user_name] = User(user_name, self.current_user_directory)
+        self.users[user_name] = User(user_name, self.current_user_directory, read_only=self.read_only)
+        self.user_index.add(user_name, Path(self.current_user_directory).absolute())
 
     def add_user_settings(self, users_directory=None, settings_type=None, settings_name=None, **kwargs):
         self.directory_user_settings.setdefault(users_directory, {})
@@ -108,11 +275,18 @@ class UserManager(object):
         except:
             return None
 
-    def get_app_settings(self, par, key, default_value=None):
-        return self.app_settings.setdefault(par, key, default_value)
+    def get_app_settings(self, par, key, default_value=None, save=True):
+        """
+        :param save: if False a missing value is only set in memory. Used when settings are read often or many at
+                     a time (save with save_app_settings)
+        """
+        return self.app_settings.setdefault(par, key, default_value, save=save)
+
+    def set_app_settings(self, par, key, value, save=True):
+        self.app_settings.set(par, key, value, save=save)
 
-    def set_app_settings(self, par, key, value):
-        self.app_settings.set(par, key, value)
+    def save_app_settings(self):
+        self.app_settings.save()
 
     def set_default_user(self):
         self.set_user('default')
@@ -129,27 +303,28 @@ class UserManager(object):
             file_path = Path(user_directory, '.active')
         else:
             file_path = self._get_active_user_file_path()
-        if not file_path.exists():
+        if not mirror.exists(file_path):
             # active_user = socket.gethostname()
             active_user = Path.home().name
         else:
-            with open(file_path) as fid:
-                active_user = fid.readline().strip()
+            active_user = mirror.read_text(file_path).split('\n')[0].strip()
         return active_user
 
     def _save_active_user(self, user):
+        if self.read_only:
+            return
         file_path = self._get_active_user_file_path()
-        with open(file_path, 'w') as fid:
-            fid.write(user)
+        mirror.write_text(file_path, user)
 
 
 class User(object):
-    def __init__(self, name, users_root_directory, **kwargs):
+    def __init__(self, name, users_root_directory, read_only=False, **kwargs):
         self._name = name
+        self.read_only = read_only
         # print(self.name)
         self.user_directory = os.path.join(users_root_directory, self.name)
-        if not os.path.exists(self.user_directory):
-            os.mkdir(self.user_directory)
+        if not read_only:
+            mirror.makedirs(self.user_directory)
 
     @property
     def name(self):
@@ -157,11 +332,11 @@ class User(object):
 
     def add_user_settings(self, settings_type, **kwargs):
         if settings_type == 'basic':
-            obj = UserSettings(directory=self.user_directory, user=self.name, **kwargs)
+            obj = UserSettings(directory=self.user_directory, user=self.name, read_only=self.read_only, **kwargs)
         elif settings_type == 'parameter':
-            obj = UserSettingsParameter(directory=self.user_directory, user=self.name, **kwargs)
+            obj = UserSettingsParameter(directory=self.user_directory, user=self.name, read_only=self.read_only, **kwargs)
         elif settings_type == 'prioritylist':
-            obj = UserSettingsPriorityList(directory=self.user_directory, user=self.name, **kwargs)
+            obj = UserSettingsPriorityList(directory=self.user_directory, user=self.name, read_only=self.read_only, **kwargs)
         setattr(self, obj.name, obj)
 
 
@@ -169,18 +344,24 @@ class UserSettings(object):
     """
     Baseclass for user settings.
     """
-    def __init__(self, directory=None, name=None, user=None, time_string_format='%Y-%m-%d %H:%M:%S'):
+    def __init__(self, directory=None, name=None, user=None, time_string_format='%Y-%m-%d %H:%M:%S',
+                 read_only=False):
+        """
+        :param read_only: if True the settings are only read. Changes are kept in memory but not saved
+        """
         self.directory = directory
         self.name = name
         self.user = user
+        self.read_only = read_only
         self.file_path = os.path.join(self.directory, '{}.json'.format(self.name))
         self.time_string_format = time_string_format
         self.data = {}
 
-        if not os.path.exists(self.directory):
-            os.makedirs(self.directory)
+        # Local copies are used if the directory is in a core.mirror.DirectoryMirror
+        if not read_only:
+            mirror.makedirs(self.directory)
 
-        if not os.path.exists(self.file_path):
+        if not mirror.exists(self.file_path):
             self.save()
 
         self._load()
@@ -190,10 +371,12 @@ class UserSettings(object):
         Loads dict from json
         :return:
         """
-        if os.path.exists(self.file_path):
-            with open(self.file_path) as fid:
-                self.data = json.load(fid)
-        self.datestring_to_datetime()
+        with tracing.span('UserSettings.load', file=self.file_path):
+            if mirror.exists(self.file_path):
+                with metrics.histogram('settings.read_ms').time():
+                    self.data = json.loads(mirror.read_text(self.file_path))
+                metrics.counter('settings.reads').inc()
+            self.datestring_to_datetime()
 
     def datestring_to_datetime(self):
         for key, value in self.data.items():
@@ -220,6 +403,8 @@ class UserSettings(object):
         """
         # if self.user == 'default':
         #     return
+        if self.read_only:
+            return
         # Convert datetime object to str
         self.datetime_to_datestring()
 
@@ -232,8 +417,12 @@ class UserSettings(object):
         #     import datetime
         #
         # print('=' * 20)
-        with open(self.file_path, 'w') as fid:
-            json.dump(self.data, fid)
+        with tracing.span('UserSettings.save', file=self.file_path):
+            with metrics.histogram('settings.write_ms').time():
+                content = json.dumps(self.data)
+                mirror.write_text(self.file_path, content)
+        metrics.counter('settings.writes').inc()
+        metrics.counter('settings.bytes_written').inc(len(content))
         self.datestring_to_datetime()
 
     def get(self, key, if_missing=None):
@@ -242,8 +431,10 @@ class UserSettings(object):
         :param key:
         :return:
         """
-        gui_logger.debug('USER-get: {}; {}, {}, {}'.format(self.name, key, type(self.data.get(key, if_missing)), self.data.get(key, if_missing)))
-        return self.data.get(key, if_missing)
+        value = self.data.get(key, if_missing)
+        if gui_logger.debug_enabled:
+            gui_logger.debug('USER-get: %s; %s, %s, %s', self.name, key, type(value), value)
+        return value
 
     def get_keys(self):
         return self.data.keys()
@@ -258,7 +449,8 @@ class UserSettings(object):
         """
         if self.user == 'default':
             raise GUIExceptionUserError('Cannot change default user')
-        gui_logger.debug('USER-setdefault: {}; {}, {}, {}'.format(self.name, key, type(value), value))
+        if gui_logger.debug_enabled:
+            gui_logger.debug('USER-setdefault: %s; %s, %s, %s', self.name, key, type(value), value)
         if self.data.get(key):
             return self.data.get(key)
         else:
@@ -377,17 +569,18 @@ class UserSettingsParameter(UserSettings):
 
 
 class AppSettings(UserSettingsParameter):
-    def __init__(self, directory=None, app_root_directory=None, name=None, user=None, **kwargs):
+    def __init__(self, directory=None, app_root_directory=None, name=None, user=None, path_resolver=None,
+                 **kwargs):
         self.app_root_directory = app_root_directory
+        # Directories are stored with tokens, e.g. "{root}/settings_files". See core.path_tokens
+        self.path_resolver = path_resolver or PathTokenResolver(root=app_root_directory)
         UserSettingsParameter.__init__(self, directory=directory, name=name, user=user, **kwargs)
 
     def _convert_root_to_path(self, path):
-        new_path = Path(str(path).replace('root', str(self.app_root_directory)))
-        return new_path
+        return self.path_resolver.resolve(path)
 
     def _convert_path_to_root(self, path):
-        new_path = str(path).replace(str(self.app_root_directory), 'root')
-        return new_path
+        return self.path_resolver.tokenize(path)
 
     def setdefault(self, par, key, value, save=True):
         """
@@ -404,8 +597,9 @@ class AppSettings(UserSettingsParameter):
             value = self._convert_path_to_root(value)
 
         self.data.setdefault(par, {})
+        is_missing = key not in self.data[par]
         value = self.data[par].setdefault(key, value)
-        if save:
+        if save and is_missing:
             self.save()
 
         if par == 'directory':
@@ -475,8 +669,9 @@ class UserSettingsPriorityList(UserSettings):
     def __init__(self, directory=None, name=None, user=None, **kwargs):
         UserSettings.__init__(self, directory=directory, name=name, user=user, **kwargs)
 
-        self.data.setdefault('priority_list', [])
-        self.save()
+        if 'priority_list' not in self.data:
+            self.data['priority_list'] = []
+            self.save()
 
     def set_priority(self, item):
         if self.user == 'default':
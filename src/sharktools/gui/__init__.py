@@ -1,6 +1,8 @@
 
 from sharktools.gui.page_start import PageStart
 from sharktools.gui.page_about import PageAbout
+from sharktools.gui.page_jobs import PageJobs
+from sharktools.gui.page_performance import PagePerformance
 
 
 from sharktools.gui.widgets import InformationPopup
@@ -10,5 +12,14 @@ from sharktools.gui.widgets import show_information
 from sharktools.gui.widgets import show_error
 from sharktools.gui.widgets import show_warning
 from sharktools.gui.widgets import show_internal_error
+from sharktools.gui.widgets import show_text
+
+from sharktools.gui.progress import ProgressWindow
+from sharktools.gui.async_loop import AsyncioLoop
+from sharktools.gui.page_lifecycle import PageLifecycleManager
+from sharktools.gui.watchdog import MainLoopWatchdog
+from sharktools.gui.figure_pool import FigurePool
+from sharktools.gui.images import ImageCache, get_image
+from sharktools.gui.user_switch import UserSwitchDialog
 
 from sharktools.gui import communicate
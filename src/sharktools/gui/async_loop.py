@@ -0,0 +1,140 @@
+import asyncio
+import functools
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncioLoop(object):
+    """
+    Runs an asyncio event loop in a helper thread next to the tkinter main loop.
+
+    Coroutines are submitted from the GUI thread with submit(). Callbacks given to submit() and calls made
+    with call_in_main() are put on a queue that is drained from the Tk main loop with "after", so they
+    are always executed in the GUI thread and may touch widgets. A coroutine that needs to update the GUI
+    halfway can "await loop.run_in_main(func, *args)".
+    """
+    def __init__(self, root, poll_interval=20):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.loop = None
+        self._thread = None
+        self._queue = queue.Queue()
+        self._after_id = None
+        self._started = threading.Event()
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._started.clear()
+        self._thread = threading.Thread(target=self._run, name='asyncio-loop', daemon=True)
+        self._thread.start()
+        self._started.wait()
+        self._schedule_poll()
+
+    def stop(self, timeout=2):
+        if self._after_id:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        if not self.is_running:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            try:
+                pending = asyncio.all_tasks(self.loop)
+                for task in pending:
+                    task.cancel()
+                self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            finally:
+                self.loop.close()
+
+    def submit(self, coro, callback=None, error_callback=None):
+        """
+        Schedules the coroutine in the asyncio loop.
+        :param coro: coroutine object
+        :param callback: called in the GUI thread with the result when the coroutine is done
+        :param error_callback: called in the GUI thread with the exception if the coroutine fails
+        :return: concurrent.futures.Future
+        """
+        if not self.is_running:
+            self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+        def _done(fut):
+            if fut.cancelled():
+                return
+            exception = fut.exception()
+            if exception is not None:
+                if error_callback:
+                    self.call_in_main(error_callback, exception)
+                else:
+                    logger.error('Coroutine failed', exc_info=exception)
+            elif callback:
+                self.call_in_main(callback, fut.result())
+
+        future.add_done_callback(_done)
+        return future
+
+    def call_in_main(self, func, *args, **kwargs):
+        """ Thread safe. Schedules func(*args, **kwargs) to be called in the GUI thread. """
+        self._queue.put(functools.partial(func, *args, **kwargs))
+
+    async def run_in_main(self, func, *args, **kwargs):
+        """ Awaitable from the asyncio loop. Runs func in the GUI thread and returns its result. """
+        future = self.loop.create_future()
+
+        def _call():
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self.loop.call_soon_threadsafe(future.set_exception, e)
+            else:
+                self.loop.call_soon_threadsafe(future.set_result, result)
+
+        self.call_in_main(_call)
+        return await future
+
+    def async_callback(self, async_func, callback=None):
+        """
+        Wraps an "async def" function so that it can be used as a tkinter command or event binding.
+        """
+        @functools.wraps(async_func)
+        def _wrapper(*args, **kwargs):
+            return self.submit(async_func(*args, **kwargs), callback=callback)
+        return _wrapper
+
+    def _schedule_poll(self):
+        self._after_id = self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        self._after_id = None
+        while True:
+            try:
+                func = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func()
+            except Exception:
+                logger.exception('Error in callback from asyncio loop')
+        if self.is_running:
+            self._schedule_poll()
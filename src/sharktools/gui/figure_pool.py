@@ -0,0 +1,185 @@
+import contextlib
+import logging
+import threading
+import time
+
+from sharktools.core import metrics
+from sharktools.core.lazy_import import lazy_import
+
+# matplotlib is imported when the first figure is requested
+matplotlib_figure = lazy_import('matplotlib.figure')
+backend_agg = lazy_import('matplotlib.backends.backend_agg')
+backend_tkagg = lazy_import('matplotlib.backends.backend_tkagg')
+
+logger = logging.getLogger(__name__)
+
+
+class _PoolEntry(object):
+    __slots__ = ('figure', 'canvas', 'master', 'in_use', 'released_time')
+
+    def __init__(self, figure, canvas, master):
+        self.figure = figure
+        self.canvas = canvas
+        self.master = master
+        self.in_use = True
+        self.released_time = None
+
+
+class FigurePool(object):
+    """
+    Shared pool of matplotlib figures and canvases.
+
+    acquire() returns a (figure, canvas) pair with a FigureCanvasTkAgg in the given master widget. Creating
+    Tk canvases is slow, so a released figure and its canvas are cleared and reused by the next acquire() with
+    the same master. Disconnect callbacks connected with canvas.mpl_connect (e.g. by a MovableText) before
+    the figure is released.
+
+    acquire_headless() returns an Agg-only figure (no Tk, no pyplot) for exports and jobs. Headless figures
+    are cleared and reused. They are safe to use outside the GUI thread.
+
+    When more than max_figures figures are alive, the least recently released ones are destroyed.
+    """
+    def __init__(self, max_figures=20):
+        self.max_figures = max_figures
+        self._entries = []
+        self._lock = threading.Lock()
+
+    @property
+    def nr_figures(self):
+        return len(self._entries)
+
+    @property
+    def nr_in_use(self):
+        return sum(1 for entry in self._entries if entry.in_use)
+
+    def _find_idle(self, master):
+        for entry in reversed(self._entries):
+            if not entry.in_use and entry.master is master:
+                return entry
+        return None
+
+    def acquire(self, master, figsize=(6.4, 4.8), dpi=100):
+        """
+        :param master: tkinter widget that the canvas widget is placed in
+        :return: tuple (figure, canvas). Place canvas.get_tk_widget() with grid/pack as usual.
+        """
+        with self._lock:
+            entry = self._find_idle(master)
+            if entry is not None:
+                entry.in_use = True
+        if entry is None:
+            figure = matplotlib_figure.Figure(figsize=figsize, dpi=dpi)
+            canvas = backend_tkagg.FigureCanvasTkAgg(figure, master=master)
+            entry = _PoolEntry(figure, canvas, master)
+            self._add(entry)
+            metrics.counter('figure_pool.created').inc()
+        else:
+            # Cleared in release()
+            entry.figure.set_dpi(dpi)
+            entry.figure.set_size_inches(figsize, forward=False)
+            entry.canvas.get_tk_widget().configure(width=int(figsize[0] * dpi), height=int(figsize[1] * dpi))
+            metrics.counter('figure_pool.reused').inc()
+        return entry.figure, entry.canvas
+
+    def acquire_headless(self, figsize=(6.4, 4.8), dpi=100):
+        """ :return: cleared matplotlib Figure with an Agg canvas """
+        with self._lock:
+            entry = self._find_idle(None)
+            if entry is not None:
+                entry.in_use = True
+        if entry is None:
+            figure = matplotlib_figure.Figure(figsize=figsize, dpi=dpi)
+            entry = _PoolEntry(figure, backend_agg.FigureCanvasAgg(figure), None)
+            self._add(entry)
+            metrics.counter('figure_pool.created').inc()
+        else:
+            entry.figure.set_dpi(dpi)
+            entry.figure.set_size_inches(figsize, forward=False)
+            metrics.counter('figure_pool.reused').inc()
+        return entry.figure
+
+    @contextlib.contextmanager
+    def headless_figure(self, figsize=(6.4, 4.8), dpi=100):
+        """ with pool.headless_figure() as fig: ... The figure is released when the block exits. """
+        figure = self.acquire_headless(figsize=figsize, dpi=dpi)
+        try:
+            yield figure
+        finally:
+            self.release(figure)
+
+    def release(self, figure):
+        """ Returns the figure to the pool. The canvas widget is removed from its geometry manager. """
+        entry = self._get_entry(figure)
+        if entry is None:
+            return
+        figure.clear()
+        if entry.master is not None:
+            widget = entry.canvas.get_tk_widget()
+            manager = widget.winfo_manager()
+            if manager == 'grid':
+                widget.grid_forget()
+            elif manager == 'pack':
+                widget.pack_forget()
+            elif manager == 'place':
+                widget.place_forget()
+        with self._lock:
+            entry.in_use = False
+            entry.released_time = time.monotonic()
+        self._evict()
+
+    def _get_entry(self, figure):
+        with self._lock:
+            for entry in self._entries:
+                if entry.figure is figure:
+                    return entry
+        return None
+
+    def _add(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+        self._evict()
+        if self.nr_figures > self.max_figures:
+            logger.warning('{} figures in use (max {})'.format(self.nr_figures, self.max_figures))
+
+    def _evict(self):
+        """ Destroys the least recently released figures while there are more than max_figures. """
+        with self._lock:
+            idle = sorted([entry for entry in self._entries if not entry.in_use],
+                          key=lambda entry: entry.released_time)
+            to_evict = idle[:max(len(self._entries) - self.max_figures, 0)]
+            for entry in to_evict:
+                self._entries.remove(entry)
+        for entry in to_evict:
+            self._destroy(entry)
+
+    @staticmethod
+    def _destroy(entry):
+        entry.figure.clear()
+        if entry.master is not None:
+            try:
+                entry.canvas.get_tk_widget().destroy()
+            except Exception:
+                pass
+        metrics.counter('figure_pool.evicted').inc()
+
+    def remove_widget(self, widget):
+        """
+        Removes all figures (also those in use) placed in widget or in a child of widget.
+        Call before widget is destroyed, e.g. when a page is closed.
+        """
+        widget_path = str(widget)
+        with self._lock:
+            to_evict = [entry for entry in self._entries if entry.master is not None and
+                        (str(entry.master) == widget_path or str(entry.master).startswith(widget_path + '.'))]
+            for entry in to_evict:
+                self._entries.remove(entry)
+        for entry in to_evict:
+            self._destroy(entry)
+
+    def clear(self):
+        with self._lock:
+            entries = [entry for entry in self._entries if not entry.in_use]
+            for entry in entries:
+                self._entries.remove(entry)
+        for entry in entries:
+            self._destroy(entry)
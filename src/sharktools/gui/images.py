@@ -0,0 +1,211 @@
+import fractions
+import logging
+import os
+import struct
+import threading
+import tkinter as tk
+from pathlib import Path
+
+from sharktools.core import metrics
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PIC_DIRECTORY = Path(__file__).parent.parent / 'system' / 'pic'
+
+# Formats that tkinter.PhotoImage decodes without PIL
+NATIVE_SUFFIXES = ['.png', '.gif', '.ppm', '.pgm']
+PIL_SUFFIXES = ['.jpg', '.jpeg', '.bmp', '.tif', '.tiff']
+
+
+def _get_pil():
+    try:
+        from PIL import Image, ImageTk
+    except ImportError:
+        return None
+    return Image, ImageTk
+
+
+def _read_pixel_size(path):
+    with open(path, 'rb') as fid:
+        header = fid.read(24)
+    if header[:8] == b'\x89PNG\r\n\x1a\n' and header[12:16] == b'IHDR':
+        return struct.unpack('>II', header[16:24])
+    if header[:4] == b'GIF8':
+        return struct.unpack('<HH', header[6:10])
+    pil = _get_pil()
+    if pil is None:
+        return None
+    try:
+        with pil[0].open(path) as image:
+            return image.size
+    except OSError:
+        return None
+
+
+class ImageCache(object):
+    """
+    Process wide cache of decoded images (tkinter.PhotoImage).
+
+    Assets are looked up by name (file name with or without suffix) in the registered directories. If a name
+    without suffix exists in several formats the smallest file that tkinter can decode natively (png/gif) is used.
+    Other formats (jpg...) are only used if PIL is installed. Each asset is decoded once. Scaled variants
+    are made from the decoded image and cached by size, so building pages or changing scaling does not
+    read the file again.
+
+    Keep a reference to the returned image as long as it is shown (as with any PhotoImage). The images are
+    shared: do not modify them.
+    """
+    def __init__(self, directories=None):
+        self.directories = []
+        self._assets = None
+        self._images = {}
+        self._pil_images = {}
+        self._pixel_sizes = {}
+        self._lock = threading.Lock()
+        for directory in directories or []:
+            self.add_directory(directory)
+
+    def add_directory(self, directory):
+        """ Adds a directory with images, e.g. the icon directory of a plugin. It is searched before earlier ones. """
+        directory = Path(directory)
+        if directory not in self.directories:
+            self.directories.insert(0, directory)
+            self._assets = None
+
+    def _scan(self):
+        """ :return: dict with lower case asset name as key and the files of the asset as value """
+        assets = {}
+        for directory in self.directories:
+            if not directory.is_dir():
+                continue
+            in_directory = {}
+            for entry in os.scandir(directory):
+                path = Path(entry.path)
+                suffix = path.suffix.lower()
+                if suffix in NATIVE_SUFFIXES or suffix in PIL_SUFFIXES:
+                    in_directory.setdefault(path.stem.lower(), []).append(path)
+            # An asset in a directory searched earlier hides the same name in later directories
+            for stem, paths in in_directory.items():
+                assets.setdefault(stem, paths)
+        return assets
+
+    def get_names(self):
+        if self._assets is None:
+            self._assets = self._scan()
+        return sorted(self._assets)
+
+    def get_pixel_size(self, path):
+        """ :return: (width, height) read from the file header (or with PIL), or None if unknown """
+        if path not in self._pixel_sizes:
+            self._pixel_sizes[path] = _read_pixel_size(path)
+        return self._pixel_sizes[path]
+
+    def find(self, name):
+        """
+        :param name: asset name with or without suffix. With a suffix that file is used. Without suffix the format
+                     with the largest image is used, preferring a format that is cheaper to decode.
+        :return: Path of the file to decode, or None
+        """
+        if self._assets is None:
+            self._assets = self._scan()
+        paths = self._assets.get(Path(name).stem.lower())
+        if not paths:
+            return None
+        has_pil = _get_pil() is not None
+        decodable = [path for path in paths if has_pil or path.suffix.lower() in NATIVE_SUFFIXES]
+        suffix = Path(name).suffix.lower()
+        if suffix:
+            requested = [path for path in decodable if path.suffix.lower() == suffix]
+            return requested[0] if requested else None
+        largest = max([self._get_area(path) for path in decodable], default=0)
+        candidates = [path for path in decodable if self._get_area(path) == largest]
+        if not candidates:
+            return None
+        # Prefer the native formats, then the smallest file
+        return min(candidates, key=lambda path: (path.suffix.lower() not in NATIVE_SUFFIXES, path.stat().st_size))
+
+    def _get_area(self, path):
+        pixel_size = self.get_pixel_size(path)
+        return pixel_size[0] * pixel_size[1] if pixel_size else 0
+
+    def _decode(self, path, master):
+        metrics.counter('images.decoded').inc()
+        if path.suffix.lower() in NATIVE_SUFFIXES:
+            return tk.PhotoImage(file=str(path), master=master)
+        Image, ImageTk = _get_pil()
+        pil_image = Image.open(path)
+        pil_image.load()
+        self._pil_images[path] = pil_image
+        return ImageTk.PhotoImage(pil_image, master=master)
+
+    def _scale(self, path, original, fraction, master):
+        pil_image = self._pil_images.get(path)
+        if pil_image is not None:
+            Image, ImageTk = _get_pil()
+            new_size = (max(int(pil_image.width * fraction), 1), max(int(pil_image.height * fraction), 1))
+            return ImageTk.PhotoImage(pil_image.resize(new_size, Image.LANCZOS), master=master)
+        # Integer zoom/subsample works on the decoded image. A fraction is made by combining the two.
+        image = original
+        if fraction.numerator != 1:
+            image = image.zoom(fraction.numerator)
+        if fraction.denominator != 1:
+            image = image.subsample(fraction.denominator)
+        return image
+
+    def _get_original(self, path, master):
+        key = (path, None)
+        image = self._images.get(key)
+        if image is None:
+            image = self._decode(path, master)
+            with self._lock:
+                self._images[key] = image
+        return image
+
+    @staticmethod
+    def _get_scale(image, size, scale):
+        if size is not None:
+            width, height = size
+            scale = min(width / image.width(), height / image.height())
+        return max(fractions.Fraction(scale).limit_denominator(8), fractions.Fraction(1, 8))
+
+    def get(self, name, size=None, scale=None, master=None):
+        """
+        Returns a shared PhotoImage.
+        :param name: asset name, e.g. "smhi_logo" or "smhi_logo.gif"
+        :param size: (width, height) to fit the image in. Aspect ratio is kept
+        :param scale: scale factor. Ignored if size is given
+        :raises FileNotFoundError: if the asset does not exist (or needs PIL that is not installed)
+        """
+        path = self.find(name)
+        if path is None:
+            raise FileNotFoundError('No image named {} in {}'.format(name, [str(d) for d in self.directories]))
+        original = self._get_original(path, master)
+        if size is None and scale is None:
+            return original
+        fraction = self._get_scale(original, size, scale)
+        if fraction == 1:
+            return original
+        key = (path, fraction)
+        image = self._images.get(key)
+        if image is None:
+            image = self._scale(path, original, fraction, master)
+            metrics.counter('images.scaled').inc()
+            with self._lock:
+                self._images[key] = image
+        return image
+
+    def clear(self):
+        """ Drops all decoded images, e.g. when the Tk root is destroyed. """
+        with self._lock:
+            self._images = {}
+            self._pil_images = {}
+        self._pixel_sizes = {}
+        self._assets = None
+
+
+image_cache = ImageCache([SYSTEM_PIC_DIRECTORY])
+
+
+def get_image(name, size=None, scale=None, master=None):
+    """ Returns a shared PhotoImage from the process wide image_cache. See ImageCache.get """
+    return image_cache.get(name, size=size, scale=scale, master=master)
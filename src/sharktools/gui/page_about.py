@@ -1,10 +1,10 @@
-import os
 import tkinter as tk
 import webbrowser
 
 import shark_tkinter_lib.tkinter_widgets as tkw
 
 from sharktools import core
+from sharktools.gui.images import get_image
 
 """
 ================================================================================
@@ -83,8 +83,7 @@ class PageAbout(tk.Frame):
 
         padx = 5
         pady = 5
-        self.jerico_image = tk.PhotoImage(
-            file=os.path.join(self.controller.app_directory, 'system/pic/Logotype_Jerico_next.gif'))
+        self.jerico_image = get_image('Logotype_Jerico_next.gif', master=self)
         self.jerico_image_label = tk.Label(frame, image=self.jerico_image, cursor="hand2")
         self.jerico_image_label.grid(row=0, column=0, sticky='nsew', padx=padx, pady=pady)
         self.jerico_image_label.bind("<Button-1>", _on_click_jerico_link)
@@ -104,8 +103,7 @@ class PageAbout(tk.Frame):
 
         padx = 5
         pady = 5
-        self.smhi_image = tk.PhotoImage(
-            file=os.path.join(self.controller.app_directory, 'system/pic/smhi_logo.gif'))
+        self.smhi_image = get_image('smhi_logo.gif', master=self)
         self.smhi_image_label = tk.Label(frame, image=self.smhi_image, cursor="hand2")
         self.smhi_image_label.grid(row=0, column=0, sticky='nsew', padx=padx, pady=pady)
         self.smhi_image_label.bind("<Button-1>", _on_click_smhi_link)
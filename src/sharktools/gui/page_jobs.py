@@ -0,0 +1,116 @@
+import tkinter as tk
+from tkinter import ttk
+
+import shark_tkinter_lib.tkinter_widgets as tkw
+
+from sharktools.core import jobs
+from sharktools.core.tasks import format_seconds
+
+
+class PageJobs(tk.Frame):
+    """
+    Lists running, queued and finished jobs in the main app job queue.
+    The lists are refreshed periodically while the page is the active page.
+    """
+    columns = ['id', 'name', 'owner', 'priority', 'state', 'submitted', 'duration', 'progress']
+    refresh_interval = 500
+
+    def __init__(self, parent, main_app, **kwargs):
+        tk.Frame.__init__(self, parent, **kwargs)
+        # parent is the frame "container" in App. contoller is the App class
+        self.parent = parent
+        self.main_app = main_app
+        self._after_id = None
+
+    @property
+    def job_queue(self):
+        return self.main_app.job_queue
+
+    def startup(self):
+        self._set_frame()
+
+    def update_page(self):
+        self._refresh()
+
+    def close(self):
+        if self._after_id:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _set_frame(self):
+        padx = 5
+        pady = 5
+        self.trees = {}
+        for r, (key, title) in enumerate([('running', 'Running'),
+                                          ('queued', 'Queued'),
+                                          ('finished', 'Finished')]):
+            frame = tk.LabelFrame(self, text=title)
+            frame.grid(row=r, column=0, sticky='nsew', padx=padx, pady=pady)
+            tree = ttk.Treeview(frame, columns=self.columns, show='headings', height=6)
+            for col in self.columns:
+                tree.heading(col, text=col.capitalize())
+                tree.column(col, width=80 if col != 'name' else 250)
+            tree.grid(row=0, column=0, sticky='nsew')
+            scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+            scrollbar.grid(row=0, column=1, sticky='ns')
+            tree.configure(yscrollcommand=scrollbar.set)
+            frame.grid_rowconfigure(0, weight=1)
+            frame.grid_columnconfigure(0, weight=1)
+            self.trees[key] = tree
+
+        frame_buttons = tk.Frame(self)
+        frame_buttons.grid(row=3, column=0, sticky='nsew', padx=padx, pady=pady)
+        ttk.Button(frame_buttons, text='Cancel selected queued job',
+                   command=self._cancel_selected).grid(row=0, column=0, padx=padx, pady=pady)
+        self.stringvar_summary = tk.StringVar()
+        tk.Label(frame_buttons, textvariable=self.stringvar_summary).grid(row=0, column=1, padx=padx, pady=pady)
+
+        tkw.grid_configure(self, nr_rows=4, r0=5, r1=5, r2=10, r3=1)
+
+    def _job_values(self, job):
+        fraction = job.task.fraction
+        progress = '' if fraction is None else '{:.0f} %'.format(fraction * 100)
+        return [job.id, job.name, job.owner, job.priority, job.state, jobs.format_timestamp(job.submitted_time),
+                format_seconds(job.duration), progress]
+
+    @staticmethod
+    def _history_values(item):
+        return [item['id'], item['name'], item['owner'], item['priority'], item['state'],
+                jobs.format_timestamp(item['submitted']), format_seconds(item['duration']), '']
+
+    def _refresh(self):
+        if self._after_id:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        if not self.job_queue:
+            return
+        self._fill_tree('running', [self._job_values(job) for job in self.job_queue.get_running()])
+        self._fill_tree('queued', [self._job_values(job) for job in self.job_queue.get_queued()])
+        if self.job_queue.history:
+            finished = [self._history_values(item) for item in self.job_queue.history.get_latest()
+                        if item['state'] not in [jobs.QUEUED, jobs.RUNNING]]
+        else:
+            finished = [self._job_values(job) for job in reversed(self.job_queue.get_finished())]
+        self._fill_tree('finished', finished)
+        self.stringvar_summary.set('Running: {}    Queued: {}    Max concurrent jobs: {}'.format(
+            self.job_queue.nr_running, self.job_queue.nr_queued, self.job_queue.max_concurrent))
+        self._after_id = self.after(self.refresh_interval, self._on_timer)
+
+    def _on_timer(self):
+        self._after_id = None
+        # Stop refreshing when another page has been raised
+        if self.main_app.active_page == 'PageJobs':
+            self._refresh()
+
+    def _fill_tree(self, key, rows):
+        tree = self.trees[key]
+        tree.delete(*tree.get_children())
+        for values in rows:
+            tree.insert('', 'end', iid=str(values[0]), values=values)
+
+    def _cancel_selected(self):
+        selected = [int(iid) for iid in self.trees['queued'].selection()]
+        for job in self.job_queue.get_queued():
+            if job.id in selected:
+                self.job_queue.cancel(job)
+        self._refresh()
@@ -0,0 +1,215 @@
+import logging
+import sys
+import threading
+import time
+import tkinter as tk
+import types
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_memory(frame, exclude=None, max_objects=200000):
+    """
+    Rough estimate (in bytes) of the memory held by a page. Follows the attributes of the page and of all
+    reachable objects. Tk widgets that are not children of the page (e.g. the main app) and the objects in
+    exclude (typically objects shared by all pages) are not followed.
+    No Tk calls are made, so this can be run in a background thread. Containers changed by the GUI thread
+    while they are followed are skipped.
+    """
+    frame_path = str(frame)
+    seen = set(id(obj) for obj in exclude or [])
+    stack = [frame]
+    total = 0
+    skip_types = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+    while stack and len(seen) < max_objects:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, skip_types):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, tk.Misc) and obj is not frame:
+            if not str(obj).startswith(frame_path + '.'):
+                continue
+        try:
+            total += sys.getsizeof(obj)
+        except TypeError:
+            continue
+        try:
+            if isinstance(obj, dict):
+                stack.extend(list(obj.keys()))
+                stack.extend(list(obj.values()))
+            elif isinstance(obj, (list, tuple, set, frozenset)):
+                stack.extend(list(obj))
+        except RuntimeError:
+            # Changed size during iteration
+            pass
+        if hasattr(obj, '__dict__'):
+            stack.append(obj.__dict__)
+    return total
+
+
+class PageLifecycleManager(object):
+    """
+    Closes and destroys started pages that have not been shown for a while or that do not fit in the
+    memory budget. Before a page is closed the state of its SaveComponents (attribute "_saves" on the page
+    or on the pages of a plugin) is saved. The page is rebuilt the next time it is shown.
+    Pages with running or queued jobs in the job queue of the main app (job owner is the page name) are not
+    closed. The memory of the pages is estimated in a background thread.
+    """
+    def __init__(self, main_app, max_idle_minutes=30, memory_budget_mb=0, check_interval=60,
+                 protected_pages=None):
+        self.main_app = main_app
+        self.max_idle_minutes = max_idle_minutes
+        self.memory_budget_mb = memory_budget_mb
+        self.check_interval = check_interval
+        self.protected_pages = set(protected_pages or ['PageStart'])
+        self.last_shown = {}
+        self.memory_report = {}
+        self.poll_interval = 200
+        self._after_id = None
+        self._estimate_thread = None
+        self._estimate_callbacks = []
+        self._estimate_result = None
+
+    def start(self):
+        self.stop()
+        self._after_id = self.main_app.after(int(self.check_interval * 1000), self._on_timer)
+
+    def stop(self):
+        if self._after_id:
+            self.main_app.after_cancel(self._after_id)
+            self._after_id = None
+
+    def page_shown(self, page_name):
+        self.last_shown[page_name] = time.monotonic()
+
+    def _on_timer(self):
+        self._after_id = None
+        try:
+            self.check()
+        except Exception:
+            logger.exception('Page lifecycle check failed')
+        self.start()
+
+    def _get_candidates(self):
+        """ Started pages that may be evicted, least recently shown first. """
+        pages = [name for name, started in self.main_app.pages_started.items()
+                 if started and name != self.main_app.active_page and name not in self.protected_pages
+                 and not self.has_jobs(name)]
+        return sorted(pages, key=lambda name: self.last_shown.get(name, 0))
+
+    def has_jobs(self, page_name):
+        """ True if the job queue of the main app has running or queued jobs owned by the page. """
+        job_queue = getattr(self.main_app, 'job_queue', None)
+        if not job_queue:
+            return False
+        return any(job.owner == page_name for job in job_queue.get_running() + job_queue.get_queued())
+
+    def check(self):
+        now = time.monotonic()
+        if self.max_idle_minutes:
+            for page_name in self._get_candidates():
+                idle_minutes = (now - self.last_shown.get(page_name, now)) / 60
+                if idle_minutes > self.max_idle_minutes:
+                    logger.info('Page {} not shown for {:.0f} minutes'.format(page_name, idle_minutes))
+                    self.evict(page_name)
+
+        if self.memory_budget_mb:
+            self.update_memory_report(callback=self._apply_memory_budget)
+
+    def _apply_memory_budget(self, report):
+        report = dict(report)
+        total_mb = sum(report.values()) / 1e6
+        for page_name in self._get_candidates():
+            if total_mb <= self.memory_budget_mb:
+                break
+            if page_name not in report:
+                # Started after the estimate
+                continue
+            logger.info('Memory estimate {:.1f} MB is over budget {} MB'.format(total_mb, self.memory_budget_mb))
+            total_mb -= report.pop(page_name) / 1e6
+            self.evict(page_name)
+
+    def update_memory_report(self, callback=None):
+        """
+        Estimates the memory held by every started page in a background thread. Only one estimate is made at a
+        time. The result is kept in memory_report.
+        :param callback: called in the GUI thread with memory_report (dict with page_name as key and estimated
+                         bytes as value) when the estimate is done
+        """
+        if callback:
+            self._estimate_callbacks.append(callback)
+        if self._estimate_thread:
+            return
+        shared = list(vars(self.main_app).values())
+        frames = {page_name: self.main_app.frames[page_name]
+                  for page_name, started in self.main_app.pages_started.items() if started}
+        self._estimate_result = None
+        self._estimate_thread = threading.Thread(target=self._estimate, args=(frames, shared),
+                                                 name='page-memory-estimate', daemon=True)
+        self._estimate_thread.start()
+        self.main_app.after(self.poll_interval, self._poll_estimate)
+
+    def _estimate(self, frames, shared):
+        report = {}
+        try:
+            for page_name, frame in frames.items():
+                report[page_name] = estimate_memory(frame, exclude=shared)
+        except Exception:
+            logger.exception('Could not estimate page memory')
+        self._estimate_result = report
+
+    def _poll_estimate(self):
+        if self._estimate_thread.is_alive():
+            self.main_app.after(self.poll_interval, self._poll_estimate)
+            return
+        self._estimate_thread = None
+        # Pages closed while estimating are not reported
+        self.memory_report = {page_name: nr_bytes for page_name, nr_bytes in self._estimate_result.items()
+                              if self.main_app.pages_started.get(page_name)}
+        for page_name, nr_bytes in sorted(self.memory_report.items(), key=lambda item: -item[1]):
+            logger.info('Memory estimate for page {}: {:.1f} MB'.format(page_name, nr_bytes / 1e6))
+        callbacks = self._estimate_callbacks
+        self._estimate_callbacks = []
+        for callback in callbacks:
+            try:
+                callback(self.memory_report)
+            except Exception:
+                logger.exception('Error in memory estimate callback')
+
+    def evict(self, page_name):
+        """
+        Saves state, closes and destroys the page. A new (not started) page is created in its place.
+        Pages with running or queued jobs are not closed.
+        :return: True if the page was closed
+        """
+        if self.has_jobs(page_name):
+            logger.info('Page {} is not closed since it has jobs'.format(page_name))
+            return False
+        frame = self.main_app.frames[page_name]
+        self._save_state(frame)
+        try:
+            if hasattr(frame, 'close'):
+                frame.close()
+        except Exception:
+            logger.exception('Could not close page {}'.format(page_name))
+        figure_pool = getattr(self.main_app, 'figure_pool', None)
+        if figure_pool:
+            figure_pool.remove_widget(frame)
+        frame.destroy()
+        self.main_app.create_page(page_name)
+        self.main_app.take_memory_snapshot('closed {}'.format(page_name))
+        self.memory_report.pop(page_name, None)
+        logger.info('Page {} closed to free memory'.format(page_name))
+        return True
+
+    @staticmethod
+    def _save_state(frame):
+        objects = [frame] + list(getattr(frame, 'frames', {}).values())
+        for obj in objects:
+            saves = getattr(obj, '_saves', None)
+            if saves is None or not hasattr(saves, 'save'):
+                continue
+            try:
+                saves.save()
+            except Exception:
+                logger.exception('Could not save state for {}'.format(obj))
@@ -0,0 +1,228 @@
+import datetime
+import gc
+import json
+import threading
+import tkinter as tk
+from pathlib import Path
+from tkinter import scrolledtext
+from tkinter import ttk
+
+import shark_tkinter_lib.tkinter_widgets as tkw
+
+from sharktools.core import memory
+from sharktools.core import metrics
+from sharktools.core import tracing
+from sharktools.core.tasks import format_seconds
+from sharktools.gui import widgets
+
+
+def _format_ms(value):
+    if value is None:
+        return '-'
+    return '{:.1f}'.format(value)
+
+
+def _format_mb(value):
+    if value is None:
+        return '-'
+    return '{:.1f} MB'.format(value / 1e6)
+
+
+def _histogram_line(label, histogram):
+    if histogram is None or not histogram.count:
+        return '{:<28} -'.format(label)
+    return '{:<28} n={:<7} mean={:>8} p50={:>8} p95={:>8} max={:>8} ms'.format(
+        label, histogram.count, _format_ms(histogram.mean), _format_ms(histogram.get_percentile(50)),
+        _format_ms(histogram.get_percentile(95)), _format_ms(histogram.max))
+
+
+def _counter_value(name):
+    counter = metrics.registry.get(name)
+    if counter is None:
+        return 0
+    return counter.value
+
+
+def get_report_lines(main_app, nr_page_switches=15, nr_subscribers=10):
+    """
+    Collects the performance information exposed by core (tracing, metrics, memory) and the main app
+    (job queue, page lifecycle, watchdog).
+    :return: list of lines
+    """
+    lines = ['SHARKtools {}    {}    {}'.format(main_app.version, main_app.computer_name,
+                                               datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+             '']
+
+    lines.append('== Process ==')
+    process_memory = memory.get_process_memory()
+    lines.append('Memory: {} (peak {})'.format(_format_mb(process_memory['rss']),
+                                               _format_mb(process_memory['peak_rss'])))
+    if process_memory['traced'] is not None:
+        lines.append('Python allocations (tracemalloc): {} (peak {})'.format(
+            _format_mb(process_memory['traced']), _format_mb(process_memory['traced_peak'])))
+    lines.append('Threads: {}    GC counts: {}'.format(threading.active_count(), gc.get_count()))
+    lines.append('Main loop stalls: {}'.format(_counter_value('mainloop.stalls')))
+    lines.append(_histogram_line('Stall duration', metrics.registry.get('mainloop.stall_ms')))
+    lines.append('')
+
+    lines.append('== Startup ==')
+    for span in tracing.get_spans():
+        if not span.name.startswith('startup'):
+            continue
+        name = span.name
+        if 'plugin' in span.attributes:
+            name = '{} ({})'.format(name, span.attributes['plugin'])
+        lines.append('{:<60} {:>10} ms'.format(name, _format_ms(span.duration_ms)))
+    lines.append('')
+
+    lines.append('== Page switches ==')
+    lines.append(_histogram_line('All page switches', metrics.registry.get('page.switch_ms')))
+    for span in tracing.get_spans('page.switch')[-nr_page_switches:][::-1]:
+        lines.append('    {:<56} {:>10} ms'.format(span.attributes.get('page', ''), _format_ms(span.duration_ms)))
+    lines.append('')
+
+    lines.append('== Settings I/O ==')
+    lines.append('Reads: {}    Writes: {}    Written: {:.1f} kB'.format(
+        _counter_value('settings.reads'), _counter_value('settings.writes'),
+        _counter_value('settings.bytes_written') / 1024))
+    lines.append(_histogram_line('Read', metrics.registry.get('settings.read_ms')))
+    lines.append(_histogram_line('Write', metrics.registry.get('settings.write_ms')))
+    directory_mirror = getattr(main_app, 'mirror', None)
+    if directory_mirror:
+        status = directory_mirror.get_status()
+        lines.append('Local mirror: {}  ({} -> {})'.format(status['state'], status['local_directory'],
+                                                        status['remote_directory']))
+        lines.append('Pending: {}    Copied: {}    Pulled: {}    Conflicts: {}'.format(
+            status['pending'], _counter_value('mirror.pushed'), _counter_value('mirror.pulled'),
+            _counter_value('mirror.conflicts')))
+        lines.append(_histogram_line('Sync', metrics.registry.get('mirror.sync_ms')))
+    lines.append('')
+
+    lines.append('== Event bus ==')
+    lines.append('Posted events: {}'.format(_counter_value('events.posted')))
+    lines.append(_histogram_line('Dispatch', metrics.registry.get('events.dispatch_ms')))
+    prefix = 'events.subscriber_ms.'
+    subscribers = [metrics.registry.get(name) for name in metrics.registry.get_names(prefix)]
+    subscribers = sorted(subscribers, key=lambda item: -item.sum)[:nr_subscribers]
+    if subscribers:
+        lines.append('Hot subscribers (total time):')
+    for histogram in subscribers:
+        lines.append('    {:<56} {:>10} ms  n={} max={} ms'.format(
+            histogram.name[len(prefix):], _format_ms(histogram.sum), histogram.count, _format_ms(histogram.max)))
+    lines.append('')
+
+    lines.append('== Jobs ==')
+    job_queue = getattr(main_app, 'job_queue', None)
+    if job_queue:
+        lines.append('Running: {}    Queued: {}    Finished: {}    Failed: {}'.format(
+            job_queue.nr_running, job_queue.nr_queued, _counter_value('jobs.finished'),
+            _counter_value('jobs.failed')))
+        lines.append(_histogram_line('Wait in queue', metrics.registry.get('jobs.wait_ms')))
+        for job in job_queue.get_running():
+            fraction = job.task.fraction
+            progress = '' if fraction is None else '{:.0f} %'.format(fraction * 100)
+            lines.append('    {:<40} {:<15} {:>10} {:>6}'.format(job.name, job.owner, format_seconds(job.duration),
+                                                                 progress))
+    lines.append('')
+
+    figure_pool = getattr(main_app, 'figure_pool', None)
+    if figure_pool:
+        lines.append('== Figures ==')
+        lines.append('Live: {}    In use: {}    Created: {}    Reused: {}    Evicted: {}'.format(
+            figure_pool.nr_figures, figure_pool.nr_in_use, _counter_value('figure_pool.created'),
+            _counter_value('figure_pool.reused'), _counter_value('figure_pool.evicted')))
+        lines.append('')
+
+    lines.append('== Page memory (estimate) ==')
+    page_lifecycle = getattr(main_app, 'page_lifecycle', None)
+    memory_report = page_lifecycle.memory_report if page_lifecycle else {}
+    if not memory_report:
+        lines.append('Not estimated yet')
+    for page_name, nr_bytes in sorted(memory_report.items(), key=lambda item: -item[1]):
+        lines.append('    {:<56} {:>10}'.format(page_name, _format_mb(nr_bytes)))
+    return lines
+
+
+class PagePerformance(tk.Frame):
+    """
+    Shows live performance information: startup timings, page switches, settings I/O, event bus, jobs and
+    memory. The report can be exported together with the metrics and the timing trace.
+    """
+    refresh_interval = 2000
+
+    def __init__(self, parent, main_app, **kwargs):
+        tk.Frame.__init__(self, parent, **kwargs)
+        # parent is the frame "container" in App. contoller is the App class
+        self.parent = parent
+        self.main_app = main_app
+        self._after_id = None
+
+    def startup(self):
+        self._set_frame()
+
+    def update_page(self):
+        self._refresh()
+
+    def close(self):
+        if self._after_id:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _set_frame(self):
+        padx = 5
+        pady = 5
+        frame_buttons = tk.Frame(self)
+        frame_buttons.grid(row=0, column=0, sticky='nsew', padx=padx, pady=pady)
+        ttk.Button(frame_buttons, text='Refresh', command=self._refresh).grid(row=0, column=0, padx=padx, pady=pady)
+        ttk.Button(frame_buttons, text='Estimate page memory',
+                   command=self._estimate_page_memory).grid(row=0, column=1, padx=padx, pady=pady)
+        ttk.Button(frame_buttons, text='Export report',
+                   command=self._export_report).grid(row=0, column=2, padx=padx, pady=pady)
+        self.booleanvar_auto_refresh = tk.BooleanVar(value=True)
+        ttk.Checkbutton(frame_buttons, text='Auto refresh', variable=self.booleanvar_auto_refresh,
+                        command=self._refresh).grid(row=0, column=3, padx=padx, pady=pady)
+
+        self.text_report = scrolledtext.ScrolledText(self, font=('Courier', 9), wrap='none')
+        self.text_report.grid(row=1, column=0, sticky='nsew', padx=padx, pady=pady)
+        self.text_report.config(state='disabled')
+
+        tkw.grid_configure(self, nr_rows=2, r0=1, r1=20)
+
+    def _refresh(self):
+        if self._after_id:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        # Keep the scroll position while refreshing
+        position = self.text_report.yview()[0]
+        self.text_report.config(state='normal')
+        self.text_report.delete('1.0', 'end')
+        self.text_report.insert('1.0', '\n'.join(get_report_lines(self.main_app)))
+        self.text_report.config(state='disabled')
+        self.text_report.yview_moveto(position)
+        if self.booleanvar_auto_refresh.get():
+            self._after_id = self.after(self.refresh_interval, self._on_timer)
+
+    def _on_timer(self):
+        self._after_id = None
+        # Stop refreshing when another page has been raised
+        if self.main_app.active_page == 'PagePerformance':
+            self._refresh()
+
+    def _estimate_page_memory(self):
+        self.main_app.page_lifecycle.update_memory_report(callback=lambda report: self._refresh())
+
+    def _export_report(self):
+        """ Writes the report, the metrics snapshot and the timing trace to the log directory. """
+        directory = Path(self.main_app.log_directory)
+        time_string = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        report_file_path = Path(directory, 'performance_report_{}.txt'.format(time_string))
+        with open(report_file_path, 'w', encoding='utf-8') as fid:
+            fid.write('\n'.join(get_report_lines(self.main_app)))
+            fid.write('\n')
+        metrics_file_path = Path(directory, 'performance_metrics_{}.json'.format(time_string))
+        with open(metrics_file_path, 'w') as fid:
+            json.dump(metrics.get_snapshot(version=self.main_app.version), fid, indent=1)
+        trace_file_path = tracing.export_chrome_trace(Path(directory,
+                                                           'performance_trace_{}.json'.format(time_string)))
+        widgets.show_information('Export report', 'Performance report saved to:\n{}\n{}\n{}'.format(
+            report_file_path, metrics_file_path, trace_file_path))
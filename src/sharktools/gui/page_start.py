@@ -1,6 +1,10 @@
 import tkinter as tk
 import shark_tkinter_lib.tkinter_widgets as tkw
 
+from sharktools.core.logs import get_logger
+
+logger = get_logger(__name__)
+
 
 
 
@@ -82,7 +86,7 @@ class PageStart(tk.Frame):
             # try:
                 # text = self.button_texts[page]
             color = self.button_colors[page_name]
-            print('startup', page_name)
+            logger.debug('startup %s', page_name)
             self.button[page_name] = tk.Button(self.frames[r][c],
                                  text=text,
                                  command=lambda x=page_name: self.main_app.show_frame(page_name=x),
@@ -97,7 +101,7 @@ class PageStart(tk.Frame):
             if c >= nr_columns:
                 c = 0
                 r += 1
-            print('OK', text, page_name)
+            logger.debug('OK %s %s', text, page_name)
             # except:
             #     pass
 
@@ -0,0 +1,125 @@
+import tkinter as tk
+from tkinter import ttk
+
+from sharktools.core.tasks import format_seconds
+from sharktools.gui.widgets import show_error
+
+
+class ProgressWindow(object):
+    """
+    Toplevel window showing the progress of a core.Task. The window is polled with "after" so it never
+    blocks the main loop, and it is withdrawn automatically when the task is finished. If the task failed an
+    error message is shown.
+
+    withdraw, deiconify, title, geometry, update and update_idletasks are those of the tk.Toplevel so that code
+    written when MainApp.progress_window was a tk.Toplevel still works.
+    """
+    def __init__(self, controller, title='Arbetar...', poll_interval=100):
+        self.controller = controller
+        self.window_title = title
+        self.poll_interval = poll_interval
+        self.task = None
+        self._after_id = None
+
+        self.toplevel = tk.Toplevel(self.controller)
+        self.toplevel.geometry('400x200')
+        self.toplevel.protocol('WM_DELETE_WINDOW', lambda: None)
+
+        self.stringvar_text = tk.StringVar()
+        self.stringvar_message = tk.StringVar()
+        self.stringvar_time = tk.StringVar()
+
+        self._set_frame()
+        self.toplevel.withdraw()
+
+    def _set_frame(self):
+        padx = 5
+        pady = 5
+        self.label_text = tk.Label(self.toplevel, textvariable=self.stringvar_text)
+        self.label_text.grid(row=0, column=0, padx=padx, pady=pady)
+        self.progressbar = ttk.Progressbar(self.toplevel, orient=tk.HORIZONTAL, length=350, mode='indeterminate')
+        self.progressbar.grid(row=1, column=0, padx=padx, pady=pady)
+        tk.Label(self.toplevel, textvariable=self.stringvar_message).grid(row=2, column=0, padx=padx, pady=pady)
+        tk.Label(self.toplevel, textvariable=self.stringvar_time).grid(row=3, column=0, padx=padx, pady=pady)
+        self.toplevel.grid_columnconfigure(0, weight=1)
+
+    def withdraw(self):
+        self.toplevel.withdraw()
+
+    def deiconify(self):
+        self.toplevel.deiconify()
+
+    def title(self, string=None):
+        return self.toplevel.title(string)
+
+    def geometry(self, new_geometry=None):
+        return self.toplevel.geometry(new_geometry)
+
+    def update(self):
+        self.toplevel.update()
+
+    def update_idletasks(self):
+        self.toplevel.update_idletasks()
+
+    def show(self, text='', task=None):
+        """
+        Shows the window. If a task is given the progressbar follows it and the window is closed when the
+        task is finished.
+        :param text:
+        :param task: core.Task
+        :return:
+        """
+        self.task = task
+        self.stringvar_text.set(text)
+        self.stringvar_message.set('')
+        self.stringvar_time.set('')
+        self.toplevel.title(self.window_title)
+        x = self.controller.winfo_x()
+        y = self.controller.winfo_y()
+        self.toplevel.geometry('+%d+%d' % (x + 300, y + 200))
+        if task is not None and task.determinate:
+            self.progressbar.stop()
+            self.progressbar.config(mode='determinate', maximum=100, value=0)
+        else:
+            self.progressbar.config(mode='indeterminate')
+            self.progressbar.start(20)
+        self.toplevel.deiconify()
+        self.toplevel.update_idletasks()
+        self._schedule_poll()
+
+    def hide(self):
+        self._cancel_poll()
+        self.progressbar.stop()
+        self.task = None
+        self.toplevel.withdraw()
+
+    def _schedule_poll(self):
+        self._cancel_poll()
+        self._after_id = self.toplevel.after(self.poll_interval, self._poll)
+
+    def _cancel_poll(self):
+        if self._after_id:
+            self.toplevel.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _poll(self):
+        self._after_id = None
+        task = self.task
+        if task is None:
+            return
+        if task.is_done:
+            text = self.stringvar_text.get()
+            self.hide()
+            if task.exception is not None:
+                show_error('Error', '{}\n\n{} failed:\n{}'.format(text, task.name or 'The task', task.exception))
+            return
+        fraction = task.fraction
+        if fraction is not None:
+            if str(self.progressbar.cget('mode')) != 'determinate':
+                self.progressbar.stop()
+                self.progressbar.config(mode='determinate', maximum=100)
+            self.progressbar.config(value=fraction * 100)
+        self.stringvar_message.set(task.message)
+        self.stringvar_time.set('Elapsed: {}    Remaining: {}'.format(format_seconds(task.elapsed),
+                                                                      format_seconds(task.remaining)))
+        self._schedule_poll()
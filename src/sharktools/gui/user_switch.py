@@ -0,0 +1,104 @@
+import tkinter as tk
+from pathlib import Path
+from tkinter import ttk
+
+import shark_tkinter_lib.tkinter_widgets as tkw
+
+
+class UserSwitchDialog(object):
+    """
+    Searchable list of users backed by the user index (core.UserIndex) of the user manager.
+    The most recently used users are listed first. Type to filter, Enter or double click to select.
+    """
+    max_shown = 500
+
+    def __init__(self, controller, user_manager, callback=None, title='Switch user'):
+        """
+        :param callback: called with the selected user name
+        """
+        self.controller = controller
+        self.user_manager = user_manager
+        self.callback = callback
+        self.users_directory = user_manager.current_user_directory
+        self._shown_users = []
+
+        self.popup_frame = tk.Toplevel(controller)
+        self.popup_frame.title(title)
+        self.popup_frame.transient(controller)
+        self._set_frame()
+        self._filter()
+        self.entry.focus_set()
+
+    def _set_frame(self):
+        grid = dict(padx=5, pady=5)
+        self.stringvar_search = tk.StringVar()
+        self.stringvar_search.trace_add('write', lambda *args: self._filter())
+        tk.Label(self.popup_frame, text='Search:').grid(row=0, column=0, sticky='w', **grid)
+        self.entry = tk.Entry(self.popup_frame, textvariable=self.stringvar_search, width=40)
+        self.entry.grid(row=0, column=1, sticky='ew', **grid)
+
+        frame = tk.Frame(self.popup_frame)
+        frame.grid(row=1, column=0, columnspan=2, sticky='nsew', **grid)
+        self.tree = ttk.Treeview(frame, columns=['user', 'last_used'], show='headings', height=15,
+                                 selectmode='browse')
+        self.tree.heading('user', text='User')
+        self.tree.heading('last_used', text='Last used')
+        self.tree.column('user', width=200)
+        self.tree.column('last_used', width=140)
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.tree.yview)
+        scrollbar.grid(row=0, column=1, sticky='ns')
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        tkw.grid_configure(frame)
+
+        self.stringvar_info = tk.StringVar()
+        tk.Label(self.popup_frame, textvariable=self.stringvar_info).grid(row=2, column=0, columnspan=2,
+                                                                         sticky='w', **grid)
+        frame_buttons = tk.Frame(self.popup_frame)
+        frame_buttons.grid(row=3, column=0, columnspan=2, sticky='e', **grid)
+        tk.Button(frame_buttons, text='Switch', command=self._select).grid(row=0, column=0, **grid)
+        tk.Button(frame_buttons, text='Cancel', command=self.close).grid(row=0, column=1, **grid)
+        tkw.grid_configure(self.popup_frame, nr_rows=4, nr_columns=2, r1=10, c1=10)
+
+        self.tree.bind('<Double-1>', lambda event: self._select())
+        self.popup_frame.bind('<Return>', lambda event: self._select())
+        self.popup_frame.bind('<Escape>', lambda event: self.close())
+        self.entry.bind('<Down>', self._focus_list)
+
+    def _filter(self):
+        users = self.user_manager.user_index.search(self.stringvar_search.get(),
+                                                    users_directory=self._get_users_directory())
+        self._shown_users = users[:self.max_shown]
+        self.tree.delete(*self.tree.get_children())
+        for name in self._shown_users:
+            last_used = self.user_manager.user_index.get_last_used(name)
+            last_used = last_used.strftime('%Y-%m-%d %H:%M') if last_used else ''
+            self.tree.insert('', 'end', iid=name, values=[name, last_used])
+        if self._shown_users:
+            self.tree.selection_set(self._shown_users[0])
+        info = '{} users'.format(len(users))
+        if len(users) > self.max_shown:
+            info += ' ({} shown, refine the search)'.format(self.max_shown)
+        self.stringvar_info.set(info)
+
+    def _get_users_directory(self):
+        if self.users_directory is None:
+            return None
+        return Path(self.users_directory).absolute()
+
+    def _focus_list(self, event=None):
+        self.tree.focus_set()
+        if self._shown_users:
+            self.tree.focus(self._shown_users[0])
+
+    def _select(self):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        user_name = selection[0]
+        self.close()
+        if self.callback:
+            self.callback(user_name)
+
+    def close(self):
+        self.popup_frame.destroy()
@@ -0,0 +1,111 @@
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from sharktools.core import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MainLoopWatchdog(object):
+    """
+    Detects when the tkinter main loop does not process events.
+
+    A heartbeat "after" callback in the GUI thread updates a timestamp every heartbeat_interval ms. A helper
+    thread checks the timestamp. When it is older than threshold seconds the stack of the main thread is
+    sampled nr_samples times during the stall and written to the log together with the active page.
+    """
+    def __init__(self, root, threshold=2., heartbeat_interval=200, nr_samples=5, sample_interval=0.2,
+                 get_context=None):
+        self.root = root
+        self.threshold = threshold
+        self.heartbeat_interval = heartbeat_interval
+        self.nr_samples = nr_samples
+        self.sample_interval = sample_interval
+        self.get_context = get_context
+        self.nr_stalls = 0
+        self._last_beat = time.monotonic()
+        self._main_thread_id = threading.main_thread().ident
+        self._after_id = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._main_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._beat()
+        self._thread = threading.Thread(target=self._watch, name='mainloop-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._after_id:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        self._thread = None
+
+    def _beat(self):
+        self._last_beat = time.monotonic()
+        self._after_id = self.root.after(self.heartbeat_interval, self._beat)
+
+    def _watch(self):
+        check_interval = min(self.threshold / 4, 0.5)
+        while not self._stop.wait(check_interval):
+            stall_time = time.monotonic() - self._last_beat
+            if stall_time > self.threshold:
+                self._record_stall(stall_time)
+
+    def _get_main_stack(self):
+        frame = sys._current_frames().get(self._main_thread_id)
+        if frame is None:
+            return []
+        return traceback.format_stack(frame)
+
+    def _record_stall(self, stall_time):
+        self.nr_stalls += 1
+        metrics.counter('mainloop.stalls').inc()
+        beat_before = self._last_beat
+        context = ''
+        if self.get_context:
+            try:
+                context = self.get_context()
+            except Exception:
+                pass
+        samples = []
+        for i in range(self.nr_samples):
+            if self._last_beat != beat_before or self._stop.is_set():
+                break
+            samples.append(self._get_main_stack())
+            self._stop.wait(self.sample_interval)
+
+        # Group identical samples so that the blocking call is easy to spot
+        lines = ['Main loop stalled for more than {:.1f} s (stall nr {}). Active page: {}'.format(
+            stall_time, self.nr_stalls, context)]
+        distinct = []
+        for stack in samples:
+            for item in distinct:
+                if item[0] == stack:
+                    item[1] += 1
+                    break
+            else:
+                distinct.append([stack, 1])
+        for stack, count in distinct:
+            lines.append('--- Main thread stack ({} of {} samples) ---'.format(count, len(samples)))
+            lines.append(''.join(stack).rstrip())
+        logger.warning('\n'.join(lines))
+
+        # Wait for the main loop to recover before looking for the next stall
+        while self._last_beat == beat_before and not self._stop.wait(self.sample_interval):
+            pass
+        if self._stop.is_set():
+            return
+        stall_time = time.monotonic() - beat_before
+        metrics.histogram('mainloop.stall_ms').observe(stall_time * 1000)
+        logger.warning('Main loop responsive again after {:.1f} s'.format(stall_time))
@@ -1,11 +1,16 @@
 import os
 import tkinter as tk
 from tkinter import messagebox
+from tkinter import scrolledtext
 from tkinter import ttk
 
-import matplotlib as mpl
 import shark_tkinter_lib.tkinter_widgets as tkw
 
+from sharktools.core.lazy_import import lazy_import
+
+# matplotlib is only needed when a MovableText is used
+matplotlib_text = lazy_import('matplotlib.text')
+
 
 class SaveWidget(ttk.LabelFrame):
     def __init__(self, 
@@ -258,78 +263,99 @@ class SaveWidgetHTML(ttk.LabelFrame):
 class MovableText(object):
     """ A simple class to handle Drag n Drop.
 
-    This is a simple example, which works for Text objects only
+    This is a simple example, which works for Text objects only.
+    While dragging only the text is redrawn on top of a cached background (blitting). The figure is redrawn
+    once when the text is released.
     """
-    def __init__(self, figure=None) :
+    def __init__(self, figure=None, use_blit=True) :
         """ Create a new drag handler and connect it to the figure's event system.
         If the figure handler is not given, the current figure is used instead
+        :param use_blit: redraw only the dragged text during motion. Ignored if the backend can not blit
         """
         self.fig = figure
 #         if figure is None : figure = p.gcf()
         # simple attibute to store the dragged text object
         self.dragged = None
+        self.use_blit = use_blit and getattr(self.fig.canvas, 'supports_blit', False)
+        self.background = None
+        self.pick_pixel = None
+        self.start_pixel = None
         self.events = {}
 
         # Connect events and callbacks
-#         figure.canvas.mpl_connect("pick_event", self.on_pick_event)
         self.events[u'pick_event'] = self.fig.canvas.mpl_connect('pick_event', lambda event: self.on_pick_event(event))
-#         self.events[u'button_press_event'] = self.fig.canvas.mpl_connect('button_pres_event', lambda event: self.on_press_event(event)) # Have to remove saved entris too.
         self.events[u'button_release_event'] = self.fig.canvas.mpl_connect('button_release_event', lambda event: self.on_release_event(event))
-#         self.events[u'motion_notify_event'] = self.fig.canvas.mpl_connect('motion_notify_event', lambda event: self.on_motion_notify_event(event))
-#         figure.canvas.mpl_connect("button_release_event", self.on_release_event)
-        
+        self.events[u'motion_notify_event'] = self.fig.canvas.mpl_connect('motion_notify_event', lambda event: self.on_motion_notify_event(event))
+        self.events[u'draw_event'] = self.fig.canvas.mpl_connect('draw_event', lambda event: self.on_draw_event(event))
+
     def on_pick_event(self, event):
         " Store which text object was picked and were the pick event occurs."
-        
-#         print('on_pick_event', event.mouseevent.key 
-        if isinstance(event.artist, mpl.text.Text):
+        if isinstance(event.artist, matplotlib_text.Text):
             if event.mouseevent.button == 3:
                 event.artist.remove()
-                self.fig.canvas.draw()
+                self.fig.canvas.draw_idle()
                 return
+            if self.dragged is not None:
+                return True
             self.dragged = event.artist
-            self.pick_pos = (event.mouseevent.xdata, event.mouseevent.ydata)
+            # Positions are handled in pixels so that texts in any coordinate system can be moved
+            self.pick_pixel = (event.mouseevent.x, event.mouseevent.y)
+            self.start_pixel = self.dragged.get_transform().transform(self.dragged.get_position())
+            if self.use_blit:
+                # The figure is drawn once without the text. on_draw_event caches that as background
+                self.dragged.set_animated(True)
+                self.fig.canvas.draw()
         return True
-    
+
     #==========================================================================
     def on_press_event(self, event):
-#         print(event.button
         if event.button == 3 and self.dragged:
             self.dragged.remove()
             self.dragged = None
-            self.fig.canvas.draw()
-            
+            self.fig.canvas.draw_idle()
+
+    #==========================================================================
+    def on_draw_event(self, event):
+        " Cache the background (the figure without the dragged text). Also called when the figure is resized."
+        if self.dragged is None or not self.use_blit:
+            return
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.fig.draw_artist(self.dragged)
+
+    def _move_dragged(self, event):
+        new_pixel = (self.start_pixel[0] + event.x - self.pick_pixel[0],
+                     self.start_pixel[1] + event.y - self.pick_pixel[1])
+        self.dragged.set_position(self.dragged.get_transform().inverted().transform(new_pixel))
+
     #==========================================================================
     def on_release_event(self, event):
         " Update text position and redraw"
-        
-#         print('on_release_event'
-        if self.dragged is not None :
-            old_pos = self.dragged.get_position()
-            new_pos = (old_pos[0] + event.xdata - self.pick_pos[0],
-                       old_pos[1] + event.ydata - self.pick_pos[1])
-            self.dragged.set_position(new_pos)
+        if self.dragged is not None:
+            self._move_dragged(event)
+            self.dragged.set_animated(False)
             self.dragged = None
-            self.fig.canvas.draw()
+            self.background = None
+            self.fig.canvas.draw_idle()
         return True
-    
+
     #==========================================================================
     def on_motion_notify_event(self, event):
-        " Update text position and redraw"
-        
-        if self.dragged is not None :
-            print('on_motion_notify_event')
-            old_pos = self.dragged.get_position()
-            new_pos = (old_pos[0] + event.xdata - self.pick_pos[0],
-                       old_pos[1] + event.ydata - self.pick_pos[1])
-            self.dragged.set_position(new_pos)
-            self.fig.canvas.draw()
+        " Update text position and redraw only the text"
+        if self.dragged is None:
+            return True
+        self._move_dragged(event)
+        if self.use_blit and self.background is not None:
+            self.fig.canvas.restore_region(self.background)
+            self.fig.draw_artist(self.dragged)
+            self.fig.canvas.blit(self.fig.bbox)
+        else:
+            self.fig.canvas.draw_idle()
         return True
-    
+
     #==========================================================================
     def disconnect(self):
-        for event in self.events:
-            self.fig.canvas.mpl_disconnect(event)
+        for cid in self.events.values():
+            self.fig.canvas.mpl_disconnect(cid)
         self.events = {}
 
 
@@ -457,6 +483,21 @@ class EntryPopup(object):
         # self.controller.deiconify()
 
 
+def show_text(controller, title, text, width=100, height=30):
+    """
+    Shows a longer (read only) text in a toplevel window.
+    """
+    popup_frame = tk.Toplevel(controller)
+    popup_frame.title(title)
+    text_widget = scrolledtext.ScrolledText(popup_frame, width=width, height=height, font=('Courier', 9))
+    text_widget.grid(row=0, column=0, sticky='nsew', padx=5, pady=5)
+    text_widget.insert('1.0', text)
+    text_widget.config(state='disabled')
+    tk.Button(popup_frame, text='Close', command=popup_frame.destroy).grid(row=1, column=0, padx=5, pady=5)
+    tkw.grid_configure(popup_frame, nr_rows=2, r0=10, r1=1)
+    return popup_frame
+
+
 def show_information(title, message):
     messagebox.showinfo(title, message)
 
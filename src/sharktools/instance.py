@@ -0,0 +1,287 @@
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""
+Single instance support.
+
+The running app listens on a localhost socket. Port and a secret token are written to instance.json in the
+local directory of this computer (see get_local_directory). A second launch sends its request (bring to front,
+open a plugin or sub page) to the running app and exits without loading the GUI.
+
+Only the standard library is imported here so that the hand-off is fast.
+"""
+import contextlib
+import json
+import logging
+import os
+import queue
+import secrets
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def get_local_directory():
+    """
+    Directory for files that only concern this computer, e.g. the ports of running processes. Not in
+    ~/sharktools since the home directory may be on a network share used by several computers (and file locks
+    are unreliable there). The same directory holds the local copies of core.mirror.
+    """
+    if sys.platform == 'win32' and os.environ.get('LOCALAPPDATA'):
+        return Path(os.environ['LOCALAPPDATA'], 'sharktools')
+    cache_directory = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(cache_directory, 'sharktools')
+
+
+INSTANCE_FILE_PATH = Path(get_local_directory(), 'instance.json')
+
+
+def _read_instance_file(file_path):
+    try:
+        with open(file_path) as fid:
+            return json.load(fid)
+    except (OSError, ValueError):
+        return None
+
+
+def write_instance_file(file_path, port, token):
+    """ Writes port and token of a listening process. The file is replaced atomically. """
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = file_path.with_name(file_path.name + '.tmp')
+    with open(tmp_path, 'w') as fid:
+        json.dump({'pid': os.getpid(), 'port': port, 'token': token}, fid)
+    os.replace(tmp_path, file_path)
+
+
+def remove_instance_file(file_path, token):
+    """ Removes the file if it still belongs to the process with the given token. """
+    info = _read_instance_file(file_path)
+    if info and info.get('token') == token:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+
+def read_message(connection, token):
+    """
+    Reads a json message (one line) sent with request().
+    :return: dict without the token, or None if the message is invalid or the token is wrong
+    """
+    try:
+        message = json.loads(connection.makefile('rb').readline())
+    except (OSError, ValueError):
+        logger.debug('Invalid message', exc_info=True)
+        return None
+    if not isinstance(message, dict) or message.pop('token', None) != token:
+        return None
+    return message
+
+
+def send_reply(connection, status='ok', **kwargs):
+    try:
+        connection.sendall(json.dumps(dict(kwargs, status=status)).encode('utf-8') + b'\n')
+    except OSError:
+        pass
+
+
+def request(command, file_path=INSTANCE_FILE_PATH, timeout=1., **kwargs):
+    """
+    Sends a command to the process listed in file_path.
+    :return: the reply as a dict (key "status" is "ok" if accepted), or None if no process is listening
+    """
+    info = _read_instance_file(file_path)
+    if not info:
+        return None
+    message = dict(kwargs, command=command, token=info.get('token'))
+    try:
+        with socket.create_connection(('127.0.0.1', info['port']), timeout=timeout) as sock:
+            sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+            reply = json.loads(sock.makefile('rb').readline())
+    except (OSError, ValueError, KeyError, TypeError):
+        # No one is listening: the file is left from a process that did not exit cleanly
+        return None
+    return reply if isinstance(reply, dict) else None
+
+
+def send_command(command, file_path=INSTANCE_FILE_PATH, timeout=1., **kwargs):
+    """
+    Sends a command to the running instance.
+    :return: True if the running instance accepted the command, False if there is no running instance
+    """
+    reply = request(command, file_path=file_path, timeout=timeout, **kwargs)
+    return bool(reply) and reply.get('status') == 'ok'
+
+
+def forward_to_running_instance(plugin=None, sub_page=None, file_path=INSTANCE_FILE_PATH):
+    """ Asks a running instance to come to the front and optionally show plugin/sub_page. """
+    return send_command('show', file_path=file_path, plugin=plugin, sub_page=sub_page)
+
+
+def _lock_file(fid):
+    """ Blocks until the lock is taken. On Windows OSError is raised after 10 seconds. """
+    if sys.platform == 'win32':
+        import msvcrt
+        fid.seek(0)
+        msvcrt.locking(fid.fileno(), msvcrt.LK_LOCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(fid.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock_file(fid):
+    if sys.platform == 'win32':
+        import msvcrt
+        fid.seek(0)
+        msvcrt.locking(fid.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(fid.fileno(), fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def _exclusive_lock(file_path):
+    """
+    Exclusive lock on <file_path>.lock held by one process at a time (blocks until it is free).
+    Yields True if the lock was taken and False if it could not be taken (nothing is locked then).
+    """
+    lock_path = Path(file_path).with_name(Path(file_path).name + '.lock')
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a+') as fid:
+        try:
+            _lock_file(fid)
+            locked = True
+        except OSError:
+            logger.warning('Could not lock {}'.format(lock_path), exc_info=True)
+            locked = False
+        try:
+            yield locked
+        finally:
+            if locked:
+                _unlock_file(fid)
+
+
+def claim_instance(plugin=None, sub_page=None, file_path=INSTANCE_FILE_PATH):
+    """
+    Forwards the request to the running instance, or makes this process the running instance.
+    Both are done under an exclusive lock so that launches at the same moment do not both become servers.
+    If the lock can not be taken (held too long by another launch) the request is still forwarded if possible,
+    otherwise this process becomes the running instance without the lock.
+    :return: None if the request was forwarded, otherwise a started InstanceServer
+    """
+    with _exclusive_lock(file_path) as locked:
+        if forward_to_running_instance(plugin=plugin, sub_page=sub_page, file_path=file_path):
+            return None
+        if not locked:
+            logger.warning('No running instance found. Starting without the instance lock.')
+        server = InstanceServer(file_path=file_path)
+        server.start()
+        return server
+
+
+def take_over_instance(file_path=INSTANCE_FILE_PATH):
+    """
+    Makes this process the running instance, also if another process is listed in file_path. Used by an app
+    started for a launch that has already claimed the instance (see sharktools.zygote). The launch passes on the
+    requests it receives until then, see InstanceServer.wait_for_take_over.
+    :return: started InstanceServer
+    """
+    with _exclusive_lock(file_path):
+        server = InstanceServer(file_path=file_path)
+        server.start()
+        return server
+
+
+class InstanceServer(object):
+    """
+    Accepts commands from new launches in a background thread. Commands are put on a queue and are
+    handled in the GUI thread by polling get_commands() (see MainApp).
+    """
+    def __init__(self, file_path=INSTANCE_FILE_PATH):
+        self.file_path = Path(file_path)
+        self.token = secrets.token_hex(16)
+        self.port = None
+        self._queue = queue.Queue()
+        self._sock = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen(5)
+        self._sock.settimeout(0.5)
+        self.port = self._sock.getsockname()[1]
+        write_instance_file(self.file_path, self.port, self.token)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='instance-server', daemon=True)
+        self._thread.start()
+        logger.info('Listening for new launches on port {}'.format(self.port))
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(2)
+        self._thread = None
+        self._sock.close()
+        self._sock = None
+        remove_instance_file(self.file_path, self.token)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                connection, address = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            with connection:
+                self._handle(connection)
+
+    def _handle(self, connection):
+        connection.settimeout(1)
+        message = read_message(connection, self.token)
+        if message is None:
+            send_reply(connection, 'denied')
+            return
+        self._queue.put(message)
+        send_reply(connection)
+
+    def wait_for_take_over(self, timeout=30., poll_interval=0.05):
+        """
+        Waits until another process has taken over the instance (see take_over_instance). Then this server is
+        stopped and the commands received here are sent to the new instance.
+        :return: True if taken over, False if not within timeout seconds (this server is still running)
+        """
+        end_time = time.monotonic() + timeout
+        while True:
+            info = _read_instance_file(self.file_path)
+            if info and info.get('token') != self.token:
+                break
+            if time.monotonic() > end_time:
+                return False
+            time.sleep(poll_interval)
+        self.stop()
+        for message in self.get_commands():
+            send_command(message.pop('command'), file_path=self.file_path, **message)
+        return True
+
+    def get_commands(self):
+        """ Returns (and removes) the received commands as a list of dicts with at least the key "command". """
+        commands = []
+        while True:
+            try:
+                commands.append(self._queue.get_nowait())
+            except queue.Empty:
+                return commands
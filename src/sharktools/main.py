@@ -4,6 +4,8 @@ import logging.handlers
 import os
 import pathlib
 import socket
+import threading
+import time
 import tkinter as tk
 from importlib.metadata import entry_points
 from pathlib import Path
@@ -12,14 +14,23 @@ import screeninfo
 import shark_tkinter_lib.tkinter_widgets as tkw
 
 from sharktools import core
+from sharktools import instance
+from sharktools import zygote
+from sharktools.core import metrics
+from sharktools.core import mirror
+from sharktools.core import tracing
 from sharktools.core.exceptions import *
 from sharktools import gui
 
+logger = core.logs.get_logger(__name__)
+
 ROOT_PATH = Path(__file__).parent
 
 ALL_PAGES = dict()
 ALL_PAGES['PageStart'] = gui.PageStart
 ALL_PAGES['PageAbout'] = gui.PageAbout
+ALL_PAGES['PageJobs'] = gui.PageJobs
+ALL_PAGES['PagePerformance'] = gui.PagePerformance
 
 
 # Initiate plugins
@@ -27,7 +38,8 @@ PLUGINS = dict()
 APP_TO_PAGE = dict()
 for discovered_plugin in entry_points(group='sharktools.plugins'):
     name = discovered_plugin.value
-    module = discovered_plugin.load()
+    with tracing.span('startup.import_plugin', plugin=name):
+        module = discovered_plugin.load()
     PLUGINS[name] = module
     APP_TO_PAGE[module] = name
     ALL_PAGES[name] = module
@@ -73,6 +85,7 @@ class MainApp(tk.Tk):
         """
         Updated 20181002
         """
+        startup_time = time.perf_counter_ns()
         self.all_ok = True
         self.version = '2019.10.1'
 
@@ -98,9 +111,18 @@ class MainApp(tk.Tk):
         self._set_user_settings()
 
         self.computer_name = self._get_computer_name()
-        self.user_manager = core.UserManager(users_root_directory=self.users_directory, app_root_directory=self.root_directory)
 
-        self._load_user()
+        # Shared by settings, core.Paths and plugins. Resolves "{root}/...", "{home}/..." and "{plugin}/..."
+        self.path_resolver = core.PathTokenResolver(root=self.root_directory, home=self.home_directory)
+
+        with tracing.span('startup.load_users'):
+            # Before any file in home_directory is read
+            self._start_mirror()
+            self.user_manager = core.UserManager(users_root_directory=self.users_directory,
+                                                 app_root_directory=self.root_directory,
+                                                 path_resolver=self.path_resolver)
+            self._update_mirror_settings()
+            self._load_user()
         # self.all_ok = False
         # return
 
@@ -109,22 +131,23 @@ class MainApp(tk.Tk):
 
         self.logger = None
         # self.logging_level = 'WARNING'
-        self.logging_level = self.user_manager.get_app_settings('logging', 'level', 'DEBUG')
+        self.logging_level = self.user_manager.get_app_settings('logging', 'level', 'DEBUG', save=False)
         self.logging_format = '%(asctime)s [%(levelname)10s]    %(pathname)s [%(lineno)d] => %(funcName)s():    %(message)s'
         self.logging_format_stdout = '[%(levelname)10s] %(filename)s: %(funcName)s() [%(lineno)d] %(message)s'
-        self._setup_logger(**kwargs)
+        with tracing.span('startup.setup_logger'):
+            self._setup_logger(**kwargs)
 
         self.logger.debug('===== START ======')
 
         # Load paths
-        self.paths = core.Paths(self.app_directory)
+        self.paths = core.Paths(self.app_directory, path_resolver=self.path_resolver)
 
         # TODO: See if root directory and Settings are necessary
         # self.settings = core.Settings(default_settings_file_path=default_settings_file_path,
         #                               root_directory=self.root_directory)
 
         def_geo = '1480x950+0+0'
-        geo = self.user_manager.get_app_settings('main window', 'geometry', def_geo)
+        geo = self.user_manager.get_app_settings('main window', 'geometry', def_geo, save=False)
         if len(screeninfo.get_monitors()) == 1:
             monitor = screeninfo.get_monitors()[0]
             sc, lr, ud = geo.split('+')
@@ -153,34 +176,85 @@ class MainApp(tk.Tk):
         self.progress_running_toplevel = False
 
         self.progress_window = None
+        self.async_loop = None
+        self.instance_server = None
+        self.profiler = core.SamplingProfiler()
+        self.memory_snapshots = core.MemorySnapshots()
+        if self.user_manager.get_app_settings('memory', 'trace at startup', False, save=False):
+            self.memory_snapshots.take('startup')
+        self._menubar_users_key = None
+        self._save_app_settings_after_id = None
+
+        # Shared matplotlib figures and canvases for plugin plots and exports
+        self.figure_pool = gui.FigurePool(
+            max_figures=self.user_manager.get_app_settings('figure pool', 'max figures', 20, save=False))
+
+        # Central job queue shared by all plugins
+        max_concurrent_jobs = self.user_manager.get_app_settings('jobs', 'max concurrent', 2, save=False)
+        # SQLite is not used on the (possibly network mounted) home directory
+        self.job_queue = core.JobQueue(max_concurrent=max_concurrent_jobs,
+                                       history_path=Path(instance.get_local_directory(), 'jobs.sqlite'))
+
+        with tracing.span('startup.build_window'):
+            self._set_frame()
+
+            # Make menu at the top
+            self._set_menubar()
+            self.selected_logging_level.set(self.logging_level)
+
+        # Progress window. Follows a core.Task without blocking the main loop
+        self.progress_window = gui.ProgressWindow(self)
+        self.progress_text = self.progress_window.stringvar_text
+        # Kept for plugins using the attributes of the earlier progress window
+        self.progress_label = self.progress_window.label_text
+
+        with tracing.span('startup.create_pages'):
+            self.startup_pages()
+            self.user_manager.set_users_directory(self.users_directory)
 
-        self._set_frame()
-
-        # Make menu at the top
-        self._set_menubar()
-        self.selected_logging_level.set(self.logging_level)
-
-        # Create a Label in the toplevel widget
-        self.progress_text = tk.StringVar()
-        self.progress_window = tk.Toplevel(self)
-        self.progress_window.geometry("400x200")
-        self.progress_label = tk.Label(self.progress_window, textvariable=self.progress_text)
-        self.progress_label.pack()
-        # self.pbar = ttk.Progressbar(self.progress_window, orient=tk.HORIZONTAL, length=400, mode='determinate')
-        # self.pbar.grid(row=0, column=0)
-        self.progress_window.withdraw()
-
-        self.startup_pages()
-        self.user_manager.set_users_directory(self.users_directory)
+        # Optionally close pages that are not used to free memory
+        self.page_lifecycle = gui.PageLifecycleManager(
+            self,
+            max_idle_minutes=self.user_manager.get_app_settings('page lifecycle', 'max idle minutes', 30, save=False),
+            memory_budget_mb=self.user_manager.get_app_settings('page lifecycle', 'memory budget MB', 0, save=False))
+        if self.user_manager.get_app_settings('page lifecycle', 'enabled', False, save=False):
+            self.page_lifecycle.start()
+
+        # Logs the main thread stack when the GUI does not respond
+        self.watchdog = gui.MainLoopWatchdog(
+            self,
+            threshold=self.user_manager.get_app_settings('watchdog', 'threshold seconds', 2, save=False),
+            get_context=lambda: self.active_page)
+        if self.user_manager.get_app_settings('watchdog', 'enabled', True, save=False):
+            # Started when the main loop is running. Building the first page is not a stall. A timer event is
+            # used since idle callbacks also run in the update_idletasks calls made during startup.
+            self.after(0, self.watchdog.start)
+
+        # Periodic snapshot of core.metrics in the log directory. Optionally served on a localhost port
+        self.metrics_exporter = metrics.MetricsExporter(
+            Path(self.log_directory, 'metrics_{}.json'.format(self.computer_name)),
+            interval=self.user_manager.get_app_settings('metrics', 'snapshot interval seconds', 60, save=False),
+            port=self.user_manager.get_app_settings('metrics', 'http port', 0, save=False),
+            version=self.version)
+        if self.user_manager.get_app_settings('metrics', 'enabled', True, save=False):
+            self.metrics_exporter.start()
+
+        # Optionally keep a pre-warmed process for fast launches (see sharktools.zygote)
+        if self.user_manager.get_app_settings('zygote', 'start after launch', False, save=False):
+            self.after(10000, self._start_zygote)
 
         # Show start page given in settings.ini
         self.page_history = ['PageAbout']
-        self.show_default_subframe()
+        with tracing.span('startup.show_default_page'):
+            self.show_default_subframe()
+        # Settings read above are not saved one by one. Missing values are written once here
+        self._save_app_settings()
         # self.show_subframe('SHARKtools_svea_ctd', 'PageBasic')
         # self.show_frame('PageStart')
 
         # self.update_all()
         self.deiconify()
+        tracing.add_span('startup', startup_time)
 
         # self._quick_run_F1(None)
 
@@ -192,18 +266,18 @@ class MainApp(tk.Tk):
         self.logger.setLevel(self.logging_level)
 
         debug_file_path = Path(self.log_directory, f'{name}_debug.log')
-        handler = logging.handlers.TimedRotatingFileHandler(str(debug_file_path), when='H', interval=3, backupCount=10)
-        handler.setLevel(logging.DEBUG)
-        formatter = logging.Formatter(self.logging_format)
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
-
-        debug_file_path = Path(self.log_directory, f'{name}_warning.log')
-        handler = logging.handlers.TimedRotatingFileHandler(str(debug_file_path), when='D', interval=1, backupCount=14)
-        handler.setLevel(logging.WARNING)
-        formatter = logging.Formatter(self.logging_format)
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
+        debug_handler = core.logs.get_rotating_file_handler(debug_file_path, level=logging.DEBUG,
+                                                            fmt=self.logging_format,
+                                                            when='H', interval=3, backupCount=10)
+
+        warning_file_path = Path(self.log_directory, f'{name}_warning.log')
+        warning_handler = core.logs.get_rotating_file_handler(warning_file_path, level=logging.WARNING,
+                                                              fmt=self.logging_format,
+                                                              when='D', interval=1, backupCount=14)
+
+        # File I/O and rotation is done by a listener thread. Log calls only put the record on a queue.
+        self.queue_logging = core.logs.QueueLogging(self.logger, [debug_handler, warning_handler])
+        self.queue_logging.start()
 
         # stream_handler = logging.StreamHandler()
         # stream_formatter = logging.Formatter(self.logging_format_stdout)
@@ -242,26 +316,28 @@ class MainApp(tk.Tk):
                 user_directories[plugin_module] = self._get_users_directory_for_plugin(name)
             # if users_dir:
             #     user_directories[plugin_module] = Path(self.app_directory, '../../plugins', name, users_dir)
-        for plugin_module, directory in user_directories.items():
-            # Load user managers. One for each plugin. We only use one at the end.
-            self.user_manager.set_users_directory(directory)
-            default_user = self.user_manager.get_app_settings('user', 'startup', 'default')
-            # default_user = self.settings.get('user', {}).get('Startup user', 'default')
-            startup_user = self.computer_name
-            self.user_manager.set_user('default', create_if_missing=True)
-            if default_user == 'default':
-                if startup_user not in self.user_manager.get_user_list():
-                    self.user_manager.add_user(startup_user, default_user)
-            else:
-                startup_user = default_user
-            # print('startup_user', startup_user)
-            self.user_manager.set_app_settings('user', 'startup', startup_user)
-            # self.settings.change_setting('user', 'Startup user', startup_user)
-            # self.settings.save_settings()
-            self.user_manager.set_user(startup_user, create_if_missing=True)
-            # self.user = self.user_manager.user
-
-            self._add_user_settings(plugin_module, user_directory=directory)
+        # The user index is written once, not for every user set below
+        with self.user_manager.user_index.delayed_save():
+            for plugin_module, directory in user_directories.items():
+                # Load user managers. One for each plugin. We only use one at the end.
+                self.user_manager.set_users_directory(directory)
+                default_user = self.user_manager.get_app_settings('user', 'startup', 'default', save=False)
+                # default_user = self.settings.get('user', {}).get('Startup user', 'default')
+                startup_user = self.computer_name
+                self.user_manager.set_user('default', create_if_missing=True)
+                if default_user == 'default':
+                    if startup_user not in self.user_manager.get_user_list():
+                        self.user_manager.add_user(startup_user, default_user)
+                else:
+                    startup_user = default_user
+                # print('startup_user', startup_user)
+                self.user_manager.set_app_settings('user', 'startup', startup_user, save=False)
+                # self.settings.change_setting('user', 'Startup user', startup_user)
+                # self.settings.save_settings()
+                self.user_manager.set_user(startup_user, create_if_missing=True)
+                # self.user = self.user_manager.user
+
+                self._add_user_settings(plugin_module, user_directory=directory)
 
     def _add_user_settings(self, plugin_module, user_directory=None):
         user_settings_list = plugin_module.USER_SETTINGS
@@ -316,6 +392,14 @@ class MainApp(tk.Tk):
         self.frame_info = tk.Frame(self.frame_bot)
         self.frame_info.grid(row=0, column=0, sticky="nsew")
 
+        # Sync status of the local mirror
+        self.stringvar_sync_status = tk.StringVar()
+        if self.mirror:
+            label = tk.Label(self.frame_bot, textvariable=self.stringvar_sync_status)
+            label.grid(row=0, column=1, sticky='e', padx=5)
+            label.bind('<Button-1>', self._show_sync_status)
+            self._update_sync_status()
+
         # TODO: Progressbar deactivated. Threading not working as expected.
         self.frame_progress = tk.Frame(self.frame_bot)
 
@@ -325,9 +409,74 @@ class MainApp(tk.Tk):
 
         tkw.grid_configure(self.frame_info)
 
-        tkw.grid_configure(self.frame_bot)
+        if self.mirror:
+            tkw.grid_configure(self.frame_bot, nr_columns=2, c0=20, c1=1)
+        else:
+            tkw.grid_configure(self.frame_bot)
         # tkw.grid_configure(self.frame_bot, nr_columns=3, c0=20, c2=4)
 
+    def _start_mirror(self):
+        """
+        Optionally reads and writes the settings under home_directory (often on a network share) from a local
+        copy. Changes are copied in the background. See core.mirror.
+        The settings of the mirror (app settings section "mirror") are read from a copy on this computer so that
+        nothing is read from home_directory before the mirror is used. The copy is updated by
+        _update_mirror_settings.
+        """
+        self.mirror = None
+        settings = mirror.get_local_settings()
+        if not settings.get('enabled'):
+            return
+        self.mirror = mirror.DirectoryMirror(
+            self.home_directory,
+            settings.get('local directory') or mirror.get_default_local_directory(),
+            sync_interval=settings.get('sync interval seconds', 2),
+            pull_interval=settings.get('pull interval seconds', 60))
+        mirror.register_mirror(self.mirror)
+        self.mirror.start()
+
+    def _update_mirror_settings(self):
+        """
+        Keeps the mirror settings of the app settings on this computer. Changes are used at the next start,
+        except that the mirror is started at once when it is enabled for the first time.
+        """
+        settings = {key: self.user_manager.get_app_settings('mirror', key, default, save=False)
+                    for key, default in [('enabled', False),
+                                         ('local directory', ''),
+                                         ('sync interval seconds', 2),
+                                         ('pull interval seconds', 60)]}
+        if settings != mirror.get_local_settings():
+            try:
+                mirror.save_local_settings(settings)
+            except OSError:
+                logger.exception('Could not save mirror settings')
+                return
+        if self.mirror or not settings['enabled']:
+            return
+        self._start_mirror()
+        # Read again through the mirror so that the files are in the state of the mirror before they are written
+        self.user_manager.reload()
+
+    def _update_sync_status(self):
+        self.stringvar_sync_status.set(self.mirror.get_status_text())
+        self.after(1000, self._update_sync_status)
+
+    def _show_sync_status(self, event=None):
+        status = self.mirror.get_status()
+        lines = ['Local copy: {}'.format(status['local_directory']),
+                 'Synced with: {}'.format(status['remote_directory']),
+                 'Pending changes: {}'.format(status['pending'])]
+        if status['last_sync_time']:
+            lines.append('Last sync: {}'.format(status['last_sync_time'].strftime('%Y-%m-%d %H:%M:%S')))
+        if status['last_error']:
+            lines.append('Error: {}'.format(status['last_error']))
+        if status['conflicts']:
+            lines.append('')
+            lines.append('Changed both here and on the network. The network version is kept in:')
+            lines.extend(status['conflicts'])
+            self.mirror.clear_conflicts()
+        gui.show_information('Sync status', '\n'.join(lines))
+
     def run_progress(self, run_function, message=''):
 
         def run_thread():
@@ -360,7 +509,7 @@ class MainApp(tk.Tk):
                                                                   in_rows=True)
             self.frame_toplevel_progress.update_idletasks()
             self.progress_widget_toplevel.update_idletasks()
-            print('running')
+            logger.debug('Running progress in toplevel')
             self.progress_widget.run_progress(run_function, message=message)
             self.frame_toplevel_progress.destroy()
 
@@ -384,34 +533,41 @@ class MainApp(tk.Tk):
         # Looping all pages to make them active.
         for page_name, Page in ALL_PAGES.items():  # Capital P to emphasize class
             # Destroy old page if called as an update
-            print()
-            print(f'{page_name=}')
-            print(f'{Page=}')
-            print(f'{type(Page)=}')
-            try:
-                Page = Page.App
-                print(f'{type(Page)=}')
-            except:
-                pass
+            logger.debug('Creating page %s: %s', page_name, Page)
             try:
                 self.frames[page_name].destroy()
-                print(page_name, 'Destroyed')
+                logger.debug('Page %s destroyed', page_name)
             except:
                 pass
-            frame = Page(self.container, self)
-            frame.grid(row=0, column=0, sticky="nsew")
+            self.create_page(page_name)
+
+        self.activate_binding_keys()
 
-            self.container.rowconfigure(0, weight=1)
-            self.container.columnconfigure(0, weight=1)
+    def create_page(self, page_name):
+        """
+        Creates (but does not start) the page. Any existing frame for page_name is replaced.
+        """
+        Page = ALL_PAGES[page_name]
+        try:
+            Page = Page.App
+        except AttributeError:
+            pass
+        frame = Page(self.container, self)
+        frame.grid(row=0, column=0, sticky="nsew")
+        # A new sibling is stacked on top. Keep the shown page visible, show_frame raises this one when needed.
+        frame.lower()
 
-            self.frames[page_name] = frame
+        self.container.rowconfigure(0, weight=1)
+        self.container.columnconfigure(0, weight=1)
 
-        self.activate_binding_keys()
+        self.frames[page_name] = frame
+        self.pages_started[page_name] = False
+        return frame
 
     def _quick_run_F1(self, event):
-        print('F1')
         name = 'SHARKtools_tavastland'
         sub_page = 'PageTavastland'
+        logger.debug('F1: show %s %s', name, sub_page)
         self.show_subframe(name, sub_page)
 
     def _quick_run_F2(self, event):
@@ -474,6 +630,24 @@ class MainApp(tk.Tk):
                                                 variable=self.selected_logging_level,
                                                 command=self._on_change_logging_level)
         self.file_menu.add_cascade(label='Logging level', menu=self.log_level_menu)
+        self.profiling_menu = tk.Menu(self.menubar, tearoff=0)
+        self.profiling_menu.add_command(label='Start profiling', command=self._start_profiling)
+        self.profiling_menu.add_command(label='Stop profiling and save', command=self._stop_profiling,
+                                        state='disabled')
+        self.profiling_menu.add_separator()
+        self.profiling_menu.add_command(label='Export timing trace', command=self._export_trace)
+        self.file_menu.add_cascade(label='Profiling', menu=self.profiling_menu)
+        self.memory_menu = tk.Menu(self.menubar, tearoff=0)
+        self.memory_menu.add_command(label='Take memory snapshot',
+                                     command=lambda: self.take_memory_snapshot('manual', force=True))
+        self.memory_menu.add_command(label='Compare two latest snapshots',
+                                     command=lambda: self._show_memory_diff(-2, -1))
+        self.memory_menu.add_command(label='Compare first and latest snapshot',
+                                     command=lambda: self._show_memory_diff(0, -1))
+        self.memory_menu.add_command(label='Stop memory tracing', command=self._stop_memory_tracing)
+        self.file_menu.add_cascade(label='Memory', menu=self.memory_menu)
+        self.file_menu.add_command(label='Jobs',
+                                   command=lambda: self.show_frame('PageJobs'))
 
         self.file_menu.add_separator()
         self.file_menu.add_command(label='Quit', command=self.quit_toolbox)
@@ -508,6 +682,8 @@ class MainApp(tk.Tk):
         self.info_menu = tk.Menu(self.menubar, tearoff=0)
         self.info_menu.add_command(label='About',
                                    command=lambda: self.show_frame('PageAbout'))
+        self.info_menu.add_command(label='Performance',
+                                   command=lambda: self.show_frame('PagePerformance'))
         self.menubar.add_cascade(label='Info', menu=self.info_menu)
 
         # Insert menu
@@ -519,6 +695,49 @@ class MainApp(tk.Tk):
         self.user_manager.set_app_settings('logging', 'level', level)
         self.logger.error('error test')
 
+    def _start_profiling(self):
+        self.profiler.start()
+        self.profiling_menu.entryconfig('Start profiling', state='disabled')
+        self.profiling_menu.entryconfig('Stop profiling and save', state='normal')
+        self.update_help_information('Profiling started')
+
+    def _stop_profiling(self):
+        self.profiler.stop()
+        self.profiling_menu.entryconfig('Start profiling', state='normal')
+        self.profiling_menu.entryconfig('Stop profiling and save', state='disabled')
+        collapsed_file_path, pstats_file_path = self.profiler.save(self.log_directory)
+        text = '{}\n\nFiles saved:\n{}\n{}'.format(self.profiler.get_hotspots_text(),
+                                                     collapsed_file_path, pstats_file_path)
+        gui.show_text(self, 'Profiling result', text)
+
+    def _export_trace(self):
+        file_path = tracing.export_chrome_trace(directory=self.log_directory)
+        gui.show_information('Timing trace', 'Trace saved to:\n{}\n\nOpen it in chrome://tracing or '
+                                             'https://ui.perfetto.dev'.format(file_path))
+
+    def take_memory_snapshot(self, label='', force=False):
+        """
+        Takes a tracemalloc snapshot. Unless force is True a snapshot is only taken if tracing is active.
+        Snapshots are taken automatically when pages are started and closed while tracing.
+        """
+        if not force and not self.memory_snapshots.is_tracing:
+            return
+        label = self.memory_snapshots.take(label)
+        self.update_help_information('Memory snapshot taken: {}'.format(label))
+
+    def _show_memory_diff(self, index_from, index_to):
+        try:
+            text = self.memory_snapshots.get_diff_text(index_from, index_to)
+        except ValueError as e:
+            gui.show_information('Memory snapshots', '{}. Take a snapshot first!'.format(e))
+            return
+        gui.show_text(self, 'Memory growth', text)
+
+    def _stop_memory_tracing(self):
+        self.memory_snapshots.stop()
+        self.memory_snapshots.clear()
+        self.update_help_information('Memory tracing stopped')
+
     def _get_user_page_class(self, plugin_name):
         """
         Returns the class of the user page (PageUser) for the given plugin_name.
@@ -545,13 +764,18 @@ class MainApp(tk.Tk):
             return None
         return ALL_PAGES.get(plugin)
 
-    def _update_menubar_users(self):
+    def _update_menubar_users(self, force=False):
+        # The menu only depends on the user index, the current user and on the user page of the active plugin
+        menu_key = (self.user_manager.user_index.version,
+                    self.user_manager.current_user_directory,
+                    self.user_manager.user.name if self.user_manager.user else None,
+                    self._get_user_page_class(self.active_page))
+        if menu_key == self._menubar_users_key and not force:
+            return
+        self._menubar_users_key = menu_key
+
         # delete old entries
-        for k in range(100):
-            try:
-                self.user_menu.delete(0)
-            except:
-                break
+        self.user_menu.delete(0, 'end')
 
         # Add items
         user_page = self._get_user_page_class(self.active_page)
@@ -566,16 +790,21 @@ class MainApp(tk.Tk):
 
         self.user_menu.add_separator()
 
-        # All users
-        for user in self.user_manager.get_user_list():
+        # Most recently used users. All users are found in the switch user dialog
+        nr_recent = self.user_manager.get_app_settings('users', 'nr recent in menu', 10, save=False)
+        for user in self.user_manager.get_recent_users(nr_recent):
             self.user_menu.add_command(label='Change to user: {}'.format(user),
                                        command=lambda x=user: self._change_user(x))
+        self.user_menu.add_command(label='Switch user...', command=self._open_user_switch_dialog)
         self.user_menu.add_separator()
 
         # New user
         self.user_menu.add_command(label='Create new user',
                                    command=self._create_new_user)
 
+    def _open_user_switch_dialog(self):
+        gui.UserSwitchDialog(self, self.user_manager, callback=self._change_user)
+
     def _create_new_user(self):
         def _create_user():
             source_user = widget_source_user.get_value().strip()
@@ -635,6 +864,7 @@ class MainApp(tk.Tk):
 
         # Make updates
         self.make_user_updates()
+        self._update_menubar_users()
 
     def make_user_updates(self):
         self.update_all()
@@ -658,20 +888,63 @@ class MainApp(tk.Tk):
         self.frames[active_page].show_frame(user_page)
 
     def show_default_subframe(self):
-        mainpage = self.user_manager.get_app_settings('start page', 'mainpage', 'PageStart')
-        subpage = self.user_manager.get_app_settings('start page', 'subpage', '')
+        mainpage = self.user_manager.get_app_settings('start page', 'mainpage', 'PageStart', save=False)
+        subpage = self.user_manager.get_app_settings('start page', 'subpage', '', save=False)
         if subpage:
             self.show_subframe(mainpage, subpage)
         else:
             self.show_frame(mainpage)
 
+    def _start_zygote(self):
+        idle_timeout_hours = self.user_manager.get_app_settings('zygote', 'idle timeout hours', 8)
+        # None: limit measured by the zygote after preload. 0: no limit
+        max_memory_mb = self.user_manager.get_app_settings('zygote', 'max memory MB', None)
+        try:
+            if zygote.start_zygote_process(idle_timeout=idle_timeout_hours * 3600, max_memory_mb=max_memory_mb):
+                logger.info('Zygote process started')
+        except OSError:
+            logger.exception('Could not start zygote process')
+
+    def show_requested_page(self, plugin, sub_page=None):
+        """ Shows a page requested from outside the app (command line or a new launch). """
+        if plugin not in self.frames:
+            logger.warning('Requested page %s does not exist', plugin)
+            return
+        if sub_page:
+            self.show_subframe(plugin, sub_page)
+        else:
+            self.show_frame(plugin)
+
+    def set_instance_server(self, instance_server, poll_interval=200):
+        """ Handles requests from new launches received by instance_server (instance.InstanceServer). """
+        self.instance_server = instance_server
+        self._poll_instance_commands(poll_interval)
+
+    def _poll_instance_commands(self, poll_interval):
+        if not self.instance_server:
+            return
+        for message in self.instance_server.get_commands():
+            logger.info('Request from new launch: %s', message)
+            if message.get('command') == 'show':
+                self.bring_to_front()
+                if message.get('plugin'):
+                    self.show_requested_page(message['plugin'], message.get('sub_page'))
+        self.after(poll_interval, self._poll_instance_commands, poll_interval)
+
+    def bring_to_front(self):
+        self.deiconify()
+        self.lift()
+        # lift alone does not raise the window above other applications on all platforms
+        self.attributes('-topmost', True)
+        self.after_idle(self.attributes, '-topmost', False)
+        self.focus_force()
+
     def show_subframe(self, main_page, sub_page):
         if main_page not in self.frames:
             return
         self.show_frame(main_page, update=False)
         self.frames[main_page].show_frame(sub_page)
-        self.user_manager.set_app_settings('start page', 'mainpage', main_page)
-        self.user_manager.set_app_settings('start page', 'subpage', sub_page)
+        self._set_start_page(main_page, sub_page)
 
     def _get_users_directory_for_plugin(self, plugin_name):
         plugin_module = PLUGINS.get(plugin_name)
@@ -684,15 +957,14 @@ class MainApp(tk.Tk):
         user_dir.mkdir(exist_ok=True, parents=True)
         return user_dir
 
+    @tracing.traced('MainApp.show_frame')
     def show_frame(self, page_name=None, page=None, update=True):
         """
         This method brings the given Page to the top of the GUI.
         Before "raise" call frame startup method.
         This is so that the Page only loads ones.
         """
-        print('===')
-        print(f'{page_name=}')
-        print(f'{page=}')
+        logger.debug('show_frame: page_name=%s, page=%s', page_name, page)
         load_page = True
         if page:
             page_name = APP_TO_PAGE[page]
@@ -701,25 +973,33 @@ class MainApp(tk.Tk):
             frame = self.frames[page_name]
         except KeyError:
             return
+        switch_start = time.perf_counter_ns()
 
         user_name = self.user_manager.user.name
         user_dir = self._get_users_directory_for_plugin(page_name)
-        print(f'{page_name=}')
-        print(f'{user_dir=}')
-        if user_dir:
+        logger.debug('show_frame: page_name=%s, user_dir=%s', page_name, user_dir)
+        if not user_dir:
+            user_dir = self.users_directory
+        # Only reload users if the page uses another users directory than the current one
+        current_user_dir = self.user_manager.current_user_directory
+        if current_user_dir is None or Path(user_dir) != Path(current_user_dir):
             self.user_manager.set_users_directory(user_dir)
-        else:
-            self.user_manager.set_users_directory(self.users_directory)
-        self.user_manager.set_user(user_name, create_if_missing=True)
+            self.user_manager.set_user(user_name, create_if_missing=True)
+        elif self.user_manager.user is None or self.user_manager.user.name != user_name:
+            self.user_manager.set_user(user_name, create_if_missing=True)
 
         if not self.pages_started.get(page_name):
-            frame.startup()
+            with tracing.span('page.startup', page=page_name):
+                frame.startup()
             self.pages_started[page_name] = True
+            self.take_memory_snapshot('started {}'.format(page_name))
 
         if update:
-            frame.update_page()
+            with tracing.span('page.update', page=page_name):
+                frame.update_page()
 
         if load_page:
+            self.page_lifecycle.page_shown(page_name)
             frame.tkraise()
             self.previous_page = self.active_page
             self.active_page = page_name
@@ -731,9 +1011,29 @@ class MainApp(tk.Tk):
                 self.page_history.append(page_name)
 
         self._update_menubar_users()
-        self.update()
-        self.user_manager.set_app_settings('start page', 'mainpage', page_name)
-        self.user_manager.set_app_settings('start page', 'subpage', '')
+        self.update_idletasks()
+        self._set_start_page(page_name)
+        tracing.add_span('page.switch', switch_start, page=page_name)
+        metrics.histogram('page.switch_ms').observe((time.perf_counter_ns() - switch_start) / 1e6)
+
+    def _set_start_page(self, main_page, sub_page=''):
+        self.user_manager.set_app_settings('start page', 'mainpage', main_page, save=False)
+        self.user_manager.set_app_settings('start page', 'subpage', sub_page, save=False)
+        self._schedule_app_settings_save()
+
+    def _schedule_app_settings_save(self, delay=1000):
+        """
+        Coalesces writes of app_settings. Changes made with save=False are written once after "delay" ms.
+        """
+        if self._save_app_settings_after_id:
+            return
+        self._save_app_settings_after_id = self.after(delay, self._save_app_settings)
+
+    def _save_app_settings(self):
+        if self._save_app_settings_after_id:
+            self.after_cancel(self._save_app_settings_after_id)
+            self._save_app_settings_after_id = None
+        self.user_manager.save_app_settings()
 
     def old_show_frame(self, page):
         # Not used at the moment
@@ -757,6 +1057,10 @@ class MainApp(tk.Tk):
         self.update_all()
 
     def quit_toolbox(self):
+        if self._save_app_settings_after_id:
+            self.after_cancel(self._save_app_settings_after_id)
+            self._save_app_settings_after_id = None
+        # Also writes any pending changes made with save=False
         self.user_manager.set_app_settings('main window', 'geometry', self.geometry())
 
         for page_name, frame in self.frames.items():
@@ -765,12 +1069,30 @@ class MainApp(tk.Tk):
                     frame.close()
                 except:
                     pass
+        self.memory_snapshots.stop()
+
+        if self.async_loop is not None:
+            self.async_loop.stop()
+
+        self.page_lifecycle.stop()
+        self.watchdog.stop()
+        self.profiler.stop()
+
+        self.job_queue.shutdown()
+        self.metrics_exporter.stop()
+        if self.mirror:
+            # Copies the last changes to the network directory
+            self.mirror.stop()
+        if self.instance_server:
+            self.instance_server.stop()
 
         self._close_log_handlers()
         self.destroy()  # Closes window
         self.quit()  # Terminates program
 
     def _close_log_handlers(self):
+        # Writes all queued records before the handlers are closed
+        self.queue_logging.stop()
         for handler in self.logger.handlers:
             handler.close()
 
@@ -790,51 +1112,57 @@ class MainApp(tk.Tk):
     def get_plugins():
         return PLUGINS
 
-    def open_progress_window(self, text='Programmet jobbar. RÖR INGET!'):
-        self.progress_text.set(text)
-        self.progress_window.title('Arbetar...')
-        x = self.winfo_x()
-        y = self.winfo_y()
-        self.progress_window.geometry("+%d+%d" % (x + 300, y + 200))
-        self.progress_window.update_idletasks()
-        self.progress_label.update_idletasks()
-        self.progress_window.deiconify()
-        self.progress_window.update_idletasks()
-        self.progress_label.update_idletasks()
-        import time
-        time.sleep(0.5)
-        # self.progress_widget.update_idletasks()
-
-
-        # self.progress_window = tk.Toplevel(self)
-        # self.progress_window.geometry("400x200")
-        # #
-        # # x = self.winfo_x()
-        # # y = self.winfo_y()
-        # #
-        # # self.progress_window.geometry("+%d+%d" % (x + 200, y + 200))
-        # # self.progress_window.title('Arbetar...')
-        #
-        # from tkinter import ttk
-        #
-        # # self.pbar = ttk.Progressbar(self.progress_window, orient=tk.HORIZONTAL, length=400, mode='determinate')
-        # # self.pbar.grid(row=0, column=0)
-        # tk.Label(self.progress_window, text='ARBETE PÅGÅR...').grid(row=1, column=0)
-        # # tk.Label(self.progress_window, text=text).grid(row=1, column=0)
-        # # self.pbar.start()
-        # self.progress_window.update_idletasks()
-        # self.update_idletasks()
-        # self.update_idletasks()
-        # self.progress_window.focus_set()
-        # self.progress_window.grab_set()
+    def open_progress_window(self, text='Programmet jobbar. RÖR INGET!', task=None):
+        """
+        Opens the progress window. If task (core.Task) is given the window shows its progress, elapsed and
+        remaining time and is closed automatically when the task is finished.
+        """
+        self.progress_window.show(text=text, task=task)
+
+    def run_task(self, func, text='Programmet jobbar. RÖR INGET!', name='', maximum=None):
+        """
+        Runs func(task) in a thread and shows the progress window until it is finished. If func raises an
+        exception an error message is shown.
+        func should report progress with task.set_progress/task.step and must not touch any widgets.
+        :param func:
+        :param text:
+        :param name:
+        :param maximum:
+        :return: core.Task
+        """
+        task = core.run_task_in_thread(func, name=name, maximum=maximum)
+        self.open_progress_window(text=text, task=task)
+        return task
 
     def close_progress_window(self):
-        self.progress_window.withdraw()
-        # if not self.progress_window:
-        #     return
-        # # self.progress_window.grab_release()
-        # self.progress_window.destroy()
-        # self.progress_window = None
+        self.progress_window.hide()
+
+    def submit_job(self, func, name='', priority=0, owner='', show_progress=False):
+        """
+        Submits a job to the central job queue. func is called as func(task) in a worker thread.
+        At most "max concurrent" (app settings, section "jobs") jobs are running at the same time.
+        :param func:
+        :param name:
+        :param priority: jobs with higher priority are started first
+        :param owner: name of the plugin submitting the job
+        :param show_progress: if True the progress window follows the job
+        :return: core.Job
+        """
+        job = self.job_queue.submit(func, name=name, priority=priority, owner=owner)
+        if show_progress:
+            self.open_progress_window(text=name, task=job.task)
+        return job
+
+    def get_async_loop(self):
+        """
+        Returns the asyncio loop running next to the tkinter main loop. The loop is started on first use.
+        Plugins submit coroutines with self.main_app.get_async_loop().submit(coro, callback=...).
+        :return: gui.AsyncioLoop
+        """
+        if self.async_loop is None:
+            self.async_loop = gui.AsyncioLoop(self)
+        self.async_loop.start()
+        return self.async_loop
 
 
 """
@@ -862,10 +1190,22 @@ class Boxen(object):
             self.open_directory = directory
 
 
-def run_app():
+def run_app(plugin=None, sub_page=None, single_instance=True, instance_server=None):
     """
     Updated 20181002    by
+
+    :param plugin: plugin (page) to show at start
+    :param sub_page: sub page of the plugin to show at start
+    :param single_instance: if True and the app is already running the request is sent to the running app
+                            and None is returned
+    :param instance_server: started instance.InstanceServer if the caller has already claimed the instance
     """
+    if single_instance and instance_server is None:
+        # Listen before the (slow) startup so that launches during startup are not started as new apps
+        instance_server = instance.claim_instance(plugin=plugin, sub_page=sub_page)
+        if instance_server is None:
+            return None
+
     root_directory = Path(__file__).parent
 
     home_directory = pathlib.Path.home() / 'sharktools'
@@ -879,15 +1219,24 @@ def run_app():
     if not os.path.exists(log_directory):
         os.mkdir(log_directory)
 
-    app = MainApp(root_directory=root_directory,
-                  users_directory=users_directory,
-                  # mapping_files_directory=mapping_files_directory,
-                  # default_settings_file_path=default_settings_file_path,
-                  log_directory=log_directory)
-    if not app.all_ok:
-        return app
-    app.focus_force()
-    app.mainloop()
+    try:
+        app = MainApp(root_directory=root_directory,
+                      users_directory=users_directory,
+                      # mapping_files_directory=mapping_files_directory,
+                      # default_settings_file_path=default_settings_file_path,
+                      log_directory=log_directory)
+        if not app.all_ok:
+            return app
+        if instance_server:
+            app.set_instance_server(instance_server)
+        if plugin:
+            app.show_requested_page(plugin, sub_page)
+        app.focus_force()
+        app.mainloop()
+    finally:
+        # Also stopped in quit_toolbox. Stopping twice is fine.
+        if instance_server:
+            instance_server.stop()
     return app
 
 
@@ -11,4 +11,7 @@ INFO = dict(title='Blueprint page',
                             title='Start')],
             user_page_class='PageUser')  # Must match name in ALL_PAGES in main app
 
-USER_SETTINGS = [('basic', 'test3')]
\ No newline at end of file
+USER_SETTINGS = [('basic', 'test3')]
+
+# Workflows that can be run without GUI with sharktools.batch. Called as func(file_path, user=user, **options)
+WORKFLOWS = dict()
\ No newline at end of file
@@ -50,7 +50,8 @@ class App(PluginApp):
 
         self.logger = self.main_app.logger
 
-        self.paths = core.Paths(self.plugin_directory)
+        self.paths = core.Paths(self.plugin_directory,
+                                path_resolver=self.main_app.path_resolver.with_tokens(plugin=self.plugin_directory))
 
         self.settings = self.main_app.settings
 
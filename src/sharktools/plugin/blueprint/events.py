@@ -1,4 +1,7 @@
 
+from sharktools.core import metrics
+from sharktools.core import tracing
+
 subscribers = dict()
 subscribers_before = dict()
 subscribers_after = dict()
@@ -52,11 +55,18 @@ def subscribe(event_type, func, before=False, after=False):
 
 
 def post_event(event_type, data, **kwargs):
-    for sub in [subscribers_before, subscribers, subscribers_after]:
-        if event_type not in sub:
-            continue
-        for func in sub[event_type]:
-            func(data, **kwargs)
+    metrics.counter('events.posted').inc()
+    with tracing.span('event.post', category='events', event_type=event_type), \
+            metrics.histogram('events.dispatch_ms').time():
+        for sub in [subscribers_before, subscribers, subscribers_after]:
+            if event_type not in sub:
+                continue
+            for func in sub[event_type]:
+                subscriber = getattr(func, '__qualname__', str(func))
+                with tracing.span('event.subscriber', category='events', event_type=event_type,
+                                  subscriber=subscriber), \
+                        metrics.histogram('events.subscriber_ms.' + subscriber).time():
+                    func(data, **kwargs)
 
 
 def nr_subscribers(event_type):
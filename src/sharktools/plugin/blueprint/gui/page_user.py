@@ -4,7 +4,9 @@
 
 import tkinter as tk
 
-from sharkpylib import utils
+from sharktools.core.lazy_import import lazy_import
+
+utils = lazy_import('sharkpylib.utils')
 
 
 class PageUser(tk.Frame):
@@ -4,6 +4,8 @@ from yaml.loader import SafeLoader
 import pathlib
 import json
 
+from sharktools.core import tracing
+
 
 def get_default_users():
     users = []
@@ -168,6 +170,7 @@ class SaveComponents:
         for comp in args:
             self._components_to_store.add(comp)
 
+    @tracing.traced('SaveComponents.save')
     def save(self, user='default'):
         data = {}
         for comp in self._components_to_store:
@@ -182,6 +185,7 @@ class SaveComponents:
                 pass
         self._saves.set(user, self._saves_id_key, data)
 
+    @tracing.traced('SaveComponents.load')
     def load(self, component=False, user='default'):
         data = self._saves.get(user, self._saves_id_key)
         components = self._components_to_store
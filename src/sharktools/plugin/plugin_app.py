@@ -46,7 +46,8 @@ class PluginApp(tk.Frame):
         if not os.path.exists(self.log_directory):
             os.makedirs(self.log_directory)
 
-        self.paths = core.Paths(self.plugin_directory)
+        self.paths = core.Paths(self.plugin_directory,
+                                path_resolver=self.main_app.path_resolver.with_tokens(plugin=self.plugin_directory))
 
         # Load settings
         self.settings = self.main_app.settings
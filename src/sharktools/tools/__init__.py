@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
@@ -0,0 +1,247 @@
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""
+Measures the import cost of sharktools and its plugins.
+
+Every module is imported in a fresh interpreter with "python -X importtime". The result is shown as a tree
+with self and cumulative time per imported module. Heavy modules imported at the top level of sharktools
+or a plugin are listed separately (candidates for lazy import). With a budget file the cumulative times are
+checked against the budget and the exit code is 1 if any budget is exceeded.
+
+    python -m sharktools.tools.importcost
+    python -m sharktools.tools.importcost sharktools.gui --min-ms 10
+    python -m sharktools.tools.importcost --budget src/sharktools/tools/import_budget.json
+
+Budget file:
+    {"modules": {"sharktools": 100, "sharktools.main": 5000},
+     "plugins": 3000}
+"modules" gives the budget in ms per measured module. "plugins" is the default budget for discovered
+plugins that are not listed in "modules".
+"""
+import argparse
+import json
+import subprocess
+import sys
+from importlib.metadata import entry_points
+from pathlib import Path
+
+DEFAULT_MODULES = ['sharktools', 'sharktools.core', 'sharktools.gui', 'sharktools.main']
+DEFAULT_BUDGET_FILE_PATH = Path(__file__).parent / 'import_budget.json'
+
+
+class ImportCostError(Exception):
+    pass
+
+
+class ImportNode(object):
+    """ One imported module. Times are in milliseconds. """
+    def __init__(self, name, self_ms=0., cumulative_ms=0., children=None):
+        self.name = name
+        self.self_ms = self_ms
+        self.cumulative_ms = cumulative_ms
+        self.children = children or []
+        self.parent = None
+
+    def __repr__(self):
+        return 'ImportNode({!r}, self={:.1f} ms, cumulative={:.1f} ms)'.format(self.name, self.self_ms,
+                                                                               self.cumulative_ms)
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def find(self, name):
+        for node in self.walk():
+            if node.name == name:
+                return node
+        return None
+
+    def to_dict(self):
+        return {'name': self.name,
+                'self_ms': round(self.self_ms, 3),
+                'cumulative_ms': round(self.cumulative_ms, 3),
+                'children': [child.to_dict() for child in self.children]}
+
+
+def parse_importtime(text):
+    """
+    Parses the output of "python -X importtime". Modules are listed after their imports with two spaces of
+    indentation per level.
+    :return: root ImportNode (name "") with the top level imports as children
+    """
+    root = ImportNode('')
+    # pending[level] holds finished nodes on that level that wait for their parent
+    pending = {}
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            self_ms = int(self_us) / 1000
+            cumulative_ms = int(cumulative_us) / 1000
+        except ValueError:
+            continue
+        level = (len(name) - len(name.lstrip(' '))) // 2
+        node = ImportNode(name.strip(), self_ms, cumulative_ms, pending.pop(level + 1, []))
+        for child in node.children:
+            child.parent = node
+        pending.setdefault(level, []).append(node)
+    for level in sorted(pending):
+        for node in pending[level]:
+            node.parent = root
+            root.children.append(node)
+    root.cumulative_ms = sum(child.cumulative_ms for child in root.children)
+    return root
+
+
+def measure(module_name, python=None, repeat=1):
+    """
+    Imports module_name in a fresh interpreter and returns the ImportNode of the module.
+    With repeat > 1 the run with the lowest cumulative time is returned (least disturbed by other load).
+    """
+    best = None
+    for i in range(repeat):
+        process = subprocess.run([python or sys.executable, '-X', 'importtime', '-c',
+                                  'import {}'.format(module_name)],
+                                 capture_output=True, text=True)
+        if process.returncode:
+            error_lines = [line for line in process.stderr.splitlines() if not line.startswith('import time:')]
+            raise ImportCostError('Could not import {}: {}'.format(module_name, (error_lines or [''])[-1]))
+        node = parse_importtime(process.stderr).find(module_name)
+        if node is None:
+            raise ImportCostError('{} not found in import time output'.format(module_name))
+        if best is None or node.cumulative_ms < best.cumulative_ms:
+            best = node
+    return best
+
+
+def get_plugin_modules():
+    """ :return: dict with plugin name as key and the plugin module name as value """
+    return {plugin.value: plugin.module for plugin in entry_points(group='sharktools.plugins')}
+
+
+def _is_own_module(name, own_packages):
+    return name.split('.')[0] in own_packages
+
+
+def find_heavy_imports(node, own_packages, heavy_ms=100.):
+    """
+    Finds third party modules with cumulative import time >= heavy_ms imported directly by a module in
+    own_packages (i.e. at the top level of sharktools or a plugin).
+    :return: list of (importing module, imported module, cumulative ms), slowest first
+    """
+    result = []
+    for item in node.walk():
+        if not item.parent or not _is_own_module(item.parent.name, own_packages):
+            continue
+        if _is_own_module(item.name, own_packages):
+            continue
+        if item.cumulative_ms >= heavy_ms:
+            result.append((item.parent.name, item.name, item.cumulative_ms))
+    return sorted(result, key=lambda item: -item[2])
+
+
+def format_tree(node, min_ms=5., max_depth=None):
+    """ Returns the tree as lines with self and cumulative time. Imports faster than min_ms are skipped. """
+    lines = ['{:>10} {:>10}   {}'.format('self [ms]', 'cum [ms]', 'module')]
+
+    def _add(item, depth):
+        lines.append('{:>10.1f} {:>10.1f}   {}{}'.format(item.self_ms, item.cumulative_ms, '  ' * depth, item.name))
+        if max_depth is not None and depth >= max_depth:
+            return
+        for child in sorted(item.children, key=lambda child: -child.cumulative_ms):
+            if child.cumulative_ms >= min_ms:
+                _add(child, depth + 1)
+
+    _add(node, 0)
+    return lines
+
+
+def load_budget(file_path):
+    with open(file_path) as fid:
+        return json.load(fid)
+
+
+def get_budget_ms(budget, module_name, is_plugin=False):
+    budget_ms = budget.get('modules', {}).get(module_name)
+    if budget_ms is None and is_plugin:
+        budget_ms = budget.get('plugins')
+    return budget_ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sharktools.tools.importcost',
+                                     description='Measures import time of sharktools and its plugins.')
+    parser.add_argument('modules', nargs='*',
+                        help='Modules to measure. Default is the main sharktools modules and all plugins')
+    parser.add_argument('--no-plugins', action='store_true', help='Do not measure discovered plugins')
+    parser.add_argument('--min-ms', type=float, default=5., help='Hide imports faster than this in the tree')
+    parser.add_argument('--depth', type=int, default=None, help='Max depth of the tree')
+    parser.add_argument('--heavy-ms', type=float, default=100.,
+                        help='Third party imports slower than this at top level are flagged')
+    parser.add_argument('--repeat', type=int, default=3, help='Use the fastest of this many runs')
+    parser.add_argument('--budget', nargs='?', const=str(DEFAULT_BUDGET_FILE_PATH), default=None,
+                        help='Check against a budget file. Default file: {}'.format(DEFAULT_BUDGET_FILE_PATH))
+    parser.add_argument('--json', dest='json_file_path', default=None, help='Also write the result to a json file')
+    args = parser.parse_args(argv)
+
+    plugin_modules = {} if args.no_plugins else get_plugin_modules()
+    modules = args.modules or DEFAULT_MODULES + sorted(plugin_modules.values())
+    own_packages = {'sharktools'} | {name.split('.')[0] for name in plugin_modules.values()}
+    budget = load_budget(args.budget) if args.budget else None
+
+    result = {}
+    failed = False
+    for module_name in modules:
+        print('=' * 80)
+        print(module_name)
+        print('=' * 80)
+        try:
+            node = measure(module_name, repeat=args.repeat)
+        except ImportCostError as e:
+            print(e)
+            result[module_name] = {'error': str(e)}
+            failed = True
+            continue
+        print('\n'.join(format_tree(node, min_ms=args.min_ms, max_depth=args.depth)))
+        heavy = find_heavy_imports(node, own_packages, heavy_ms=args.heavy_ms)
+        if heavy:
+            print()
+            print('Heavy top level imports:')
+            for importer, imported, cumulative_ms in heavy:
+                print('    {:>8.1f} ms   {} imported by {}'.format(cumulative_ms, imported, importer))
+        item = {'cumulative_ms': node.cumulative_ms,
+                'heavy_imports': heavy,
+                'tree': node.to_dict()}
+        if budget is not None:
+            budget_ms = get_budget_ms(budget, module_name, is_plugin=module_name in plugin_modules.values())
+            item['budget_ms'] = budget_ms
+            if budget_ms is not None:
+                print()
+                if node.cumulative_ms > budget_ms:
+                    print('OVER BUDGET: {:.1f} ms > {} ms'.format(node.cumulative_ms, budget_ms))
+                    failed = True
+                else:
+                    print('Within budget: {:.1f} ms <= {} ms'.format(node.cumulative_ms, budget_ms))
+        result[module_name] = item
+        print()
+
+    if args.json_file_path:
+        with open(args.json_file_path, 'w') as fid:
+            json.dump(result, fid, indent=1)
+
+    print('Summary:')
+    for module_name, item in result.items():
+        if 'error' in item:
+            print('    {:<40} {}'.format(module_name, 'FAILED'))
+            continue
+        budget_text = ''
+        if item.get('budget_ms') is not None:
+            budget_text = '(budget {} ms)'.format(item['budget_ms'])
+        print('    {:<40} {:>10.1f} ms {}'.format(module_name, item['cumulative_ms'], budget_text))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
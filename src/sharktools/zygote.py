@@ -0,0 +1,296 @@
+# Copyright (c) 2018 SMHI, Swedish Meteorological and Hydrological Institute
+# License: MIT License (see LICENSE.txt or http://opensource.org/licenses/mit).
+"""
+Pre-warmed ("zygote") process for fast launches.
+
+The zygote is a resident process that has imported SHARKtools, tkinter and all plugins but has no window.
+A launch asks it (through a localhost socket listed in zygote.json in instance.get_local_directory()) to start
+the app:
+
+- On Linux the zygote forks. The child starts the app with all modules already imported while the zygote
+  keeps waiting for the next launch.
+- Elsewhere the zygote is a single-use pre-warm: at the first launch it removes zygote.json, runs the app
+  itself and exits when the app is closed. Later launches start normally until a new zygote is started (e.g.
+  by the app, see "start after launch" below). On macOS fork is available but not safe after
+  tkinter/matplotlib (Cocoa) have been imported.
+
+The launch that asks the zygote keeps the single instance (see sharktools.instance) until the started app has
+taken it over, so that launches in between are not started as new apps.
+
+The zygote exits when it has been idle (no app running) for idle_timeout seconds, and when its resident
+memory is larger than max_memory_mb (by default twice the memory measured after preload).
+
+Start it at login or from the app (app settings section "zygote"):
+    python -m sharktools.zygote [--idle-timeout HOURS] [--max-memory-mb MB]
+    python -m sharktools.zygote --status
+    python -m sharktools.zygote --stop
+"""
+import argparse
+import gc
+import logging
+import os
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from sharktools import instance
+
+logger = logging.getLogger(__name__)
+
+ZYGOTE_FILE_PATH = Path(instance.get_local_directory(), 'zygote.json')
+CAN_FORK = sys.platform.startswith('linux') and hasattr(os, 'fork')
+MEMORY_LIMIT_FACTOR = 2
+
+
+def request_launch(plugin=None, sub_page=None, file_path=ZYGOTE_FILE_PATH):
+    """
+    Asks a running zygote to start the app.
+    :return: True if the zygote accepted the request, False if no zygote is running
+    """
+    return instance.send_command('launch', file_path=file_path, timeout=2., plugin=plugin, sub_page=sub_page)
+
+
+def get_status(file_path=ZYGOTE_FILE_PATH):
+    """ :return: dict with pid, memory, idle time etc. of the running zygote, or None """
+    return instance.request('status', file_path=file_path)
+
+
+def stop_zygote(file_path=ZYGOTE_FILE_PATH):
+    return instance.send_command('stop', file_path=file_path)
+
+
+def start_zygote_process(idle_timeout=None, max_memory_mb=None, file_path=ZYGOTE_FILE_PATH):
+    """
+    Starts a detached zygote process unless one is already running.
+    :return: True if a new process was started
+    """
+    if get_status(file_path=file_path):
+        return False
+    args = [sys.executable, '-m', 'sharktools.zygote', '--file', str(file_path)]
+    if idle_timeout is not None:
+        args.extend(['--idle-timeout', str(idle_timeout / 3600)])
+    if max_memory_mb is not None:
+        args.extend(['--max-memory-mb', str(max_memory_mb)])
+    kwargs = {}
+    if sys.platform == 'win32':
+        kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+    subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     close_fds=True, **kwargs)
+    return True
+
+
+class Zygote(object):
+    """
+    :param idle_timeout: seconds without running app before the zygote exits
+    :param max_memory_mb: the zygote exits if its resident memory is larger than this. 0 means no limit.
+                          None means MEMORY_LIMIT_FACTOR times the memory after preload
+    """
+    def __init__(self, idle_timeout=8 * 3600, max_memory_mb=None, file_path=ZYGOTE_FILE_PATH,
+                 check_interval=1.):
+        self.idle_timeout = idle_timeout
+        self.max_memory_mb = max_memory_mb
+        self.file_path = Path(file_path)
+        self.check_interval = check_interval
+        self.token = secrets.token_hex(16)
+        self.children = set()
+        self.nr_launches = 0
+        self.preload_time = None
+        self.idle_since = time.monotonic()
+        self._sock = None
+        self._stop = False
+        self._launch_in_process = None
+
+    def preload(self):
+        """ Imports the app and all plugins. No Tk window is created before fork. """
+        t0 = time.perf_counter()
+        from sharktools import main
+        self.preload_time = time.perf_counter() - t0
+        # Objects created during import are moved out of the garbage collector's generations so that the
+        # collector in the children does not touch (and copy) the memory pages shared with the zygote.
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+        if self.max_memory_mb is None:
+            memory = self.get_memory()
+            self.max_memory_mb = round(memory / 1e6 * MEMORY_LIMIT_FACTOR) if memory else 0
+        logger.info('Preloaded {} plugins in {:.1f} s, memory {}'.format(len(main.PLUGINS), self.preload_time,
+                                                                          self._format_memory()))
+
+    def get_memory(self):
+        from sharktools.core.memory import get_process_memory
+        return get_process_memory()['rss']
+
+    def _format_memory(self):
+        memory = self.get_memory()
+        if memory is None:
+            return 'unknown'
+        return '{:.1f} MB'.format(memory / 1e6)
+
+    def get_status(self):
+        self._reap_children()
+        return {'pid': os.getpid(),
+                'memory': self.get_memory(),
+                'children': sorted(self.children),
+                'nr_launches': self.nr_launches,
+                'preload_time': self.preload_time,
+                'idle_time': self._get_idle_time(),
+                'idle_timeout': self.idle_timeout,
+                'max_memory_mb': self.max_memory_mb}
+
+    def _get_idle_time(self):
+        if self.children:
+            return 0.
+        return time.monotonic() - self.idle_since
+
+    def serve(self):
+        """ Waits for launch requests until stopped, idle too long or using too much memory. """
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen(5)
+        self._sock.settimeout(self.check_interval)
+        instance.write_instance_file(self.file_path, self._sock.getsockname()[1], self.token)
+        logger.info('Zygote {} waiting for launches'.format(os.getpid()))
+        try:
+            while not self._stop:
+                try:
+                    connection, address = self._sock.accept()
+                except socket.timeout:
+                    self._check()
+                    continue
+                with connection:
+                    self._handle(connection)
+                if self._launch_in_process is not None:
+                    break
+                self._check()
+        finally:
+            self._sock.close()
+            instance.remove_instance_file(self.file_path, self.token)
+        if self._launch_in_process is not None:
+            # No fork: the zygote becomes the app
+            self._run_app(*self._launch_in_process)
+        logger.info('Zygote {} stopped'.format(os.getpid()))
+
+    def _handle(self, connection):
+        connection.settimeout(2)
+        message = instance.read_message(connection, self.token)
+        if message is None:
+            instance.send_reply(connection, 'denied')
+            return
+        command = message.get('command')
+        if command == 'launch':
+            self.launch(message.get('plugin'), message.get('sub_page'))
+            instance.send_reply(connection)
+        elif command == 'status':
+            instance.send_reply(connection, **self.get_status())
+        elif command == 'stop':
+            self._stop = True
+            instance.send_reply(connection)
+        else:
+            instance.send_reply(connection, 'unknown command')
+
+    def launch(self, plugin=None, sub_page=None):
+        self.nr_launches += 1
+        logger.info('Launch {} (plugin={}, sub_page={}), zygote memory {}'.format(
+            self.nr_launches, plugin, sub_page, self._format_memory()))
+        if not CAN_FORK:
+            self._launch_in_process = (plugin, sub_page)
+            return
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            return
+        # Child
+        exit_code = 0
+        try:
+            self._sock.close()
+            # The app sets up its own logging. Do not also write it to zygote.log
+            root_logger = logging.getLogger()
+            for handler in list(root_logger.handlers):
+                root_logger.removeHandler(handler)
+            os.setsid()
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            self._run_app(plugin, sub_page)
+        except BaseException:
+            logger.exception('App started from zygote failed')
+            exit_code = 1
+        finally:
+            logging.shutdown()
+            os._exit(exit_code)
+
+    @staticmethod
+    def _run_app(plugin, sub_page):
+        from sharktools import main
+        # The launch that sent the request holds the instance until it is taken over here
+        instance_server = instance.take_over_instance()
+        main.run_app(plugin=plugin, sub_page=sub_page, instance_server=instance_server)
+
+    def _reap_children(self):
+        for pid in list(self.children):
+            try:
+                finished_pid, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                finished_pid = pid
+            if finished_pid:
+                self.children.discard(pid)
+                if not self.children:
+                    self.idle_since = time.monotonic()
+
+    def _check(self):
+        self._reap_children()
+        if self.idle_timeout and self._get_idle_time() > self.idle_timeout:
+            logger.info('Zygote idle for {:.0f} s. Exiting'.format(self._get_idle_time()))
+            self._stop = True
+            return
+        memory = self.get_memory()
+        if self.max_memory_mb and memory and memory / 1e6 > self.max_memory_mb:
+            logger.warning('Zygote uses {:.1f} MB which is more than the limit {} MB. Exiting'.format(
+                memory / 1e6, self.max_memory_mb))
+            self._stop = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sharktools.zygote',
+                                     description='Resident process with SHARKtools preloaded for fast launches.')
+    parser.add_argument('--idle-timeout', type=float, default=8,
+                        help='Hours without running app before the zygote exits. 0 means never')
+    parser.add_argument('--max-memory-mb', type=float, default=None,
+                        help='The zygote exits if it uses more memory than this. 0 means no limit. '
+                             'Default is {} times the memory after preload'.format(MEMORY_LIMIT_FACTOR))
+    parser.add_argument('--file', default=str(ZYGOTE_FILE_PATH), help=argparse.SUPPRESS)
+    parser.add_argument('--status', action='store_true', help='Print the status of the running zygote')
+    parser.add_argument('--stop', action='store_true', help='Stop the running zygote')
+    args = parser.parse_args(argv)
+
+    if args.status:
+        status = get_status(file_path=args.file)
+        if not status:
+            print('No zygote running')
+            return 1
+        for key, value in status.items():
+            print('{}: {}'.format(key, value))
+        return 0
+    if args.stop:
+        return 0 if stop_zygote(file_path=args.file) else 1
+    if get_status(file_path=args.file):
+        print('A zygote is already running')
+        return 1
+
+    log_directory = Path.home() / 'sharktools' / 'log'
+    log_directory.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(filename=str(Path(log_directory, 'zygote.log')), level=logging.INFO,
+                        format='%(asctime)s [%(levelname)8s] %(process)d %(message)s')
+    zygote = Zygote(idle_timeout=args.idle_timeout * 3600, max_memory_mb=args.max_memory_mb,
+                    file_path=args.file)
+    zygote.preload()
+    zygote.serve()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
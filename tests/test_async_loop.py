@@ -0,0 +1,107 @@
+import asyncio
+import importlib.util
+import threading
+import time
+import unittest
+
+HAS_GUI = importlib.util.find_spec('shark_tkinter_lib') is not None
+
+if HAS_GUI:
+    from sharktools.gui import async_loop
+
+
+class FakeRoot(object):
+    """ Stands in for the Tk root. Callbacks given to after are run by poll() in the test thread. """
+    def __init__(self):
+        self.callbacks = {}
+        self._next_id = 0
+
+    def after(self, ms, func):
+        self._next_id += 1
+        self.callbacks[self._next_id] = func
+        return self._next_id
+
+    def after_cancel(self, after_id):
+        self.callbacks.pop(after_id, None)
+
+    def poll(self):
+        callbacks = list(self.callbacks.values())
+        self.callbacks = {}
+        for func in callbacks:
+            func()
+
+
+@unittest.skipUnless(HAS_GUI, 'shark_tkinter_lib is not installed')
+class TestAsyncioLoop(unittest.TestCase):
+    def setUp(self):
+        self.root = FakeRoot()
+        self.loop = async_loop.AsyncioLoop(self.root)
+        self.addCleanup(self.loop.stop)
+
+    def _wait(self, future):
+        try:
+            future.result(5)
+        except Exception:
+            pass
+        self.root.poll()
+
+    def test_callback_is_called_in_main_thread(self):
+        calls = []
+
+        async def add(a, b):
+            await asyncio.sleep(0)
+            return a + b
+
+        future = self.loop.submit(add(1, 2), callback=lambda result: calls.append((result, threading.current_thread())))
+        self.assertEqual(future.result(5), 3)
+        # Not called until the Tk main loop polls the queue
+        self.assertEqual(calls, [])
+        self.root.poll()
+        self.assertEqual(calls, [(3, threading.current_thread())])
+
+    def test_error_callback(self):
+        errors = []
+
+        async def fail():
+            raise ValueError('failed')
+
+        future = self.loop.submit(fail(), callback=self.fail, error_callback=errors.append)
+        self._wait(future)
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], ValueError)
+
+    def test_run_in_main(self):
+        main_threads = []
+
+        def in_main():
+            main_threads.append(threading.current_thread())
+            return 'done'
+
+        async def coro():
+            return await self.loop.run_in_main(in_main)
+
+        future = self.loop.submit(coro())
+        for _ in range(500):
+            self.root.poll()
+            if future.done():
+                break
+            time.sleep(0.01)
+        self.assertEqual(future.result(), 'done')
+        self.assertEqual(main_threads, [threading.current_thread()])
+
+    def test_errors_in_callbacks_do_not_stop_polling(self):
+        calls = []
+        self.loop.start()
+        self.loop.call_in_main(lambda: 1 / 0)
+        self.loop.call_in_main(calls.append, 'after error')
+        self.root.poll()
+        self.assertEqual(calls, ['after error'])
+        self.assertEqual(len(self.root.callbacks), 1)
+
+    def test_stop(self):
+        self.loop.start()
+        self.assertTrue(self.loop.is_running)
+        self.loop.stop()
+        self.assertFalse(self.loop.is_running)
+        self.assertEqual(self.root.callbacks, {})
+        self.loop.stop()
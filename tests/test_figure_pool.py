@@ -0,0 +1,92 @@
+import importlib.util
+import types
+import unittest
+from unittest import mock
+
+HAS_GUI = importlib.util.find_spec('shark_tkinter_lib') is not None
+
+if HAS_GUI:
+    from sharktools.gui import figure_pool
+
+
+class FakeWidget(object):
+    def __init__(self, path):
+        self.path = path
+
+    def __str__(self):
+        return self.path
+
+
+def _new_canvas(figure, master=None):
+    canvas = mock.Mock()
+    canvas.get_tk_widget.return_value.winfo_manager.return_value = 'grid'
+    return canvas
+
+
+@unittest.skipUnless(HAS_GUI, 'shark_tkinter_lib is not installed')
+class TestFigurePool(unittest.TestCase):
+    def setUp(self):
+        # matplotlib is replaced so that only the pool logic is tested
+        patches = [
+            mock.patch.object(figure_pool, 'matplotlib_figure',
+                              types.SimpleNamespace(Figure=mock.Mock(side_effect=lambda **kwargs: mock.Mock()))),
+            mock.patch.object(figure_pool, 'backend_tkagg',
+                              types.SimpleNamespace(FigureCanvasTkAgg=mock.Mock(side_effect=_new_canvas))),
+            mock.patch.object(figure_pool, 'backend_agg',
+                              types.SimpleNamespace(FigureCanvasAgg=mock.Mock(side_effect=_new_canvas))),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.pool = figure_pool.FigurePool(max_figures=2)
+        self.master = FakeWidget('.page_a.frame')
+
+    def test_released_figure_is_reused_with_same_master(self):
+        figure, canvas = self.pool.acquire(self.master)
+        self.pool.release(figure)
+        figure.clear.assert_called_once_with()
+        canvas.get_tk_widget.return_value.grid_forget.assert_called_once_with()
+        self.assertEqual(self.pool.nr_in_use, 0)
+
+        reused_figure, reused_canvas = self.pool.acquire(self.master, figsize=(2, 1), dpi=50)
+        self.assertIs(reused_figure, figure)
+        self.assertIs(reused_canvas, canvas)
+        figure.set_size_inches.assert_called_once_with((2, 1), forward=False)
+        canvas.get_tk_widget.return_value.configure.assert_called_once_with(width=100, height=50)
+
+        other_figure, other_canvas = self.pool.acquire(FakeWidget('.page_b'))
+        self.assertIsNot(other_figure, figure)
+        self.assertEqual(self.pool.nr_figures, 2)
+
+    def test_figures_in_use_are_not_shared(self):
+        first, canvas = self.pool.acquire(self.master)
+        second, canvas = self.pool.acquire(self.master)
+        self.assertIsNot(first, second)
+        self.assertEqual(self.pool.nr_in_use, 2)
+
+    def test_least_recently_released_is_evicted(self):
+        figures = [self.pool.acquire(FakeWidget('.page_{}'.format(i)))[0] for i in range(3)]
+        self.assertEqual(self.pool.nr_figures, 3)
+        for figure in figures:
+            self.pool.release(figure)
+        self.assertEqual(self.pool.nr_figures, 2)
+        self.assertEqual([entry.figure for entry in self.pool._entries], figures[1:])
+
+    def test_headless_figure(self):
+        with self.pool.headless_figure() as figure:
+            self.assertEqual(self.pool.nr_in_use, 1)
+        self.assertEqual(self.pool.nr_in_use, 0)
+        with self.pool.headless_figure() as reused_figure:
+            self.assertIs(reused_figure, figure)
+        figure_pool.backend_tkagg.FigureCanvasTkAgg.assert_not_called()
+
+    def test_remove_widget(self):
+        figure, canvas = self.pool.acquire(self.master)
+        self.pool.acquire(FakeWidget('.page_ab'))
+        self.pool.remove_widget(FakeWidget('.page_a'))
+        canvas.get_tk_widget.return_value.destroy.assert_called_once_with()
+        self.assertEqual([str(entry.master) for entry in self.pool._entries], ['.page_ab'])
+
+    def test_release_unknown_figure(self):
+        self.pool.release(mock.Mock())
+        self.assertEqual(self.pool.nr_figures, 0)
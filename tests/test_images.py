@@ -0,0 +1,94 @@
+import importlib.util
+import shutil
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+HAS_GUI = importlib.util.find_spec('shark_tkinter_lib') is not None
+
+if HAS_GUI:
+    from sharktools.gui import images
+
+
+def _write_png(path, width, height, nr_bytes=0):
+    header = b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', width, height)
+    path.write_bytes(header + b'\x00' * nr_bytes)
+
+
+def _write_gif(path, width, height, nr_bytes=0):
+    path.write_bytes(b'GIF89a' + struct.pack('<HH', width, height) + b'\x00' * (14 + nr_bytes))
+
+
+@unittest.skipUnless(HAS_GUI, 'shark_tkinter_lib is not installed')
+class TestImageCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.cache = images.ImageCache([self.directory])
+        patch = mock.patch.object(images, '_get_pil', return_value=None)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_read_pixel_size(self):
+        _write_png(self.directory / 'a.png', 30, 20)
+        _write_gif(self.directory / 'b.gif', 15, 10)
+        (self.directory / 'c.jpg').write_bytes(b'\xff\xd8' + b'\x00' * 30)
+        self.assertEqual(images._read_pixel_size(self.directory / 'a.png'), (30, 20))
+        self.assertEqual(images._read_pixel_size(self.directory / 'b.gif'), (15, 10))
+        self.assertIsNone(images._read_pixel_size(self.directory / 'c.jpg'))
+
+    def test_explicit_suffix_is_used(self):
+        _write_png(self.directory / 'logo.png', 30, 20, nr_bytes=1000)
+        _write_gif(self.directory / 'logo.gif', 30, 20)
+        self.assertEqual(self.cache.find('logo.png'), self.directory / 'logo.png')
+        self.assertEqual(self.cache.find('LOGO.gif'), self.directory / 'logo.gif')
+        self.assertIsNone(self.cache.find('logo.ppm'))
+
+    def test_explicit_suffix_that_needs_pil(self):
+        _write_png(self.directory / 'logo.png', 30, 20)
+        (self.directory / 'logo.jpg').write_bytes(b'\xff\xd8')
+        self.assertIsNone(self.cache.find('logo.jpg'))
+        with mock.patch.object(images, '_get_pil', return_value=object()):
+            self.assertEqual(self.cache.find('logo.jpg'), self.directory / 'logo.jpg')
+
+    def test_without_suffix_largest_then_smallest_file(self):
+        _write_png(self.directory / 'logo.png', 30, 20, nr_bytes=1000)
+        _write_gif(self.directory / 'logo.gif', 30, 20)
+        _write_gif(self.directory / 'icon.gif', 15, 10)
+        _write_png(self.directory / 'icon.png', 30, 20, nr_bytes=1000)
+        self.assertEqual(self.cache.find('logo'), self.directory / 'logo.gif')
+        self.assertEqual(self.cache.find('icon'), self.directory / 'icon.png')
+        self.assertIsNone(self.cache.find('missing'))
+
+    def test_later_directory_is_searched_first(self):
+        plugin_directory = self.directory / 'plugin'
+        plugin_directory.mkdir()
+        _write_png(self.directory / 'logo.png', 30, 20)
+        _write_png(plugin_directory / 'logo.png', 30, 20)
+        self.assertEqual(self.cache.find('logo'), self.directory / 'logo.png')
+        self.cache.add_directory(plugin_directory)
+        self.assertEqual(self.cache.find('logo'), plugin_directory / 'logo.png')
+        self.assertEqual(self.cache.get_names(), ['logo'])
+
+    def test_images_are_decoded_once(self):
+        _write_png(self.directory / 'logo.png', 30, 20)
+        with mock.patch.object(images.ImageCache, '_decode', return_value=mock.Mock()) as decode:
+            first = self.cache.get('logo')
+            self.assertIs(self.cache.get('logo.png'), first)
+            self.assertIs(self.cache.get('logo', scale=1), first)
+        decode.assert_called_once()
+
+    def test_scaled_images_are_cached(self):
+        _write_png(self.directory / 'logo.png', 30, 20)
+        original = mock.Mock(width=mock.Mock(return_value=30), height=mock.Mock(return_value=20))
+        with mock.patch.object(images.ImageCache, '_decode', return_value=original):
+            half = self.cache.get('logo', scale=0.5)
+            self.assertIs(self.cache.get('logo', size=(15, 100)), half)
+        original.subsample.assert_called_once_with(2)
+        original.zoom.assert_not_called()
+
+    def test_missing_image(self):
+        with self.assertRaises(FileNotFoundError):
+            self.cache.get('missing')
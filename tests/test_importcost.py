@@ -0,0 +1,85 @@
+import contextlib
+import io
+import unittest
+from unittest import mock
+
+from sharktools.tools import importcost
+
+IMPORTTIME_OUTPUT = '''import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     numpy.core
+import time:       200 |        300 |   numpy
+import time:        50 |         50 |   sharktools.core
+import time:       500 |        850 | sharktools
+import time:        20 |         20 | os
+'''
+
+
+class TestParseImporttime(unittest.TestCase):
+    def setUp(self):
+        self.root = importcost.parse_importtime(IMPORTTIME_OUTPUT)
+
+    def test_tree(self):
+        self.assertEqual([child.name for child in self.root.children], ['sharktools', 'os'])
+        node = self.root.find('sharktools')
+        self.assertEqual([child.name for child in node.children], ['numpy', 'sharktools.core'])
+        self.assertEqual((node.self_ms, node.cumulative_ms), (0.5, 0.85))
+        self.assertIs(self.root.find('numpy.core').parent, self.root.find('numpy'))
+        self.assertEqual(self.root.cumulative_ms, 0.87)
+
+    def test_heavy_imports(self):
+        node = self.root.find('sharktools')
+        # numpy.core is imported by numpy, not by sharktools
+        self.assertEqual(importcost.find_heavy_imports(node, {'sharktools'}, heavy_ms=0.1),
+                         [('sharktools', 'numpy', 0.3)])
+        self.assertEqual(importcost.find_heavy_imports(node, {'sharktools'}, heavy_ms=1), [])
+
+    def test_format_tree(self):
+        lines = importcost.format_tree(self.root.find('sharktools'), min_ms=0.2)
+        self.assertEqual([line.split()[-1] for line in lines[1:]], ['sharktools', 'numpy'])
+        lines = importcost.format_tree(self.root.find('sharktools'), min_ms=0, max_depth=1)
+        self.assertNotIn('numpy.core', '\n'.join(lines))
+
+    def test_to_dict(self):
+        self.assertEqual(self.root.find('numpy').to_dict()['children'][0]['name'], 'numpy.core')
+
+
+class TestBudget(unittest.TestCase):
+    def test_get_budget_ms(self):
+        budget = {'modules': {'sharktools': 50, 'plugin_a': 100}, 'plugins': 3000}
+        self.assertEqual(importcost.get_budget_ms(budget, 'sharktools'), 50)
+        self.assertEqual(importcost.get_budget_ms(budget, 'plugin_a', is_plugin=True), 100)
+        self.assertEqual(importcost.get_budget_ms(budget, 'plugin_b', is_plugin=True), 3000)
+        self.assertIsNone(importcost.get_budget_ms(budget, 'sharktools.gui'))
+
+    def test_default_budget_file(self):
+        budget = importcost.load_budget(importcost.DEFAULT_BUDGET_FILE_PATH)
+        for module_name in importcost.DEFAULT_MODULES:
+            self.assertIsNotNone(importcost.get_budget_ms(budget, module_name))
+
+    def _run_main(self, cumulative_ms):
+        node = importcost.ImportNode('sharktools', cumulative_ms, cumulative_ms)
+        with mock.patch.object(importcost, 'measure', return_value=node), \
+                contextlib.redirect_stdout(io.StringIO()) as output:
+            exit_code = importcost.main(['sharktools', '--no-plugins', '--budget'])
+        return exit_code, output.getvalue()
+
+    def test_main_within_budget(self):
+        exit_code, output = self._run_main(10)
+        self.assertEqual(exit_code, 0)
+        self.assertIn('Within budget', output)
+
+    def test_main_over_budget(self):
+        exit_code, output = self._run_main(1000)
+        self.assertEqual(exit_code, 1)
+        self.assertIn('OVER BUDGET', output)
+
+
+class TestMeasure(unittest.TestCase):
+    def test_measure_in_fresh_interpreter(self):
+        node = importcost.measure('colorsys')
+        self.assertEqual(node.name, 'colorsys')
+        self.assertGreater(node.cumulative_ms, 0)
+
+    def test_import_error(self):
+        with self.assertRaises(importcost.ImportCostError):
+            importcost.measure('sharktools_no_such_module')
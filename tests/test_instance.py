@@ -0,0 +1,78 @@
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from sharktools import instance
+
+
+class TestClaimInstance(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.file_path = Path(directory, 'instance.json')
+
+    def _claim(self, **kwargs):
+        server = instance.claim_instance(file_path=self.file_path, **kwargs)
+        if server:
+            self.addCleanup(server.stop)
+        return server
+
+    def test_second_launch_is_forwarded(self):
+        server = self._claim()
+        self.assertIsNotNone(server)
+        self.assertIsNone(self._claim(plugin='plugin', sub_page='page'))
+        self.assertEqual(server.get_commands(), [{'command': 'show', 'plugin': 'plugin', 'sub_page': 'page'}])
+
+    def test_stale_instance_file(self):
+        instance.write_instance_file(self.file_path, 1, 'old token')
+        self.assertIsNotNone(self._claim())
+
+    def test_instance_file_removed_at_stop(self):
+        server = self._claim()
+        server.stop()
+        self.assertFalse(self.file_path.exists())
+
+    def test_simultaneous_launches(self):
+        servers = []
+        lock = threading.Lock()
+
+        def claim():
+            server = self._claim()
+            with lock:
+                servers.append(server)
+
+        threads = [threading.Thread(target=claim) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len([server for server in servers if server is not None]), 1)
+
+    def test_lock_error_starts_server_without_lock(self):
+        with mock.patch.object(instance, '_lock_file', side_effect=OSError('Resource deadlock avoided')), \
+                mock.patch.object(instance, '_unlock_file') as unlock_file:
+            server = self._claim()
+        self.assertIsNotNone(server)
+        unlock_file.assert_not_called()
+        self.assertTrue(self.file_path.exists())
+
+    def test_lock_error_still_forwards(self):
+        server = self._claim()
+        with mock.patch.object(instance, '_lock_file', side_effect=OSError('Resource deadlock avoided')):
+            self.assertIsNone(self._claim(plugin='plugin'))
+        self.assertEqual(server.get_commands(), [{'command': 'show', 'plugin': 'plugin', 'sub_page': None}])
+
+
+class TestLocalDirectory(unittest.TestCase):
+    def test_not_in_home_directory(self):
+        with mock.patch.object(instance.sys, 'platform', 'linux'), \
+                mock.patch.dict(instance.os.environ, {'XDG_CACHE_HOME': '/local/cache'}):
+            self.assertEqual(instance.get_local_directory(), Path('/local/cache', 'sharktools'))
+
+    def test_windows(self):
+        with mock.patch.object(instance.sys, 'platform', 'win32'), \
+                mock.patch.dict(instance.os.environ, {'LOCALAPPDATA': '/local/app_data'}):
+            self.assertEqual(instance.get_local_directory(), Path('/local/app_data', 'sharktools'))
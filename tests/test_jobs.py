@@ -0,0 +1,107 @@
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from sharktools.core import jobs
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.history_path = Path(directory, 'jobs.sqlite')
+
+    def _get_queue(self, **kwargs):
+        queue = jobs.JobQueue(history_path=self.history_path, **kwargs)
+        self.addCleanup(queue.shutdown)
+        return queue
+
+    def _block(self, queue):
+        """ Submits a job that runs until the returned event is set. Returns when the job is running. """
+        started = threading.Event()
+        release = threading.Event()
+
+        def func(task):
+            started.set()
+            release.wait(5)
+
+        job = queue.submit(func, name='blocking')
+        self.assertTrue(started.wait(5))
+        return job, release
+
+    def _wait_done(self, job_list):
+        done = threading.Event()
+
+        def listener(job):
+            if all(j.is_done for j in job_list):
+                done.set()
+
+        self._queue.add_listener(listener)
+        listener(None)
+        self.assertTrue(done.wait(5))
+        self._queue.remove_listener(listener)
+
+    def test_priority_then_submission_order(self):
+        self._queue = queue = self._get_queue(max_concurrent=1)
+        blocking_job, release = self._block(queue)
+        order = []
+        submitted = [queue.submit(lambda task, name=name: order.append(name), name=name, priority=priority)
+                     for name, priority in [('low', 0), ('high', 5), ('low2', 0), ('high2', 5)]]
+        self.assertEqual([job.name for job in queue.get_queued()], ['high', 'high2', 'low', 'low2'])
+        release.set()
+        self._wait_done(submitted)
+        self.assertEqual(order, ['high', 'high2', 'low', 'low2'])
+        self.assertTrue(all(job.state == jobs.FINISHED for job in submitted))
+
+    def test_cancel(self):
+        self._queue = queue = self._get_queue(max_concurrent=1)
+        blocking_job, release = self._block(queue)
+        ran = []
+        job = queue.submit(lambda task: ran.append(1), name='cancelled')
+        self.assertTrue(queue.cancel(job))
+        self.assertEqual(job.state, jobs.CANCELLED)
+        self.assertFalse(queue.cancel(job))
+        # A running job can not be cancelled
+        self.assertFalse(queue.cancel(blocking_job))
+        release.set()
+        self._wait_done([blocking_job])
+        self.assertEqual(ran, [])
+        states = {row['name']: row['state'] for row in queue.history.get_latest()}
+        self.assertEqual(states['cancelled'], jobs.CANCELLED)
+
+    def test_failed_job(self):
+        self._queue = queue = self._get_queue()
+
+        def fail(task):
+            raise ValueError('failed')
+
+        job = queue.submit(fail, name='failing')
+        self._wait_done([job])
+        self.assertEqual(job.state, jobs.FAILED)
+        self.assertIsInstance(job.error, ValueError)
+
+    def test_interrupted_on_restart(self):
+        self._queue = queue = jobs.JobQueue(max_concurrent=1, history_path=self.history_path)
+        blocking_job, release = self._block(queue)
+        queue.submit(lambda task: None, name='queued')
+        # Simulates a program that ends without shutdown
+        queue.history.close()
+        queue.history = None
+
+        history = jobs.JobHistory(self.history_path)
+        self.addCleanup(history.close)
+        states = {row['name']: row['state'] for row in history.get_latest()}
+        self.assertEqual(states, {'blocking': jobs.INTERRUPTED, 'queued': jobs.INTERRUPTED})
+        release.set()
+        queue.shutdown()
+
+    def test_submit_after_shutdown_is_not_saved(self):
+        queue = jobs.JobQueue(history_path=self.history_path)
+        queue.shutdown()
+        with self.assertRaises(RuntimeError):
+            queue.submit(lambda task: None, name='rejected')
+        history = jobs.JobHistory(self.history_path)
+        self.addCleanup(history.close)
+        self.assertEqual(history.get_latest(), [])
@@ -0,0 +1,48 @@
+import colorsys
+import json
+import sys
+import unittest
+from unittest import mock
+
+from sharktools.core.lazy_import import LazyModule, is_loaded, lazy_import
+
+
+class TestLazyImport(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.dict(sys.modules)
+        patch.start()
+        self.addCleanup(patch.stop)
+        sys.modules.pop('colorsys')
+
+    def test_imported_on_first_attribute(self):
+        module = lazy_import('colorsys')
+        self.assertIsInstance(module, LazyModule)
+        self.assertFalse(is_loaded(module))
+        self.assertNotIn('colorsys', sys.modules)
+        self.assertEqual(module.rgb_to_hsv(1, 0, 0), colorsys.rgb_to_hsv(1, 0, 0))
+        self.assertTrue(is_loaded(module))
+        self.assertIn('colorsys', sys.modules)
+        # Later lookups are found in the namespace of the proxy
+        self.assertIn('rgb_to_hsv', module.__dict__)
+        self.assertIn('loaded', repr(module))
+
+    def test_missing_attribute_after_load(self):
+        module = lazy_import('colorsys')
+        with self.assertRaises(AttributeError):
+            module.no_such_function
+        self.assertTrue(is_loaded(module))
+        with self.assertRaises(AttributeError):
+            module.no_such_function
+
+    def test_already_imported_module_is_returned(self):
+        self.assertIs(lazy_import('json'), json)
+        self.assertTrue(is_loaded(json))
+
+    def test_missing_module_is_reported_on_use(self):
+        module = lazy_import('sharktools_no_such_module')
+        with self.assertRaises(ModuleNotFoundError):
+            module.anything
+
+    def test_dir_loads_module(self):
+        module = lazy_import('colorsys')
+        self.assertIn('hsv_to_rgb', dir(module))
@@ -0,0 +1,122 @@
+import logging
+import sys
+import unittest
+from unittest import mock
+
+from sharktools.core import logs
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(logs.time, 'monotonic', return_value=100.)
+        self.monotonic = patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_limit_per_second(self):
+        limiter = logs.RateLimiter(2)
+        self.assertEqual(limiter.allow('a'), (True, 0))
+        self.assertEqual(limiter.allow('a'), (True, 0))
+        self.assertEqual(limiter.allow('a'), (False, 1))
+        self.assertEqual(limiter.allow('a'), (False, 2))
+        # Keys are limited separately
+        self.assertEqual(limiter.allow('b'), (True, 0))
+
+    def test_suppressed_count_reported_in_next_window(self):
+        limiter = logs.RateLimiter(1)
+        limiter.allow('a')
+        limiter.allow('a')
+        limiter.allow('a')
+        self.monotonic.return_value = 101.
+        self.assertEqual(limiter.allow('a'), (True, 2))
+        self.assertEqual(limiter.allow('a'), (False, 1))
+
+
+class TestFastLogger(unittest.TestCase):
+    def test_rate_limited_call_site(self):
+        logger = logging.getLogger('sharktools.tests.fast_logger')
+        logger.setLevel(logging.DEBUG)
+        fast_logger = logs.FastLogger(logger, max_per_second=2)
+        with self.assertLogs(logger, logging.DEBUG) as captured:
+            for i in range(5):
+                fast_logger.debug('message %s', i)
+        self.assertEqual(captured.output, ['DEBUG:sharktools.tests.fast_logger:message 0',
+                                           'DEBUG:sharktools.tests.fast_logger:message 1'])
+
+    def test_disabled_level_is_not_formatted(self):
+        logger = logging.getLogger('sharktools.tests.fast_logger_disabled')
+        logger.setLevel(logging.INFO)
+        argument = mock.MagicMock()
+        logs.FastLogger(logger).debug('%s', argument)
+        argument.__str__.assert_not_called()
+
+    def test_record_points_at_caller(self):
+        logger = logging.getLogger('sharktools.tests.fast_logger_caller')
+        logger.setLevel(logging.DEBUG)
+        fast_logger = logs.FastLogger(logger)
+        with self.assertLogs(logger, logging.DEBUG) as captured:
+            line = sys._getframe().f_lineno + 1
+            fast_logger.debug('message')
+            fast_logger.log(logging.INFO, 'message', rate=10)
+            fast_logger.exception('message')
+        for record in captured.records:
+            self.assertEqual(record.funcName, 'test_record_points_at_caller')
+            self.assertEqual(record.pathname, __file__)
+        self.assertEqual([record.lineno for record in captured.records], [line, line + 1, line + 2])
+
+    def test_call_sites_are_limited_separately(self):
+        logger = logging.getLogger('sharktools.tests.fast_logger_sites')
+        logger.setLevel(logging.DEBUG)
+        fast_logger = logs.FastLogger(logger, max_per_second=1)
+        with self.assertLogs(logger, logging.DEBUG) as captured:
+            for i in range(3):
+                fast_logger.debug('first %s', i)
+                fast_logger.debug('second %s', i)
+        self.assertEqual([record.getMessage() for record in captured.records], ['first 0', 'second 0'])
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.nr_closed = 0
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def close(self):
+        self.nr_closed += 1
+        super().close()
+
+
+class TestQueueLogging(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger('sharktools.tests.queue_logging')
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        self.addCleanup(setattr, self.logger, 'propagate', True)
+        self.handler = ListHandler()
+        self.queue_logging = logs.QueueLogging(self.logger, [self.handler])
+        self.addCleanup(self.queue_logging.stop)
+
+    def test_records_are_written_before_stop_returns(self):
+        self.queue_logging.start()
+        for i in range(100):
+            self.logger.info('message %s', i)
+        self.queue_logging.stop()
+        self.assertEqual([record.getMessage() for record in self.handler.records],
+                         ['message {}'.format(i) for i in range(100)])
+        self.assertEqual(self.handler.nr_closed, 1)
+        self.assertEqual(self.logger.handlers, [])
+
+    def test_start_and_stop_twice(self):
+        self.queue_logging.start()
+        self.queue_logging.start()
+        self.assertEqual(self.logger.handlers, [self.queue_logging.queue_handler])
+        self.queue_logging.stop()
+        self.queue_logging.stop()
+        self.assertFalse(self.queue_logging.is_running)
+        self.assertEqual(self.handler.nr_closed, 1)
+
+    def test_stop_without_start(self):
+        self.queue_logging.stop()
+        self.assertEqual(self.handler.nr_closed, 0)
@@ -0,0 +1,78 @@
+import importlib.util
+import types
+import unittest
+from unittest import mock
+
+from sharktools.core import mappings
+
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+HAS_MATPLOTLIB = importlib.util.find_spec('matplotlib') is not None
+HAS_CMOCEAN = importlib.util.find_spec('cmocean') is not None
+
+
+class FakeColormap(object):
+    def __init__(self, name, value=0.):
+        self.name = name
+        self.value = value
+
+    def __call__(self, values):
+        import numpy as np
+        return np.full((len(values), 4), self.value)
+
+
+class TestColormapRegistryResolve(unittest.TestCase):
+    def setUp(self):
+        self.registry = mappings.ColormapRegistry()
+        self.jet = FakeColormap('jet')
+        self.haline = FakeColormap('haline')
+        fake_matplotlib = types.SimpleNamespace(colormaps={'jet': self.jet})
+        fake_cmocean = types.SimpleNamespace(cm=types.SimpleNamespace(haline=self.haline, cmapnames=['haline']))
+        patches = [mock.patch.object(mappings, 'matplotlib', fake_matplotlib),
+                   mock.patch.object(mappings, 'cmocean', fake_cmocean)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_matplotlib_colormap(self):
+        self.assertIs(self.registry.get('jet'), self.jet)
+
+    def test_cmocean_colormap(self):
+        self.assertIs(self.registry.get('cmocean.cm.haline'), self.haline)
+        self.assertEqual(self.registry.get_cmocean_names(), ['cmocean.cm.haline'])
+
+    def test_unknown_names(self):
+        with self.assertRaises(KeyError):
+            self.registry.get('cmocean.cm.unknown')
+        with self.assertRaises(KeyError):
+            self.registry.get('unknown')
+
+    def test_old_matplotlib_fallback(self):
+        fake_cm = types.SimpleNamespace(get_cmap=lambda name: self.jet)
+        with mock.patch.object(mappings, 'matplotlib', types.SimpleNamespace()), \
+                mock.patch.object(mappings.importlib, 'import_module', return_value=fake_cm):
+            self.assertIs(self.registry.get('jet'), self.jet)
+
+    def test_colormaps_default(self):
+        colormaps = mappings.Colormaps()
+        colormaps.registry = self.registry
+        self.assertEqual(colormaps.get('jet'), 'jet')
+        self.assertIs(colormaps.get('cmocean.cm.haline'), self.haline)
+
+    @unittest.skipUnless(HAS_NUMPY, 'numpy is not installed')
+    def test_lut_not_shared_between_colormaps_with_same_name(self):
+        first = FakeColormap('same', value=0.)
+        second = FakeColormap('same', value=1.)
+        self.assertEqual(self.registry.get_lut(first, 8)[0, 0], 0.)
+        self.assertEqual(self.registry.get_lut(second, 8)[0, 0], 1.)
+        self.assertIs(self.registry.get_lut(first, 8), self.registry.get_lut(first, 8))
+
+
+@unittest.skipUnless(HAS_NUMPY and HAS_MATPLOTLIB and HAS_CMOCEAN, 'numpy, matplotlib and cmocean are needed')
+class TestColormapRegistryInstalled(unittest.TestCase):
+    def test_resolve_and_map(self):
+        registry = mappings.ColormapRegistry()
+        self.assertEqual(registry.get('jet').name, 'jet')
+        self.assertEqual(registry.get('cmocean.cm.haline').name, 'haline')
+        colors = registry.map([0, 0.5, 1, float('nan')], 'cmocean.cm.haline')
+        self.assertEqual(colors.shape, (4, 4))
+        self.assertEqual(tuple(colors[3]), (0, 0, 0, 0))
@@ -0,0 +1,51 @@
+import json
+import os
+import tracemalloc
+import unittest
+
+from sharktools.core import memory
+
+
+class TestMemorySnapshots(unittest.TestCase):
+    def setUp(self):
+        self.snapshots = memory.MemorySnapshots(max_snapshots=3)
+        if not tracemalloc.is_tracing():
+            self.addCleanup(self.snapshots.stop)
+
+    def test_diff_needs_two_snapshots(self):
+        self.snapshots.take('first')
+        with self.assertRaises(ValueError):
+            self.snapshots.diff()
+
+    def test_first_snapshot_is_kept_as_baseline(self):
+        for label in ['a', 'b', 'c', 'd']:
+            self.snapshots.take(label)
+        self.assertEqual([label.split()[-1] for label in self.snapshots.get_labels()], ['a', 'c', 'd'])
+
+    def test_growth_by_line_and_package(self):
+        self.snapshots.take('before')
+        data = [json.loads('{"value": %d}' % i) for i in range(2000)]
+        self.snapshots.take('after')
+        result = self.snapshots.diff()
+        self.assertTrue(result['from'].endswith('before'))
+        self.assertGreater(result['total'], 2000 * 100)
+        self.assertIn(os.path.normcase(__file__), [os.path.normcase(item[0]) for item in result['by_line']])
+        # Allocations made by json on behalf of this module are attributed to this module, not to json
+        packages = [package for package, size in result['by_package']]
+        self.assertEqual(packages[0], self.snapshots.get_package(__file__))
+        self.assertNotIn('json', packages[:1])
+        self.assertIn('Memory growth from', self.snapshots.get_diff_text())
+        del data
+
+    def test_get_package(self):
+        self.assertEqual(self.snapshots.get_package(memory.__file__), 'sharktools')
+        self.assertEqual(self.snapshots.get_package(os.path.join(os.sep, 'no_package', 'module.py')), '<module>')
+        self.assertEqual(self.snapshots.get_package('<string>'), '<string>')
+
+
+class TestProcessMemory(unittest.TestCase):
+    def test_keys(self):
+        result = memory.get_process_memory()
+        self.assertEqual(sorted(result), ['peak_rss', 'rss', 'traced', 'traced_peak'])
+        if result['rss'] is not None:
+            self.assertGreater(result['rss'], 0)
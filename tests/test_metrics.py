@@ -0,0 +1,92 @@
+import json
+import shutil
+import socket
+import tempfile
+import unittest
+import urllib.request
+from pathlib import Path
+from unittest import mock
+
+from sharktools.core import metrics
+
+
+def _get_free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry()
+
+    def test_same_metric_is_returned(self):
+        self.registry.counter('writes').inc()
+        self.registry.counter('writes').inc(2)
+        self.assertEqual(self.registry.get('writes').value, 3)
+        self.assertEqual(self.registry.get_names(), ['writes'])
+        with self.assertRaises(TypeError):
+            self.registry.histogram('writes')
+
+    def test_gauge(self):
+        gauge = self.registry.gauge('queued')
+        gauge.set(3)
+        gauge.inc()
+        gauge.dec(2)
+        self.assertEqual(gauge.value, 2)
+        self.assertEqual(self.registry.gauge('size', func=lambda: 10).get_snapshot()['value'], 10)
+
+    def test_histogram(self):
+        histogram = self.registry.histogram('latency_ms', buckets=(10, 100))
+        for value in [1, 5, 10, 50, 500]:
+            histogram.observe(value)
+        snapshot = histogram.get_snapshot()
+        self.assertEqual(snapshot['buckets'], {'10': 3, '100': 1, 'inf': 1})
+        self.assertEqual((snapshot['count'], snapshot['min'], snapshot['max']), (5, 1, 500))
+        self.assertEqual(snapshot['mean'], 566 / 5)
+        self.assertEqual(snapshot['p50'], 10)
+        self.assertEqual(snapshot['p95'], 500)
+
+    def test_histogram_without_values(self):
+        snapshot = self.registry.histogram('empty').get_snapshot()
+        self.assertIsNone(snapshot['mean'])
+        self.assertIsNone(snapshot['p50'])
+
+    def test_timer(self):
+        histogram = self.registry.histogram('time_ms')
+        with mock.patch.object(metrics.time, 'perf_counter', side_effect=[1., 1.25]):
+            with histogram.time():
+                pass
+        self.assertEqual(histogram.recent[0], 250)
+
+
+class TestMetricsExporter(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.file_path = Path(directory, 'metrics.json')
+        self.registry = metrics.MetricsRegistry()
+        self.registry.counter('writes').inc()
+
+    def test_written_at_stop(self):
+        exporter = metrics.MetricsExporter(self.file_path, interval=60, metrics_registry=self.registry,
+                                           version='1.0')
+        exporter.start()
+        self.registry.counter('writes').inc()
+        exporter.stop()
+        with open(self.file_path) as fid:
+            snapshot = json.load(fid)
+        self.assertEqual(snapshot['info']['version'], '1.0')
+        self.assertEqual(snapshot['metrics']['writes'], {'type': 'counter', 'value': 2})
+        self.assertFalse(self.file_path.with_name('metrics.json.tmp').exists())
+
+    def test_served_on_port(self):
+        port = _get_free_port()
+        exporter = metrics.MetricsExporter(self.file_path, port=port, metrics_registry=self.registry)
+        exporter.start()
+        self.addCleanup(exporter.stop)
+        with urllib.request.urlopen('http://127.0.0.1:{}/metrics'.format(port), timeout=5) as response:
+            snapshot = json.loads(response.read().decode('utf-8'))
+        self.assertEqual(snapshot['metrics']['writes']['value'], 1)
@@ -0,0 +1,258 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from sharktools.core import mirror
+
+
+class MirrorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.remote = Path(self.directory, 'remote')
+        self.local = Path(self.directory, 'local')
+        Path(self.remote, 'users').mkdir(parents=True)
+        self.file_path = Path(self.remote, 'users', 'settings.json')
+        self.file_path.write_bytes(b'{"a": 1}')
+        self.mirror = mirror.DirectoryMirror(self.remote, self.local)
+        mirror.register_mirror(self.mirror)
+        self.addCleanup(mirror.unregister_mirror, self.mirror)
+
+    @staticmethod
+    def _set_mtime_later(file_path):
+        later = time.time() + 10
+        os.utime(file_path, (later, later))
+
+
+class TestDirectoryMirror(MirrorTestCase):
+    def test_read_is_copied_locally(self):
+        self.assertEqual(mirror.read_text(self.file_path), '{"a": 1}')
+        self.file_path.write_bytes(b'{"a": 2}')
+        self.assertEqual(mirror.read_text(self.file_path), '{"a": 1}')
+
+    def test_files_outside_the_mirror_are_used_directly(self):
+        file_path = Path(self.directory, 'other.json')
+        mirror.write_text(file_path, '{}')
+        self.assertEqual(file_path.read_text(), '{}')
+        self.assertIsNone(mirror.get_mirror(file_path))
+
+    def test_push(self):
+        mirror.write_text(self.file_path, '{"a": 2}')
+        self.assertEqual(self.file_path.read_bytes(), b'{"a": 1}')
+        self.assertEqual(self.mirror.get_status()['state'], 'pending')
+        self.assertTrue(self.mirror.sync())
+        self.assertEqual(self.file_path.read_bytes(), b'{"a": 2}')
+        self.assertEqual(self.mirror.get_status()['state'], 'synced')
+
+    def test_push_new_file(self):
+        file_path = Path(self.remote, 'users', 'new', 'settings.json')
+        mirror.makedirs(file_path.parent)
+        self.assertFalse(mirror.exists(file_path))
+        mirror.write_text(file_path, '{}')
+        self.assertTrue(mirror.exists(file_path))
+        self.mirror.sync()
+        self.assertEqual(file_path.read_text(), '{}')
+
+    def test_pull(self):
+        mirror.read_text(self.file_path)
+        self.file_path.write_bytes(b'{"a": 3}')
+        self._set_mtime_later(self.file_path)
+        self.mirror.sync(pull=True)
+        self.assertEqual(mirror.read_text(self.file_path), '{"a": 3}')
+
+    def test_pull_does_not_overwrite_pending(self):
+        mirror.read_text(self.file_path)
+        mirror.write_text(self.file_path, '{"a": 2}')
+        self.file_path.write_bytes(b'{"a": 3}')
+        self._set_mtime_later(self.file_path)
+        self.mirror.pull()
+        self.assertEqual(mirror.read_text(self.file_path), '{"a": 2}')
+
+    def test_conflict(self):
+        mirror.read_text(self.file_path)
+        mirror.write_text(self.file_path, '{"a": 2}')
+        self.file_path.write_bytes(b'{"a": 3}')
+        self._set_mtime_later(self.file_path)
+        self.mirror.sync()
+        self.assertEqual(self.file_path.read_bytes(), b'{"a": 2}')
+        status = self.mirror.get_status()
+        self.assertEqual(status['state'], 'conflict')
+        self.assertEqual(len(status['conflicts']), 1)
+        self.assertEqual(Path(status['conflicts'][0]).read_bytes(), b'{"a": 3}')
+
+    def test_no_conflict_if_remote_mtime_changed_but_not_content(self):
+        mirror.read_text(self.file_path)
+        mirror.write_text(self.file_path, '{"a": 2}')
+        self._set_mtime_later(self.file_path)
+        self.mirror.sync()
+        self.assertEqual(self.mirror.get_status()['state'], 'synced')
+
+    def test_offline(self):
+        mirror.read_text(self.file_path)
+        offline_remote = Path(self.directory, 'unmounted')
+        self.remote.rename(offline_remote)
+        mirror.write_text(self.file_path, '{"a": 2}')
+        self.assertFalse(self.mirror.sync(pull=True))
+        self.assertEqual(self.mirror.get_status()['state'], 'offline')
+        # Local copies are kept while offline
+        self.assertEqual(mirror.read_text(self.file_path), '{"a": 2}')
+        offline_remote.rename(self.remote)
+        self.assertTrue(self.mirror.sync(pull=True))
+        self.assertEqual(self.file_path.read_bytes(), b'{"a": 2}')
+        self.assertEqual(self.mirror.get_status()['state'], 'synced')
+
+    def test_first_write_while_offline_is_not_a_conflict_if_equal(self):
+        offline_remote = Path(self.directory, 'unmounted')
+        self.remote.rename(offline_remote)
+        mirror.write_text(self.file_path, '{"a": 1}')
+        offline_remote.rename(self.remote)
+        self.mirror.sync()
+        self.assertEqual(self.mirror.get_status()['state'], 'synced')
+
+    def test_pending_survives_restart(self):
+        mirror.write_text(self.file_path, '{"a": 2}')
+        mirror.unregister_mirror(self.mirror)
+        restarted = mirror.DirectoryMirror(self.remote, self.local)
+        self.assertEqual(restarted.nr_pending, 1)
+        restarted.sync()
+        self.assertEqual(self.file_path.read_bytes(), b'{"a": 2}')
+
+    def test_concurrent_writes_and_push(self):
+        errors = []
+        stop = threading.Event()
+
+        def write(name):
+            try:
+                for i in range(100):
+                    mirror.write_text(Path(self.remote, 'users', name), str(i))
+            except Exception as e:
+                errors.append(e)
+
+        def push():
+            while not stop.is_set():
+                if not self.mirror.sync():
+                    errors.append(self.mirror.last_error)
+
+        threads = [threading.Thread(target=write, args=(name,)) for name in ['a.json', 'b.json']]
+        pusher = threading.Thread(target=push)
+        pusher.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stop.set()
+        pusher.join()
+        self.assertEqual(errors, [])
+        self.mirror.sync()
+        self.assertEqual(Path(self.remote, 'users', 'a.json').read_text(), '99')
+        self.assertEqual(mirror.DirectoryMirror(self.remote, self.local).nr_pending, 0)
+
+    def test_write_while_pull_removes_the_file(self):
+        mirror.read_text(self.file_path)
+        key = self.mirror._get_key(self.file_path)
+        directory_mirror = self.mirror
+        lock = directory_mirror._lock
+
+        class PullFirstLock(object):
+            """ Removes the file from the state (as pull does) just before the lock is taken the first time. """
+            removed = False
+
+            def __enter__(self):
+                if not self.removed:
+                    self.removed = True
+                    with lock:
+                        directory_mirror._state.pop(key, None)
+                return lock.__enter__()
+
+            def __exit__(self, *args):
+                return lock.__exit__(*args)
+
+        directory_mirror._lock = PullFirstLock()
+        mirror.write_text(self.file_path, '{"a": 2}')
+        directory_mirror._lock = lock
+        self.assertEqual(directory_mirror.nr_pending, 1)
+        directory_mirror.sync()
+        self.assertEqual(self.file_path.read_bytes(), b'{"a": 2}')
+        self.assertEqual(directory_mirror.get_status()['state'], 'synced')
+
+
+class TestListDirectories(MirrorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.users_directory = Path(self.remote, 'users')
+        for name in ['anna', 'bo']:
+            Path(self.users_directory, name).mkdir()
+            Path(self.users_directory, name, 'options.json').write_text('{"name": "%s"}' % name)
+
+    def _get_names(self):
+        return [path.name for path in mirror.list_directories(self.users_directory)]
+
+    def test_without_mirror(self):
+        mirror.unregister_mirror(self.mirror)
+        self.assertEqual(self._get_names(), ['anna', 'bo'])
+
+    def test_first_listing(self):
+        self.assertEqual(self._get_names(), ['anna', 'bo'])
+        self.assertEqual(mirror.list_directories(self.users_directory)[0], Path(self.users_directory, 'anna'))
+
+    def test_later_listings_are_local(self):
+        self._get_names()
+        Path(self.users_directory, 'cecilia').mkdir()
+        self.assertEqual(self._get_names(), ['anna', 'bo'])
+        self.mirror.sync()
+        self.assertEqual(self._get_names(), ['anna', 'bo', 'cecilia'])
+
+    def test_listing_with_local_directory_is_not_made_remotely(self):
+        self._get_names()
+        restarted = mirror.DirectoryMirror(self.remote, self.local)
+        mirror.unregister_mirror(self.mirror)
+        mirror.register_mirror(restarted)
+        self.addCleanup(mirror.unregister_mirror, restarted)
+        Path(self.users_directory, 'cecilia').mkdir()
+        with mock.patch.object(restarted, '_update_listing', wraps=restarted._update_listing) as update_listing:
+            self.assertEqual(self._get_names(), ['anna', 'bo'])
+            update_listing.assert_not_called()
+
+    def test_new_directories_are_prefetched(self):
+        self._get_names()
+        Path(self.users_directory, 'cecilia').mkdir()
+        file_path = Path(self.users_directory, 'cecilia', 'options.json')
+        file_path.write_text('{}')
+        self.mirror.sync(pull=True)
+        file_path.write_text('{"changed": true}')
+        # The copy made by the background sync is used
+        self.assertEqual(mirror.read_text(file_path), '{}')
+
+    def test_prefetch_does_not_replace_local_changes(self):
+        self._get_names()
+        file_path = Path(self.users_directory, 'anna', 'options.json')
+        mirror.write_text(file_path, '{"local": true}')
+        self.mirror.pull()
+        self.mirror._update_listings()
+        self.assertEqual(mirror.read_text(file_path), '{"local": true}')
+
+    def test_first_listing_offline(self):
+        offline_remote = Path(self.directory, 'unmounted')
+        self.remote.rename(offline_remote)
+        self.assertEqual(self._get_names(), [])
+
+    def test_local_only_directory_does_not_make_the_mirror_offline(self):
+        local_only = Path(self.remote, 'plugins', 'plugin_name', 'users')
+        mirror.makedirs(local_only)
+        self.assertEqual(mirror.list_directories(local_only), [])
+        self.assertTrue(self.mirror.sync(pull=True))
+
+
+class TestLocalSettings(unittest.TestCase):
+    def test_save_and_get(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        file_path = Path(directory, 'mirror', 'mirror_settings.json')
+        self.assertEqual(mirror.get_local_settings(file_path), {})
+        mirror.save_local_settings({'enabled': True}, file_path)
+        self.assertEqual(mirror.get_local_settings(file_path), {'enabled': True})
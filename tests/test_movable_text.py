@@ -0,0 +1,106 @@
+import importlib.util
+import types
+import unittest
+from unittest import mock
+
+HAS_GUI = importlib.util.find_spec('shark_tkinter_lib') is not None
+
+if HAS_GUI:
+    from sharktools.gui import widgets
+
+
+class FakeTransform(object):
+    """ Data coordinates to pixels: pixel = 10 * data """
+    def __init__(self, factor=10):
+        self.factor = factor
+
+    def transform(self, position):
+        return (position[0] * self.factor, position[1] * self.factor)
+
+    def inverted(self):
+        return FakeTransform(1 / self.factor)
+
+
+class FakeText(object):
+    def __init__(self, position):
+        self.position = position
+        self.animated = False
+        self.removed = False
+
+    def get_position(self):
+        return self.position
+
+    def set_position(self, position):
+        self.position = position
+
+    def get_transform(self):
+        return FakeTransform()
+
+    def set_animated(self, animated):
+        self.animated = animated
+
+    def remove(self):
+        self.removed = True
+
+
+def _mouse_event(x, y, button=1):
+    return types.SimpleNamespace(x=x, y=y, button=button)
+
+
+@unittest.skipUnless(HAS_GUI, 'shark_tkinter_lib is not installed')
+class TestMovableText(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(widgets, 'matplotlib_text', types.SimpleNamespace(Text=FakeText))
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.figure = mock.Mock()
+        self.canvas = self.figure.canvas
+        self.canvas.supports_blit = True
+        self.text = FakeText((1, 2))
+
+    def _drag(self, movable_text):
+        movable_text.on_pick_event(types.SimpleNamespace(artist=self.text, mouseevent=_mouse_event(10, 20)))
+        movable_text.on_draw_event(None)
+        movable_text.on_motion_notify_event(_mouse_event(15, 20))
+        movable_text.on_motion_notify_event(_mouse_event(20, 40))
+
+    def test_blitted_drag(self):
+        movable_text = widgets.MovableText(self.figure)
+        self._drag(movable_text)
+        self.assertTrue(self.text.animated)
+        # One full draw at pick to cache the background. Motion only blits
+        self.canvas.draw.assert_called_once_with()
+        self.assertEqual(self.canvas.blit.call_count, 2)
+        self.canvas.restore_region.assert_called_with(self.canvas.copy_from_bbox.return_value)
+        self.canvas.draw_idle.assert_not_called()
+        self.assertEqual(self.text.position, (2, 4))
+
+        movable_text.on_release_event(_mouse_event(30, 40))
+        self.assertEqual(self.text.position, (3, 4))
+        self.assertFalse(self.text.animated)
+        self.assertIsNone(movable_text.dragged)
+        self.assertIsNone(movable_text.background)
+        self.canvas.draw_idle.assert_called_once_with()
+
+    def test_without_blit(self):
+        self.canvas.supports_blit = False
+        movable_text = widgets.MovableText(self.figure)
+        self._drag(movable_text)
+        self.assertFalse(self.text.animated)
+        self.canvas.draw.assert_not_called()
+        self.canvas.blit.assert_not_called()
+        self.assertEqual(self.canvas.draw_idle.call_count, 2)
+        self.assertEqual(self.text.position, (2, 4))
+
+    def test_right_click_removes_text(self):
+        movable_text = widgets.MovableText(self.figure)
+        movable_text.on_pick_event(types.SimpleNamespace(artist=self.text, mouseevent=_mouse_event(10, 20, button=3)))
+        self.assertTrue(self.text.removed)
+        self.assertIsNone(movable_text.dragged)
+
+    def test_disconnect(self):
+        movable_text = widgets.MovableText(self.figure)
+        self.assertEqual(self.canvas.mpl_connect.call_count, 4)
+        movable_text.disconnect()
+        self.assertEqual(self.canvas.mpl_disconnect.call_count, 4)
+        self.assertEqual(movable_text.events, {})
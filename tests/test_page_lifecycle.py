@@ -0,0 +1,133 @@
+import importlib.util
+import types
+import unittest
+from unittest import mock
+
+HAS_GUI = importlib.util.find_spec('shark_tkinter_lib') is not None
+
+if HAS_GUI:
+    from sharktools.gui import page_lifecycle
+
+
+class FakeFrame(object):
+    def __init__(self, nr_bytes=0):
+        self.data = b'x' * nr_bytes
+        self.destroyed = False
+
+    def destroy(self):
+        self.destroyed = True
+
+
+class FakeMainApp(object):
+    def __init__(self, page_names):
+        self.frames = {name: FakeFrame() for name in page_names}
+        self.pages_started = {name: True for name in page_names}
+        self.active_page = None
+        self.job_queue = None
+        self.callbacks = []
+
+    def after(self, ms, func):
+        self.callbacks.append(func)
+
+    def create_page(self, page_name):
+        self.frames[page_name] = FakeFrame()
+        self.pages_started[page_name] = False
+
+    def take_memory_snapshot(self, label=''):
+        pass
+
+
+@unittest.skipUnless(HAS_GUI, 'shark_tkinter_lib is not installed')
+class TestPageLifecycleManager(unittest.TestCase):
+    def setUp(self):
+        self.main_app = FakeMainApp(['PageStart', 'PageA', 'PageB', 'PageC'])
+        self.manager = page_lifecycle.PageLifecycleManager(self.main_app, max_idle_minutes=30)
+
+    def _show(self, page_name, minute):
+        with mock.patch.object(page_lifecycle.time, 'monotonic', return_value=minute * 60):
+            self.manager.page_shown(page_name)
+
+    def _check(self, minute):
+        with mock.patch.object(page_lifecycle.time, 'monotonic', return_value=minute * 60):
+            self.manager.check()
+
+    def _run_callbacks(self):
+        while self.main_app.callbacks:
+            if self.manager._estimate_thread:
+                self.manager._estimate_thread.join(5)
+            self.main_app.callbacks.pop(0)()
+
+    def _get_closed(self):
+        return sorted(name for name, started in self.main_app.pages_started.items() if not started)
+
+    def test_candidates_least_recently_shown_first(self):
+        self._show('PageB', 1)
+        self._show('PageC', 2)
+        self._show('PageA', 3)
+        self.assertEqual(self.manager._get_candidates(), ['PageB', 'PageC', 'PageA'])
+        self.main_app.active_page = 'PageA'
+        self.assertEqual(self.manager._get_candidates(), ['PageB', 'PageC'])
+
+    def test_idle_pages_are_closed(self):
+        self._show('PageA', 0)
+        self._show('PageB', 20)
+        self._show('PageC', 0)
+        self.main_app.active_page = 'PageC'
+        frame = self.main_app.frames['PageA']
+        self._check(40)
+        self.assertEqual(self._get_closed(), ['PageA'])
+        self.assertTrue(frame.destroyed)
+
+    def test_pages_with_jobs_are_not_closed(self):
+        running = types.SimpleNamespace(owner='PageA')
+        queued = types.SimpleNamespace(owner='PageB')
+        self.main_app.job_queue = mock.Mock(get_running=mock.Mock(return_value=[running]),
+                                            get_queued=mock.Mock(return_value=[queued]))
+        for page_name in ['PageA', 'PageB', 'PageC']:
+            self._show(page_name, 0)
+        self._check(40)
+        self.assertEqual(self._get_closed(), ['PageC'])
+        self.assertFalse(self.manager.evict('PageA'))
+        self.assertFalse(self.main_app.frames['PageA'].destroyed)
+
+    def test_memory_budget_closes_least_recently_shown(self):
+        self.manager = page_lifecycle.PageLifecycleManager(self.main_app, max_idle_minutes=0, memory_budget_mb=5)
+        for minute, page_name in enumerate(['PageB', 'PageA', 'PageC']):
+            self.main_app.frames[page_name] = FakeFrame(nr_bytes=2000000)
+            self._show(page_name, minute)
+        self.main_app.active_page = 'PageC'
+        self._check(10)
+        # Estimated in a thread. Nothing is closed before the estimate is done
+        self.assertEqual(self._get_closed(), [])
+        self._run_callbacks()
+        self.assertEqual(self._get_closed(), ['PageB'])
+        self.assertNotIn('PageB', self.manager.memory_report)
+        self.assertGreater(self.manager.memory_report['PageA'], 2000000)
+
+    def test_one_estimate_at_a_time(self):
+        results = []
+        with mock.patch.object(page_lifecycle.threading, 'Thread') as thread_class:
+            thread_class.return_value.is_alive.return_value = True
+            self.manager.update_memory_report(callback=results.append)
+            self.manager.update_memory_report(callback=results.append)
+            self.assertEqual(thread_class.call_count, 1)
+            self.manager._estimate_result = {'PageA': 10}
+            thread_class.return_value.is_alive.return_value = False
+            self.main_app.callbacks.pop(0)()
+        self.assertEqual(results, [{'PageA': 10}, {'PageA': 10}])
+        self.assertIsNone(self.manager._estimate_thread)
+
+
+@unittest.skipUnless(HAS_GUI, 'shark_tkinter_lib is not installed')
+class TestEstimateMemory(unittest.TestCase):
+    def test_shared_objects_are_excluded(self):
+        shared = b'x' * 1000000
+        frame = FakeFrame(nr_bytes=1000)
+        frame.shared = shared
+        self.assertGreater(page_lifecycle.estimate_memory(frame), 1000000)
+        self.assertLess(page_lifecycle.estimate_memory(frame, exclude=[shared]), 1000000)
+
+    def test_containers_are_followed(self):
+        frame = FakeFrame()
+        frame.items = {'key': [b'x' * 100000, (b'y' * 100000,)]}
+        self.assertGreater(page_lifecycle.estimate_memory(frame), 200000)
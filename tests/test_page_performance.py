@@ -0,0 +1,57 @@
+import importlib.util
+import types
+import unittest
+from unittest import mock
+
+from sharktools.core import metrics
+from sharktools.core import tracing
+
+HAS_GUI = importlib.util.find_spec('shark_tkinter_lib') is not None
+
+if HAS_GUI:
+    from sharktools.gui import page_performance
+
+
+@unittest.skipUnless(HAS_GUI, 'shark_tkinter_lib is not installed')
+class TestReportLines(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry()
+        patch = mock.patch.object(metrics, 'registry', self.registry)
+        patch.start()
+        self.addCleanup(patch.stop)
+        tracing.clear()
+        self.addCleanup(tracing.clear)
+        self.main_app = types.SimpleNamespace(version='2.0', computer_name='computer')
+
+    def test_minimal_main_app(self):
+        lines = page_performance.get_report_lines(self.main_app)
+        self.assertTrue(lines[0].startswith('SHARKtools 2.0    computer'))
+        for section in ['== Process ==', '== Startup ==', '== Page switches ==', '== Settings I/O ==',
+                        '== Event bus ==', '== Jobs ==', '== Page memory (estimate) ==']:
+            self.assertIn(section, lines)
+        self.assertNotIn('== Figures ==', lines)
+        self.assertEqual(lines[-1], 'Not estimated yet')
+
+    def test_spans_and_metrics(self):
+        tracing.add_span('startup.plugin', 0, 2000000, plugin='plugin_a')
+        tracing.add_span('page.switch', 0, 3000000, page='PageA')
+        self.registry.counter('settings.writes').inc(4)
+        for value in [10, 20]:
+            self.registry.histogram('events.subscriber_ms.on_save').observe(value)
+        lines = page_performance.get_report_lines(self.main_app)
+        text = '\n'.join(lines)
+        self.assertIn('startup.plugin (plugin_a)', text)
+        self.assertIn('Writes: 4', text)
+        self.assertIn('    PageA', text)
+        self.assertIn('Hot subscribers (total time):', lines)
+        self.assertIn('on_save', text)
+        self.assertIn('n=2', text)
+
+    def test_jobs_and_page_memory(self):
+        job = types.SimpleNamespace(name='Export', owner='PageA', duration=2., task=types.SimpleNamespace(fraction=.5))
+        self.main_app.job_queue = types.SimpleNamespace(nr_running=1, nr_queued=2, get_running=lambda: [job])
+        self.main_app.page_lifecycle = types.SimpleNamespace(memory_report={'PageA': 2e6, 'PageB': 5e6})
+        lines = page_performance.get_report_lines(self.main_app)
+        self.assertIn('Running: 1    Queued: 2    Finished: 0    Failed: 0', lines)
+        self.assertTrue(any(line.strip().startswith('Export') and '50 %' in line for line in lines))
+        self.assertEqual([line.split()[0] for line in lines[-2:]], ['PageB', 'PageA'])
@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from sharktools.core import path_tokens
+from sharktools.core.user import AppSettings
+
+
+class TestPathTokenResolver(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.root = Path(self.directory, 'package')
+        self.home = Path(self.directory, 'home')
+        self.plugin = Path(self.home, 'plugins', 'plugin_name')
+        self.resolver = path_tokens.PathTokenResolver(root=self.root, home=self.home)
+
+    def test_resolve_token(self):
+        self.assertEqual(self.resolver.resolve('{root}/settings_files'), Path(self.root, 'settings_files'))
+        self.assertEqual(self.resolver.resolve('{home}\\plugins'), Path(self.home, 'plugins'))
+        self.assertEqual(self.resolver.resolve('{root}'), self.root)
+
+    def test_resolve_legacy_root(self):
+        self.assertEqual(self.resolver.resolve('root/settings_files'), Path(self.root, 'settings_files'))
+        self.assertEqual(self.resolver.resolve('root\\settings_files'), Path(self.root, 'settings_files'))
+        self.assertEqual(self.resolver.resolve('root'), self.root)
+
+    def test_paths_that_only_look_like_legacy_root_are_unchanged(self):
+        for path in ['rootfiles/data', 'roots', '/root/data', 'data/root/files']:
+            self.assertEqual(self.resolver.resolve(path), Path(path))
+
+    def test_legacy_root_without_root_token(self):
+        resolver = path_tokens.PathTokenResolver(home=self.home)
+        self.assertEqual(resolver.resolve('root/settings_files'), Path('root/settings_files'))
+
+    def test_resolve_unknown_token_and_empty(self):
+        self.assertEqual(self.resolver.resolve('{unknown}/data'), Path('{unknown}/data'))
+        self.assertIsNone(self.resolver.resolve(None))
+        self.assertIsNone(self.resolver.resolve(''))
+
+    def test_resolve_path_object_is_unchanged(self):
+        path = Path(self.directory, 'data')
+        self.assertIs(self.resolver.resolve(path), path)
+
+    def test_tokenize_innermost(self):
+        resolver = self.resolver.with_tokens(plugin=self.plugin)
+        self.assertEqual(resolver.tokenize(Path(self.plugin, 'mapping_files')), '{plugin}/mapping_files')
+        self.assertEqual(resolver.tokenize(Path(self.home, 'plugins')), '{home}/plugins')
+        self.assertEqual(resolver.tokenize(self.root), '{root}')
+        # The original resolver does not know {plugin}
+        self.assertEqual(self.resolver.tokenize(Path(self.plugin, 'mapping_files')),
+                         '{home}/plugins/plugin_name/mapping_files')
+
+    def test_tokenize_outside_tokens_and_relative(self):
+        outside = str(Path(self.directory, 'other'))
+        self.assertEqual(self.resolver.tokenize(outside), outside)
+        self.assertEqual(self.resolver.tokenize('relative/path'), 'relative/path')
+        self.assertEqual(self.resolver.tokenize('{root}/data'), '{root}/data')
+
+    def test_round_trip(self):
+        path = Path(self.root, 'settings_files', 'file.json')
+        self.assertEqual(self.resolver.resolve(self.resolver.tokenize(path)), path)
+
+    def test_set_token_clears_cache(self):
+        self.assertEqual(self.resolver.resolve('{root}/data'), Path(self.root, 'data'))
+        self.resolver.set_token('root', self.home)
+        self.assertEqual(self.resolver.resolve('{root}/data'), Path(self.home, 'data'))
+        self.resolver.set_token('root', None)
+        self.assertEqual(self.resolver.resolve('root/data'), Path('root/data'))
+
+
+class TestAppSettingsDirectories(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.root = os.path.join(self.directory, 'package')
+        self.settings_directory = os.path.join(self.directory, 'settings')
+
+    def _get_settings(self):
+        return AppSettings(directory=self.settings_directory, app_root_directory=self.root, name='app_settings',
+                           user='test_user')
+
+    def test_directory_is_stored_with_token(self):
+        settings = self._get_settings()
+        settings.set('directory', 'data', os.path.join(self.root, 'data'))
+        with open(os.path.join(self.settings_directory, 'app_settings.json')) as fid:
+            data = json.load(fid)
+        self.assertEqual(data['directory']['data'], '{root}/data')
+        self.assertEqual(self._get_settings().get('directory', 'data'), Path(self.root, 'data'))
+
+    def test_legacy_root_directory_setting(self):
+        os.makedirs(self.settings_directory)
+        with open(os.path.join(self.settings_directory, 'app_settings.json'), 'w') as fid:
+            json.dump({'directory': {'data': 'root/data', 'other': '/absolute/data'}}, fid)
+        settings = self._get_settings()
+        self.assertEqual(settings.get('directory', 'data'), Path(self.root, 'data'))
+        self.assertEqual(settings.get('directory', 'other'), Path('/absolute/data'))
+        self.assertIsNone(settings.get('directory', 'missing'))
@@ -0,0 +1,71 @@
+import pstats
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from sharktools.core import profiler
+
+MAIN = ('main.py', 1, 'main')
+WORK = ('work.py', 10, 'work')
+SLEEP = ('work.py', 20, 'sleep')
+
+
+def busy_function(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfilerStats(unittest.TestCase):
+    def setUp(self):
+        self.profiler = profiler.SamplingProfiler()
+        self.profiler._stacks[('MainThread', (MAIN, WORK))] = 0.3
+        self.profiler._stacks[('MainThread', (MAIN, WORK, SLEEP))] = 0.1
+        self.profiler._stacks[('Worker thread', (MAIN,))] = 0.2
+
+    def test_collapsed_lines(self):
+        self.assertEqual(self.profiler.get_collapsed_lines(),
+                         ['MainThread;main:main:1;work:work:10 300',
+                          'MainThread;main:main:1;work:work:10;work:sleep:20 100',
+                          'Worker_thread;main:main:1 200'])
+
+    def test_stats(self):
+        stats = self.profiler.get_stats()
+        self.assertEqual(stats[WORK][:2], (2, 2))
+        self.assertAlmostEqual(stats[WORK][2], 0.3)
+        self.assertAlmostEqual(stats[WORK][3], 0.4)
+        self.assertAlmostEqual(stats[MAIN][2], 0.2)
+        self.assertAlmostEqual(stats[MAIN][3], 0.6)
+        self.assertEqual(list(stats[SLEEP][4]), [WORK])
+
+    def test_hotspots(self):
+        self.assertEqual([key for own, cumulative, key in self.profiler.get_hotspots(2)], [WORK, MAIN])
+
+    def test_save(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        collapsed_file_path, pstats_file_path = self.profiler.save(directory)
+        self.assertEqual(collapsed_file_path.read_text().splitlines(), self.profiler.get_collapsed_lines())
+        stats = pstats.Stats(str(pstats_file_path))
+        self.assertAlmostEqual(stats.total_tt, 0.6)
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_samples_other_threads(self):
+        stop = threading.Event()
+        thread = threading.Thread(target=busy_function, args=(stop,), name='busy')
+        thread.start()
+        sampling_profiler = profiler.SamplingProfiler(interval=0.005)
+        try:
+            sampling_profiler.start()
+            time.sleep(0.2)
+            sampling_profiler.stop()
+        finally:
+            stop.set()
+            thread.join()
+        self.assertFalse(sampling_profiler.is_running)
+        self.assertGreater(sampling_profiler.nr_samples, 0)
+        self.assertTrue(any(line.startswith('busy;') and 'busy_function' in line
+                            for line in sampling_profiler.get_collapsed_lines()))
+        self.assertNotIn('sampling-profiler', ''.join(sampling_profiler.get_collapsed_lines()))
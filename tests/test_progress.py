@@ -0,0 +1,64 @@
+import importlib.util
+import unittest
+from unittest import mock
+
+from sharktools.core import tasks
+
+HAS_GUI = importlib.util.find_spec('shark_tkinter_lib') is not None
+
+if HAS_GUI:
+    from sharktools.gui import progress
+
+
+@unittest.skipUnless(HAS_GUI, 'shark_tkinter_lib is not installed')
+class TestProgressWindowPoll(unittest.TestCase):
+    def setUp(self):
+        # Without a display: the widgets are mocks
+        self.window = object.__new__(progress.ProgressWindow)
+        self.window.poll_interval = 100
+        self.window._after_id = None
+        self.window.toplevel = mock.Mock()
+        self.window.progressbar = mock.Mock()
+        for name in ['stringvar_text', 'stringvar_message', 'stringvar_time']:
+            setattr(self.window, name, mock.Mock())
+        self.window.stringvar_text.get.return_value = 'Reading files'
+
+    def test_failed_task_shows_error(self):
+        task = tasks.Task(name='read')
+        task.finish(exception=ValueError('bad file'))
+        self.window.task = task
+        with mock.patch.object(progress, 'show_error') as show_error:
+            self.window._poll()
+        self.window.toplevel.withdraw.assert_called_once_with()
+        show_error.assert_called_once()
+        self.assertIn('bad file', show_error.call_args[0][1])
+        self.assertIn('Reading files', show_error.call_args[0][1])
+
+    def test_finished_task_is_hidden_without_error(self):
+        task = tasks.Task(name='read')
+        task.finish(result=1)
+        self.window.task = task
+        with mock.patch.object(progress, 'show_error') as show_error:
+            self.window._poll()
+        self.window.toplevel.withdraw.assert_called_once_with()
+        show_error.assert_not_called()
+
+    def test_running_task_is_polled_again(self):
+        task = tasks.Task(name='read', maximum=4)
+        task.set_progress(1, message='file 1')
+        self.window.task = task
+        self.window.progressbar.cget.return_value = 'determinate'
+        self.window._poll()
+        self.window.progressbar.config.assert_called_with(value=25.)
+        self.window.stringvar_message.set.assert_called_with('file 1')
+        self.window.toplevel.after.assert_called_once()
+
+    def test_toplevel_methods(self):
+        self.window.title('Arbetar...')
+        self.window.geometry('+10+20')
+        self.window.deiconify()
+        self.window.toplevel.title.assert_called_once_with('Arbetar...')
+        self.window.toplevel.geometry.assert_called_once_with('+10+20')
+        self.window.toplevel.deiconify.assert_called_once_with()
+        with self.assertRaises(AttributeError):
+            self.window.no_such_method()
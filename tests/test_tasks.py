@@ -0,0 +1,76 @@
+import sys
+import threading
+import unittest
+from unittest import mock
+
+from sharktools.core import tasks
+
+
+class TestTask(unittest.TestCase):
+    def test_progress(self):
+        task = tasks.Task(name='task', maximum=4)
+        self.assertEqual(task.fraction, 0.)
+        task.step()
+        task.step(2, message='three')
+        self.assertEqual(task.value, 3)
+        self.assertEqual(task.message, 'three')
+        self.assertEqual(task.fraction, 0.75)
+        task.finish(result='result')
+        self.assertTrue(task.is_done)
+        self.assertEqual(task.fraction, 1.)
+        self.assertEqual(task.remaining, 0.)
+
+    def test_indeterminate(self):
+        task = tasks.Task()
+        task.step()
+        self.assertIsNone(task.fraction)
+        self.assertIsNone(task.remaining)
+
+    def test_remaining(self):
+        task = tasks.Task(maximum=10)
+        with mock.patch.object(tasks.time, 'monotonic', return_value=100.):
+            task.start()
+        task.set_progress(2)
+        with mock.patch.object(tasks.time, 'monotonic', return_value=104.):
+            self.assertAlmostEqual(task.remaining, 16.)
+
+    def test_concurrent_steps(self):
+        task = tasks.Task()
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, switch_interval)
+
+        def step():
+            for _ in range(5000):
+                task.step()
+
+        threads = [threading.Thread(target=step) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(task.value, 20000)
+
+
+class TestRunTaskInThread(unittest.TestCase):
+    def test_result(self):
+        task = tasks.run_task_in_thread(lambda task: 'result', name='task')
+        self.assertTrue(task.wait(5))
+        self.assertEqual(task.result, 'result')
+        self.assertIsNone(task.exception)
+
+    def test_exception(self):
+        def fail(task):
+            raise ValueError('failed')
+
+        with self.assertLogs(tasks.logger, level='ERROR'):
+            task = tasks.run_task_in_thread(fail, name='task')
+            self.assertTrue(task.wait(5))
+        self.assertIsInstance(task.exception, ValueError)
+
+
+class TestFormatSeconds(unittest.TestCase):
+    def test_format(self):
+        self.assertEqual(tasks.format_seconds(None), '-')
+        self.assertEqual(tasks.format_seconds(127), '2:07')
+        self.assertEqual(tasks.format_seconds(3903), '1:05:03')
@@ -0,0 +1,80 @@
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+
+from sharktools.core import tracing
+
+
+class TracingTestCase(unittest.TestCase):
+    def setUp(self):
+        tracing.clear()
+        self.addCleanup(tracing.clear)
+        self.addCleanup(tracing.enable)
+        self.addCleanup(tracing.set_buffer_size, tracing.DEFAULT_BUFFER_SIZE)
+
+
+class TestSpans(TracingTestCase):
+    def test_span_with_attributes(self):
+        with tracing.span('load', category='files', nr_files=2) as s:
+            s.set_attribute('nr_rows', 10)
+        record, = tracing.get_spans()
+        self.assertEqual((record.name, record.category), ('load', 'files'))
+        self.assertEqual(record.attributes, {'nr_files': 2, 'nr_rows': 10})
+        self.assertGreaterEqual(record.duration, 0)
+        self.assertEqual(record.thread_id, threading.get_ident())
+
+    def test_exception_is_recorded_and_raised(self):
+        with self.assertRaises(KeyError):
+            with tracing.span('fail'):
+                raise KeyError('key')
+        self.assertEqual(tracing.get_spans('fail')[0].attributes, {'exception': 'KeyError'})
+
+    def test_traced(self):
+        @tracing.traced()
+        def process(value):
+            return value * 2
+
+        @tracing.traced('named', category='plugin')
+        def other():
+            pass
+
+        self.assertEqual(process(2), 4)
+        process(3)
+        other()
+        self.assertEqual(len(tracing.get_spans(name=process.__qualname__)), 2)
+        self.assertEqual(len(tracing.get_spans(category='plugin')), 1)
+        self.assertEqual(process.__name__, 'process')
+
+    def test_disabled(self):
+        tracing.enable(False)
+        with tracing.span('disabled'):
+            pass
+        tracing.instant('disabled')
+        tracing.add_span('disabled', 0)
+        self.assertEqual(tracing.get_spans(), [])
+
+    def test_oldest_spans_are_dropped(self):
+        tracing.set_buffer_size(3)
+        for i in range(5):
+            tracing.instant(str(i))
+        self.assertEqual([record.name for record in tracing.get_spans()], ['2', '3', '4'])
+
+
+class TestChromeTrace(TracingTestCase):
+    def test_export(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        tracing.add_span('span', 2000000, 5000000, value=object())
+        tracing.instant('instant')
+        file_path = tracing.export_chrome_trace(directory=directory)
+        with open(file_path) as fid:
+            trace = json.load(fid)
+        events = {event['name']: event for event in trace['traceEvents']}
+        self.assertEqual(events['span']['ph'], 'X')
+        self.assertEqual(events['span']['dur'], 3000)
+        self.assertIsInstance(events['span']['args']['value'], str)
+        self.assertEqual(events['instant']['ph'], 'i')
+        self.assertNotIn('dur', events['instant'])
+        self.assertEqual(events['thread_name']['ph'], 'M')
@@ -0,0 +1,190 @@
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from sharktools.core import user
+
+
+class TestUserIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.file_path = Path(self.directory, 'user_index.json')
+        self.index = user.UserIndex(self.file_path)
+
+    def _touch(self, user_name, timestamp):
+        with mock.patch.object(user.datetime, 'datetime', wraps=user.datetime.datetime) as datetime_mock:
+            datetime_mock.now.return_value = user.datetime.datetime.fromtimestamp(timestamp)
+            self.index.touch(user_name)
+
+    def test_update_directory(self):
+        self.index.update_directory('/users/a', ['anna', 'bo'])
+        self.index.update_directory('/users/b', ['bo'])
+        self.assertEqual(sorted(self.index.get_users('/users/a')), ['anna', 'bo'])
+        self.assertEqual(self.index.get_users('/users/b'), ['bo'])
+        self.assertEqual(self.index.get_directories('bo'), ['/users/a', '/users/b'])
+
+        self.index.update_directory('/users/a', ['bo'])
+        self.assertEqual(self.index.get_users('/users/a'), ['bo'])
+        # Users that are not in any directory are removed
+        self.assertNotIn('anna', self.index.get_users())
+
+    def test_version_only_changes_on_change(self):
+        self.index.update_directory('/users/a', ['anna'])
+        version = self.index.version
+        self.index.update_directory('/users/a', ['anna'])
+        self.assertEqual(self.index.version, version)
+        self.index.add('bo', '/users/a')
+        self.assertEqual(self.index.version, version + 1)
+
+    def test_touch_ordering(self):
+        self.index.update_directory('/users/a', ['anna', 'bo', 'cecilia'])
+        self._touch('bo', 1000)
+        self._touch('anna', 2000)
+        self.assertEqual(self.index.get_users(), ['anna', 'bo', 'cecilia'])
+        self._touch('cecilia', 3000)
+        self.assertEqual(self.index.get_recent_users(2), ['cecilia', 'anna'])
+        self.assertEqual(self.index.get_last_used('cecilia').timestamp(), 3000)
+
+    def test_touch_latest_user_keeps_version(self):
+        self.index.update_directory('/users/a', ['anna', 'bo'])
+        self._touch('anna', 1000)
+        version = self.index.version
+        self._touch('anna', 2000)
+        self.assertEqual(self.index.version, version)
+        self._touch('bo', 3000)
+        self.assertEqual(self.index.version, version + 1)
+
+    def test_search(self):
+        self.index.update_directory('/users/a', ['Anna', 'Bo', 'Johanna'])
+        self.index.update_directory('/users/b', ['Hanna'])
+        self._touch('Johanna', 1000)
+        self.assertEqual(self.index.search('ANNA'), ['Johanna', 'Anna', 'Hanna'])
+        self.assertEqual(self.index.search(' anna ', users_directory='/users/a'), ['Johanna', 'Anna'])
+        self.assertEqual(self.index.search('x'), [])
+
+    def test_saved_and_loaded(self):
+        self.index.update_directory('/users/a', ['anna', 'bo'])
+        self._touch('bo', 1000)
+        loaded = user.UserIndex(self.file_path)
+        self.assertEqual(loaded.get_users('/users/a'), ['bo', 'anna'])
+        self.assertEqual(loaded.get_last_used('bo').timestamp(), 1000)
+
+    def test_touch_saves_only_when_order_changes(self):
+        self.index.update_directory('/users/a', ['anna', 'bo'])
+        with mock.patch.object(self.index, 'save', wraps=self.index.save) as save:
+            self._touch('bo', 1000)
+            self._touch('bo', 2000)
+            self._touch('bo', 3000)
+            self.assertEqual(save.call_count, 1)
+            self._touch('anna', 4000)
+            self.assertEqual(save.call_count, 2)
+
+    def test_delayed_save(self):
+        with mock.patch.object(user.os, 'replace', wraps=user.os.replace) as replace:
+            with self.index.delayed_save():
+                self.index.update_directory('/users/a', ['anna', 'bo'])
+                self._touch('anna', 1000)
+                self._touch('bo', 2000)
+                with self.index.delayed_save():
+                    self._touch('anna', 3000)
+                self.assertEqual(replace.call_count, 0)
+                self.assertFalse(self.file_path.exists())
+            self.assertEqual(replace.call_count, 1)
+        self.assertEqual(user.UserIndex(self.file_path).get_users(), ['anna', 'bo'])
+
+    def test_concurrent_saves(self):
+        self.index.update_directory('/users/a', ['anna'])
+        errors = []
+
+        def save():
+            index = user.UserIndex(self.file_path)
+            try:
+                for _ in range(50):
+                    index.save()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=save) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        with open(self.file_path) as fid:
+            self.assertIn('anna', json.load(fid))
+        self.assertEqual(list(self.directory.glob('*.tmp')), [])
+
+
+class TestAppSettingsSave(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.user_manager = user.UserManager(users_root_directory=self.directory, app_root_directory=self.directory)
+
+    def test_existing_value_is_not_saved(self):
+        with mock.patch.object(self.user_manager.app_settings, 'save') as save:
+            self.assertEqual(self.user_manager.get_app_settings('users', 'nr recent in menu', 10), 10)
+            self.assertEqual(save.call_count, 1)
+            for _ in range(5):
+                self.assertEqual(self.user_manager.get_app_settings('users', 'nr recent in menu', 20), 10)
+            self.assertEqual(save.call_count, 1)
+
+    def test_get_without_save(self):
+        with mock.patch.object(self.user_manager.app_settings, 'save') as save:
+            self.assertEqual(self.user_manager.get_app_settings('jobs', 'max concurrent', 2, save=False), 2)
+            self.assertEqual(self.user_manager.get_app_settings('jobs', 'max concurrent', 3), 2)
+            save.assert_not_called()
+        self.user_manager.save_app_settings()
+        loaded = user.UserManager(users_root_directory=self.directory, app_root_directory=self.directory)
+        self.assertEqual(loaded.app_settings.get('jobs', 'max concurrent'), 2)
+
+
+class TestUserManagerReadOnly(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.users_directory = Path(self.directory, 'users')
+        self.users_directory.mkdir()
+        Path(self.users_directory, 'anna').mkdir()
+
+    def _get_user_manager(self, read_only):
+        user_manager = user.UserManager(users_root_directory=self.users_directory,
+                                        app_root_directory=self.directory,
+                                        read_only=read_only)
+        for settings_type, name in [('basic', 'options'), ('prioritylist', 'priority')]:
+            user_manager.add_user_settings(users_directory=self.users_directory, settings_type=settings_type,
+                                           settings_name=name)
+        return user_manager
+
+    def _get_files(self):
+        return {path: path.stat().st_mtime_ns for path in self.directory.rglob('*') if path.is_file()}
+
+    def test_read_only_writes_nothing(self):
+        user_manager = self._get_user_manager(read_only=False)
+        user_manager.set_users_directory(self.users_directory)
+        user_manager.set_user('anna')
+        files = self._get_files()
+
+        user_manager = self._get_user_manager(read_only=True)
+        user_manager.set_users_directory(self.users_directory, activate=False)
+        self.assertEqual(user_manager.get_user_list(), ['anna'])
+        self.assertEqual(user_manager.users['anna'].priority.data, {'priority_list': []})
+        user_manager.users['anna'].options.set('key', 'value')
+        self.assertEqual(self._get_files(), files)
+        with self.assertRaises(user.GUIExceptionUserError):
+            user_manager.add_user('bo')
+
+    def test_activate_false_keeps_active_user(self):
+        user_manager = self._get_user_manager(read_only=False)
+        user_manager.set_users_directory(self.users_directory)
+        user_manager.add_user('bo')
+        user_manager.set_user('anna')
+        user_manager = self._get_user_manager(read_only=False)
+        user_manager.set_users_directory(self.users_directory, activate=False)
+        self.assertIsNone(user_manager.user)
+        self.assertEqual(user_manager._get_active_user(), 'anna')
@@ -0,0 +1,73 @@
+import importlib.util
+import time
+import unittest
+
+from sharktools.core import metrics
+
+HAS_GUI = importlib.util.find_spec('shark_tkinter_lib') is not None
+
+if HAS_GUI:
+    from sharktools.gui import watchdog
+
+
+class FakeRoot(object):
+    """ A Tk root whose main loop only runs when run_pending() is called """
+    def __init__(self):
+        self.callbacks = {}
+        self._next_id = 0
+
+    def after(self, ms, func):
+        self._next_id += 1
+        self.callbacks[self._next_id] = func
+        return self._next_id
+
+    def after_cancel(self, after_id):
+        self.callbacks.pop(after_id, None)
+
+    def run_pending(self):
+        callbacks = list(self.callbacks.values())
+        self.callbacks = {}
+        for func in callbacks:
+            func()
+
+
+def blocking_call(seconds):
+    time.sleep(seconds)
+
+
+@unittest.skipUnless(HAS_GUI, 'shark_tkinter_lib is not installed')
+class TestMainLoopWatchdog(unittest.TestCase):
+    def setUp(self):
+        self.root = FakeRoot()
+        self.watchdog = watchdog.MainLoopWatchdog(self.root, threshold=0.2, nr_samples=3, sample_interval=0.02,
+                                                  get_context=lambda: 'PageA')
+        self.addCleanup(self.watchdog.stop)
+
+    def test_no_stall_while_main_loop_runs(self):
+        self.watchdog.start()
+        for _ in range(10):
+            self.root.run_pending()
+            time.sleep(0.05)
+        self.assertEqual(self.watchdog.nr_stalls, 0)
+
+    def test_stall_is_logged_with_main_thread_stack(self):
+        nr_stalls = metrics.counter('mainloop.stalls').value
+        with self.assertLogs(watchdog.logger, level='WARNING') as logs:
+            self.watchdog.start()
+            blocking_call(0.5)
+            self.root.run_pending()
+            for _ in range(100):
+                if len(logs.output) >= 2:
+                    break
+                time.sleep(0.02)
+        self.assertEqual(self.watchdog.nr_stalls, 1)
+        self.assertEqual(metrics.counter('mainloop.stalls').value, nr_stalls + 1)
+        self.assertIn('Active page: PageA', logs.output[0])
+        self.assertIn('blocking_call', logs.output[0])
+        self.assertIn('responsive again', logs.output[1])
+
+    def test_stop_cancels_heartbeat(self):
+        self.watchdog.start()
+        self.assertEqual(len(self.root.callbacks), 1)
+        self.watchdog.stop()
+        self.assertEqual(self.root.callbacks, {})
@@ -0,0 +1,131 @@
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import sharktools
+from sharktools import instance
+from sharktools import zygote
+
+
+def _get_closed_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class ZygoteTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.file_path = Path(directory, 'zygote.json')
+        self.instance_file_path = Path(directory, 'instance.json')
+
+
+class TestRequestLaunch(ZygoteTestCase):
+    def test_no_zygote(self):
+        self.assertFalse(zygote.request_launch(file_path=self.file_path))
+        self.assertIsNone(zygote.get_status(file_path=self.file_path))
+
+    def test_stale_zygote_file(self):
+        instance.write_instance_file(self.file_path, _get_closed_port(), 'old token')
+        self.assertFalse(zygote.request_launch(file_path=self.file_path))
+        self.assertIsNone(zygote.get_status(file_path=self.file_path))
+
+    def test_launch_without_fork_is_single_use(self):
+        z = zygote.Zygote(idle_timeout=0, max_memory_mb=0, file_path=self.file_path, check_interval=0.1)
+        with mock.patch.object(zygote, 'CAN_FORK', False), \
+                mock.patch.object(zygote.Zygote, '_run_app') as run_app:
+            thread = threading.Thread(target=z.serve)
+            thread.start()
+            for _ in range(50):
+                if self.file_path.exists():
+                    break
+                thread.join(0.1)
+            self.assertTrue(zygote.request_launch(plugin='plugin', sub_page='page', file_path=self.file_path))
+            thread.join(5)
+        self.assertFalse(thread.is_alive())
+        run_app.assert_called_once_with('plugin', 'page')
+        # The next launch starts normally
+        self.assertFalse(self.file_path.exists())
+        self.assertFalse(zygote.request_launch(file_path=self.file_path))
+
+
+class TestTakeOver(ZygoteTestCase):
+    def test_requests_are_passed_on_to_the_new_instance(self):
+        launch_server = instance.claim_instance(file_path=self.instance_file_path)
+        self.addCleanup(launch_server.stop)
+        # A launch before the take over is received by the launch that started the zygote
+        self.assertIsNone(instance.claim_instance(plugin='plugin', file_path=self.instance_file_path))
+
+        app_servers = []
+        thread = threading.Thread(
+            target=lambda: app_servers.append(instance.take_over_instance(file_path=self.instance_file_path)))
+        thread.start()
+        self.assertTrue(launch_server.wait_for_take_over(timeout=5))
+        thread.join()
+        app_server = app_servers[0]
+        self.addCleanup(app_server.stop)
+
+        self.assertFalse(launch_server.is_running)
+        self.assertEqual(instance._read_instance_file(self.instance_file_path)['token'], app_server.token)
+        self.assertIsNone(instance.claim_instance(sub_page='page', file_path=self.instance_file_path))
+        self.assertEqual(app_server.get_commands(), [{'command': 'show', 'plugin': 'plugin', 'sub_page': None},
+                                                     {'command': 'show', 'plugin': None, 'sub_page': 'page'}])
+
+    def test_no_take_over(self):
+        launch_server = instance.claim_instance(file_path=self.instance_file_path)
+        self.addCleanup(launch_server.stop)
+        self.assertFalse(launch_server.wait_for_take_over(timeout=0.1))
+        self.assertTrue(launch_server.is_running)
+
+
+class TestRunApp(ZygoteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = mock.Mock()
+        self.main = types.SimpleNamespace(run_app=mock.Mock(return_value='app'))
+        patches = [mock.patch.object(instance, 'claim_instance', return_value=self.server),
+                   mock.patch.object(zygote, 'ZYGOTE_FILE_PATH', self.file_path),
+                   mock.patch.dict(sys.modules, {'sharktools.main': self.main})]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_zygote_takes_over(self):
+        self.file_path.write_text('{}')
+        self.server.wait_for_take_over.return_value = True
+        with mock.patch.object(zygote, 'request_launch', return_value=True) as request_launch:
+            self.assertIsNone(sharktools.run_app(plugin='plugin'))
+        request_launch.assert_called_once_with(plugin='plugin', sub_page=None)
+        # Stopped by wait_for_take_over, not before the request
+        self.server.stop.assert_not_called()
+        self.main.run_app.assert_not_called()
+
+    def test_no_zygote_listening(self):
+        self.file_path.write_text('{}')
+        with mock.patch.object(zygote, 'request_launch', return_value=False):
+            self.assertEqual(sharktools.run_app(), 'app')
+        self.server.stop.assert_not_called()
+        self.server.wait_for_take_over.assert_not_called()
+        self.main.run_app.assert_called_once_with(plugin=None, sub_page=None, single_instance=True,
+                                                  instance_server=self.server)
+
+    def test_zygote_app_not_started_in_time(self):
+        self.file_path.write_text('{}')
+        self.server.wait_for_take_over.return_value = False
+        with mock.patch.object(zygote, 'request_launch', return_value=True):
+            self.assertEqual(sharktools.run_app(), 'app')
+        self.assertIs(self.main.run_app.call_args[1]['instance_server'], self.server)
+
+    def test_no_zygote_file(self):
+        with mock.patch.object(zygote, 'request_launch') as request_launch:
+            self.assertEqual(sharktools.run_app(), 'app')
+        request_launch.assert_not_called()